@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Cheap local activity scoring, used to keep quiet footage away from Gemini.
+
+Most bedside footage is a patient lying still. Frames are sampled a couple of
+times per second and compared as small blurred thumbnails; a segment whose
+activity score stays under the threshold gets a synthesized "Low" danger
+observation instead of a model call. Tune the threshold against the clips in
+test/ with:
+
+    python activity_gate.py test/ --threshold 2.2
+"""
+import argparse
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from video_preprocess import motion_signature
+from video_segments import video_paths
+
+ACTIVITY_THRESHOLD = float(os.getenv("ACTIVITY_THRESHOLD", 2.2))
+ACTIVITY_SAMPLE_FPS = 2.0
+ACTIVITY_PERCENTILE = 90  # of per-sample frame differences; ignores single-frame glitches
+
+
+def measure_activity(video_path, sample_fps: float = ACTIVITY_SAMPLE_FPS, percentile: float = ACTIVITY_PERCENTILE) -> tuple[float, float]:
+    """Return (activity_score, duration_seconds) for a video.
+
+    The score is a percentile of the mean absolute grey-level difference
+    (0-255) between consecutive sampled frames. Frames between samples are
+    grabbed but not converted.
+    """
+    video_capture = cv2.VideoCapture(str(video_path))
+    if not video_capture.isOpened():
+        raise IOError(f"Error opening video file {video_path}")
+    fps = video_capture.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(1, int(round(fps / sample_fps)))
+
+    differences = []
+    previous = None
+    frame_index = 0
+    try:
+        while video_capture.grab():
+            if frame_index % step == 0:
+                ret, frame = video_capture.retrieve()
+                if ret:
+                    signature = motion_signature(frame)
+                    if previous is not None:
+                        differences.append(cv2.absdiff(signature, previous).mean())
+                    previous = signature
+            frame_index += 1
+    finally:
+        video_capture.release()
+
+    score = float(np.percentile(differences, percentile)) if differences else 0.0
+    return score, frame_index / fps
+
+
+class ActivityGate:
+    """Decides which segments go to the model and keeps totals for tuning.
+
+    One gate can be shared by the threads analysing a recording; `stats()`
+    reports how much footage was skipped.
+    """
+
+    def __init__(self, threshold: float = ACTIVITY_THRESHOLD, sample_fps: float = ACTIVITY_SAMPLE_FPS, percentile: float = ACTIVITY_PERCENTILE):
+        self.threshold = threshold
+        self.sample_fps = sample_fps
+        self.percentile = percentile
+        self._lock = threading.Lock()
+        self.segments = 0
+        self.skipped_segments = 0
+        self.seconds = 0.0
+        self.skipped_seconds = 0.0
+        self.scoring_seconds = 0.0
+
+    def check(self, video_path) -> tuple[bool, float]:
+        """Return (active, score); inactive segments should not be sent to the model."""
+        started = time.perf_counter()
+        score, duration = measure_activity(video_path, self.sample_fps, self.percentile)
+        active = score >= self.threshold
+        with self._lock:
+            self.segments += 1
+            self.seconds += duration
+            self.scoring_seconds += time.perf_counter() - started
+            if not active:
+                self.skipped_segments += 1
+                self.skipped_seconds += duration
+        return active, score
+
+    @property
+    def skipped_fraction(self) -> float:
+        return self.skipped_seconds / self.seconds if self.seconds else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "threshold": self.threshold,
+            "segments": self.segments,
+            "skipped_segments": self.skipped_segments,
+            "seconds": self.seconds,
+            "skipped_seconds": self.skipped_seconds,
+            "skipped_fraction": self.skipped_fraction,
+            "scoring_seconds": self.scoring_seconds,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score video activity and show which clips the gate would skip")
+    parser.add_argument("paths", nargs="+", help="Video files or directories")
+    parser.add_argument("--threshold", type=float, default=ACTIVITY_THRESHOLD)
+    parser.add_argument("--sample-fps", type=float, default=ACTIVITY_SAMPLE_FPS)
+    args = parser.parse_args()
+
+    gate = ActivityGate(args.threshold, args.sample_fps)
+    print(f"{'video':<28}{'score':>8}{'seconds':>9}  decision")
+    for path in video_paths(args.paths):
+        before = gate.seconds
+        active, score = gate.check(path)
+        print(f"{os.path.basename(path):<28}{score:>8.2f}{gate.seconds - before:>8.1f}s  {'analyse' if active else 'skip'}")
+    stats = gate.stats()
+    print(f"\nSkipped {stats['skipped_segments']}/{stats['segments']} clips, "
+          f"{100 * stats['skipped_fraction']:.0f}% of {stats['seconds']:.0f}s of footage "
+          f"(scoring took {stats['scoring_seconds']:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+from pydantic import BaseModel
+
+from storage import write_json_atomic
+
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", ".analysis_cache")
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+ANALYSIS_CACHE_BYPASS = os.getenv("ANALYSIS_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def schema_version(schema: type[BaseModel]) -> str:
+    """Hash of a model's JSON schema, so cached results are dropped when the schema changes."""
+    return sha256_text(json.dumps(schema.model_json_schema(), sort_keys=True))
+
+
+class AnalysisCache:
+    """Content-addressed, on-disk cache of parsed model results for videos.
+
+    The key covers the video's bytes, the exact prompt text, the model name,
+    the response schema and any preprocessing applied before upload, so a
+    result is only reused when every input to the model call is identical. Entries are JSON files named by key; reads
+    refresh their mtime and the least recently used files are removed once
+    the directory grows past `max_bytes`.
+    """
+
+    def __init__(self, directory: str = ANALYSIS_CACHE_DIR, max_bytes: int = ANALYSIS_CACHE_MAX_BYTES, bypass: bool = ANALYSIS_CACHE_BYPASS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self._digests: dict[tuple, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def enabled(self, use_cache: bool = True) -> bool:
+        return use_cache and not self.bypass
+
+    def video_digest(self, video_path) -> str:
+        """SHA-256 of a video's contents, remembered per (path, mtime, size)."""
+        st = os.stat(video_path)
+        memo_key = (os.path.abspath(video_path), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            digest = self._digests.get(memo_key)
+        if digest is None:
+            with open(video_path, 'rb') as f:
+                digest = hashlib.file_digest(f, "sha256").hexdigest()
+            with self._lock:
+                self._digests[memo_key] = digest
+        return digest
+
+    def key(self, video_path, prompt: str, model_name: str, schema: type[BaseModel], variant: str = "") -> str:
+        """`variant` distinguishes different encodings of the same source video (e.g. preprocessing settings)."""
+        parts = [self.video_digest(video_path), sha256_text(prompt), model_name, schema.__name__, schema_version(schema), variant]
+        return sha256_text("\n".join(parts))
+
+    def get(self, key: str, schema: type[BaseModel]) -> Optional[BaseModel]:
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                value = schema.model_validate(json.load(f))
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: BaseModel):
+        write_json_atomic(self._path(key), value.model_dump())
+        self._evict()
+
+    def clear(self) -> int:
+        removed = 0
+        for entry in self._entries():
+            os.unlink(entry.path)
+            removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(entry.stat().st_size for entry in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _entries(self) -> list[os.DirEntry]:
+        try:
+            with os.scandir(self.directory) as it:
+                return [entry for entry in it if entry.name.endswith(".json") and not entry.name.startswith(".tmp-")]
+        except FileNotFoundError:
+            return []
+
+    def _evict(self):
+        entries = sorted(((e.stat().st_mtime_ns, e.stat().st_size, e.path) for e in self._entries()))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+
+# Shared by gemini_profile and gemini_video
+analysis_cache = AnalysisCache()
@@ -1,31 +1,93 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager, suppress
+import asyncio
+from typing import AsyncIterator, Optional
 import json
+import logging
 import os
+import time
 import httpx
-import openai
-from openai import OpenAI
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
+from models import (
+    PatientInfo,
+    PatientTimestamp,
+    CombinedData,
+    ChatRequest,
+    ChatResponse,
+    projection_include,
+)
+from room_cache import RoomDataCache, RoomDataNotFound
+from storage import clean_room_number
+from chat_cache import ChatResponseCache, normalize_message
+from ward_index import WardIndex
+from room_prompts import RoomPromptCache
+from room_events import ROOM_EVENTS_HEARTBEAT_SECONDS, RoomEventHub
+
 # Load environment variables
 load_dotenv()
 
-# Create a custom httpx client without proxy settings
-http_client = httpx.Client(
-    base_url="https://api.openai.com",
-    follow_redirects=True,
-    timeout=httpx.Timeout(timeout=60.0)
-)
+logger = logging.getLogger(__name__)
 
-# Set up OpenAI client using the custom http client
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    http_client=http_client
-)
+# Point at a local stand-in (fake_services.py) to run without OpenAI
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+# Chat completion parameters shared by the answer and streaming paths
+LLM_MODEL = "gpt-3.5-turbo"  # You can change to a different model if needed
+LLM_TEMPERATURE = 0.3
+LLM_MAX_TOKENS = 1000
+
+# Connection pool for the async client; one pool is shared by every /chat request
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 500))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 100))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60.0))
+
+async_http_client: Optional[httpx.AsyncClient] = None
+async_client: Optional[AsyncOpenAI] = None
+
+def create_async_client() -> AsyncOpenAI:
+    """Create the pooled async OpenAI client used by the /chat endpoint."""
+    global async_http_client, async_client
+    async_http_client = httpx.AsyncClient(
+        follow_redirects=True,
+        timeout=httpx.Timeout(timeout=LLM_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS
+        )
+    )
+    async_client = AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=OPENAI_BASE_URL,
+        http_client=async_http_client
+    )
+    return async_client
+
+def get_async_client() -> AsyncOpenAI:
+    """Return the shared async client, creating it if the app lifespan hasn't run."""
+    if async_client is None:
+        return create_async_client()
+    return async_client
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global async_http_client, async_client
+    create_async_client()
+    events_task = asyncio.create_task(room_events.run())
+    try:
+        yield
+    finally:
+        events_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await events_task
+        await async_http_client.aclose()
+        async_http_client = None
+        async_client = None
 
-app = FastAPI(title="Patient Chat API")
+app = FastAPI(title="Patient Chat API", lifespan=lifespan)
 
 # Configure CORS for frontend access
 app.add_middleware(
@@ -36,215 +98,161 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Define data models
-class CloseContacts(BaseModel):
-    name: str
-    relationship: str
-    location: str
-    phone_number: str
-
-class PatientInfo(BaseModel):
-    full_name: str
-    location: str
-    age: int
-    pre_existing_conditions: list[str]
-    current_symptoms: list[str]
-    diagnosis: str
-    allergies: str
-    medications: list[str]
-    close_contacts: list[CloseContacts]
-
-class Timestamp(BaseModel):
-    start_time: str
-    end_time: str
-    symptoms: list[str]
-    confidence: float
-    description: str
-    danger_level: str
-
-class Vitals(BaseModel):
-    heart_rate: float
-    blood_pressure: str
-    blood_oxygen: float
-    blood_glucose: float
-    temperature: float
-    respiratory_rate: float
-    pulse_rate: float
-
-class PatientTimestamp(BaseModel):
-    room_number: str
-    predicted_symptoms: list[str]
-    timestamps: list[Timestamp]
-    danger_level: str
-    description: str
-    vitals: Vitals
-    admission_date: str
-
-class CombinedData(BaseModel):
-    patient_info: PatientInfo
-    patient_timestamp: PatientTimestamp
-
-class ChatRequest(BaseModel):
-    room_number: str
-    message: str
-
-class ChatResponse(BaseModel):
-    response: str
+# Validated room data from the configured store (ROOM_STORE), re-read only when it changes
+room_cache = RoomDataCache()
+
+# Danger level / symptom indexes, updated whenever the cache loads a new timeline
+ward_index = WardIndex()
+room_cache.add_listener(
+    lambda room, kind, value, version: ward_index.update_room(room, value, version) if kind == "timeline" else None
+)
+
+# Answers to repeated questions, keyed on the room data they were generated from
+chat_cache = ChatResponseCache()
+
+# Rendered system prompts per room, re-rendered only when the room's data changes
+system_prompts = RoomPromptCache(room_cache)
+
+# Pushes timeline and patient info changes to /ward/events and /ward/ws subscribers
+room_events = RoomEventHub(room_cache)
+# Whenever a request loads new room data, push it now rather than at the next poll
+room_cache.add_listener(lambda room, kind, value, version: room_events.notify())
 
 @app.get("/")
 def read_root():
     return {"message": "Patient Chat API is running"}
 
-def load_data(patient_info_path: str, patient_timestamp_path: str) -> CombinedData:
-    """Load and validate patient data from two separate JSON files."""
-    try:
-        # Load patient info data
-        with open(patient_info_path, 'r') as f:
-            patient_info_data = json.load(f)
-        patient_info = PatientInfo(**patient_info_data)
-        
-        # Load patient timestamp data
-        with open(patient_timestamp_path, 'r') as f:
-            patient_timestamp_data = json.load(f)
-        patient_timestamp = PatientTimestamp(**patient_timestamp_data)
-        
-        return CombinedData(
-            patient_info=patient_info,
-            patient_timestamp=patient_timestamp
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error loading patient data: {str(e)}")
-
-def generate_contacts_summary(contacts: List[CloseContacts]) -> str:
-    """Generate a summary of the close contacts for the system prompt."""
-    summary = ""
-    for contact in contacts:
-        summary += f"- {contact.name} ({contact.relationship}): {contact.phone_number}, {contact.location}\n"
-    return summary
-
-def generate_timestamps_summary(timestamps: List[Timestamp]) -> str:
-    """Generate a summary of the timestamps for the system prompt."""
-    summary = ""
-    for i, ts in enumerate(timestamps):
-        summary += f"Observation {i+1} ({ts.start_time} to {ts.end_time}):\n"
-        summary += f"- Symptoms: {', '.join(ts.symptoms)}\n"
-        summary += f"- Confidence: {ts.confidence}\n"
-        summary += f"- Danger Level: {ts.danger_level}\n"
-        summary += f"- Description: {ts.description}\n\n"
-    return summary
-
-def create_system_prompt(combined_data: CombinedData) -> str:
-    """Create a system prompt for the LLM with patient data context."""
-    patient_info = combined_data.patient_info
-    patient_timestamp = combined_data.patient_timestamp
-    
-    return f"""You are Florence, an AI medical assistant that has analyzed a patient through a surveillance camera system.
-You have access to the following patient information:
-
-Patient Name: {patient_info.full_name}
-Age: {patient_info.age}
-Location: {patient_info.location}
-Diagnosis: {patient_info.diagnosis}
-Pre-existing Conditions: {', '.join(patient_info.pre_existing_conditions)}
-Current Symptoms: {', '.join(patient_info.current_symptoms)}
-Allergies: {patient_info.allergies}
-Medications: {', '.join(patient_info.medications)}
-
-Close Contacts:
-{generate_contacts_summary(patient_info.close_contacts)}
-
-Room Number: {patient_timestamp.room_number}
-Admission Date: {patient_timestamp.admission_date}
-Predicted Symptoms: {', '.join(patient_timestamp.predicted_symptoms)}
-Overall Danger Level: {patient_timestamp.danger_level}
-Overall Description: {patient_timestamp.description}
-
-Vitals:
-- Heart Rate: {patient_timestamp.vitals.heart_rate} bpm
-- Blood Pressure: {patient_timestamp.vitals.blood_pressure}
-- Blood Oxygen: {patient_timestamp.vitals.blood_oxygen}%
-- Blood Glucose: {patient_timestamp.vitals.blood_glucose} mg/dL
-- Temperature: {patient_timestamp.vitals.temperature}°C
-- Respiratory Rate: {patient_timestamp.vitals.respiratory_rate} breaths/min
-- Pulse Rate: {patient_timestamp.vitals.pulse_rate} bpm
-
-Detailed Observations:
-{generate_timestamps_summary(patient_timestamp.timestamps)}
-
-Respond to the user's questions about this patient in a clear, concise, and medically appropriate manner.
-Base your answers strictly on the data provided. If information is not available, say so rather than making assumptions.
-"""
-
-def ask_llm(system_prompt: str, user_query: str) -> str:
-    """Get a response from the LLM based on the patient data and user query."""
+async def ask_llm_async(system_prompt: str, user_query: str) -> str:
+    """Get a response from the LLM based on the patient data and user query, over the shared connection pool."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # You can change to a different model if needed
+        response = await get_async_client().chat.completions.create(
+            model=LLM_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_query}
             ],
-            temperature=0.3,
-            max_tokens=1000
+            temperature=LLM_TEMPERATURE,
+            max_tokens=LLM_MAX_TOKENS
         )
         return response.choices[0].message.content
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error querying the AI model: {str(e)}")
 
+async def stream_llm(system_prompt: str, user_query: str) -> AsyncIterator[str]:
+    """Yield response tokens from the LLM as they are generated."""
+    stream = await get_async_client().chat.completions.create(
+        model=LLM_MODEL,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_query}
+        ],
+        temperature=LLM_TEMPERATURE,
+        max_tokens=LLM_MAX_TOKENS,
+        stream=True
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def chat_cache_key(room_number: str, message: str) -> tuple:
+    """Cache key for a chat answer; changes when the room's data or the model settings do."""
+    return (
+        clean_room_number(room_number),
+        room_cache.version(room_number),
+        normalize_message(message),
+        LLM_MODEL,
+        LLM_TEMPERATURE,
+        LLM_MAX_TOKENS
+    )
+
+def chat_context(room_number: str, message: str) -> tuple[str, tuple]:
+    """System prompt and answer cache key for a question. Blocking (store signatures, loads on a miss); run it in a worker thread."""
+    return system_prompts.get(room_number, revalidate=True), chat_cache_key(room_number, message)
+
+def format_sse(data: dict, event: Optional[str] = None) -> str:
+    """Encode a payload as a single server-sent event."""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
 @app.post("/chat", response_model=ChatResponse)
-def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest):
     """Process a chat message and return an AI response based on patient data."""
     try:
-        # Clean room number by removing "Room " prefix and spaces
-        clean_room_number = request.room_number.replace("Room ", "").replace(" ", "")
-        
-        # Build file paths
-        patient_info_path = f"patientinfo/room{clean_room_number}.json"
-        patient_timestamp_path = f"timelineinfo/room{clean_room_number}.json"
-        
-        # Check if files exist
-        if not os.path.exists(patient_info_path):
-            raise HTTPException(status_code=404, detail=f"Patient info not found for room {request.room_number}")
-        if not os.path.exists(patient_timestamp_path):
-            raise HTTPException(status_code=404, detail=f"Timeline info not found for room {request.room_number}")
+        # System prompt from the room's data, read off the event loop
+        system_prompt, cache_key = await asyncio.to_thread(chat_context, request.room_number, request.message)
         
-        # Load data
-        combined_data = load_data(patient_info_path, patient_timestamp_path)
-        
-        # Create system prompt
-        system_prompt = create_system_prompt(combined_data)
-        
-        # Query LLM
-        response = ask_llm(system_prompt, request.message)
+        # Query LLM, reusing a cached or in-flight answer to the same question
+        response = await chat_cache.get_or_compute(
+            cache_key,
+            lambda: ask_llm_async(system_prompt, request.message)
+        )
         
         return {"response": response}
+    except RoomDataNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Stream the AI response as server-sent events while it is being generated.
+
+    Each token arrives as a `data: {"delta": ...}` event. The stream ends with a
+    `done` event carrying the full response (same shape as ChatResponse) plus
+    time-to-first-token and total latency in milliseconds, or an `error` event.
+    """
+    try:
+        system_prompt, cache_key = await asyncio.to_thread(chat_context, request.room_number, request.message)
+    except RoomDataNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+    async def event_stream():
+        started = time.perf_counter()
+        cached = chat_cache.get(cache_key)
+        if cached is not None:
+            total_ms = (time.perf_counter() - started) * 1000
+            yield format_sse({"delta": cached})
+            yield format_sse({"response": cached, "ttft_ms": total_ms, "total_ms": total_ms, "cached": True}, event="done")
+            return
+
+        first_token_ms = None
+        parts = []
+        try:
+            async for token in stream_llm(system_prompt, request.message):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000
+                parts.append(token)
+                yield format_sse({"delta": token})
+        except Exception as e:
+            yield format_sse({"detail": f"Error querying the AI model: {str(e)}"}, event="error")
+            return
+        total_ms = (time.perf_counter() - started) * 1000
+        chat_cache.put(cache_key, "".join(parts), total_ms / 1000)
+        logger.info("Streamed chat for room %s: first token %.0f ms, total %.0f ms", request.room_number, first_token_ms or total_ms, total_ms)
+        yield format_sse({
+            "response": "".join(parts),
+            "ttft_ms": first_token_ms,
+            "total_ms": total_ms,
+            "cached": False
+        }, event="done")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/patientinfo/{room_number}", response_model=PatientInfo)
 def get_patient_info(room_number: str):
     """Retrieve patient information for a specific room."""
     try:
-        # Clean room number by removing "Room " prefix and spaces
-        clean_room_number = room_number.replace("Room ", "").replace(" ", "")
-        
-        # Build file path
-        patient_info_path = f"patientinfo/room{clean_room_number}.json"
-        
-        # Check if file exists
-        if not os.path.exists(patient_info_path):
-            raise HTTPException(status_code=404, detail=f"Patient info not found for room {room_number}")
-        
-        # Load and validate the data
-        with open(patient_info_path, 'r') as f:
-            patient_info_data = json.load(f)
-        patient_info = PatientInfo(**patient_info_data)
-        
-        return patient_info
-    except HTTPException:
-        raise
+        return room_cache.get_patient_info(room_number)
+    except RoomDataNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
@@ -252,27 +260,177 @@ def get_patient_info(room_number: str):
 def get_timeline_info(room_number: str):
     """Retrieve timeline information for a specific room."""
     try:
-        # Clean room number by removing "Room " prefix and spaces
-        clean_room_number = room_number.replace("Room ", "").replace(" ", "")
-        
-        # Build file path
-        patient_timestamp_path = f"timelineinfo/room{clean_room_number}.json"
-        
-        # Check if file exists
-        if not os.path.exists(patient_timestamp_path):
-            raise HTTPException(status_code=404, detail=f"Timeline info not found for room {room_number}")
-        
-        # Load and validate the data
-        with open(patient_timestamp_path, 'r') as f:
-            patient_timestamp_data = json.load(f)
-        patient_timestamp = PatientTimestamp(**patient_timestamp_data)
-        
-        return patient_timestamp
-    except HTTPException:
-        raise
+        return room_cache.get_timeline(room_number)
+    except RoomDataNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@app.get("/timelineinfo/{room_number}/changes")
+def get_timeline_changes(room_number: str, cursor: Optional[int] = None):
+    """Observations, vitals and state changes appended to a room's timeline since `cursor`."""
+    try:
+        return room_cache.get_timeline_changes(room_number, cursor)
+    except RoomDataNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+def split_param(value: Optional[str]) -> Optional[list[str]]:
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+@app.get("/ward")
+def get_ward_snapshot(rooms: Optional[str] = None, fields: Optional[str] = None):
+    """Return CombinedData for many rooms in one response.
+
+    `rooms` is a comma-separated list of room numbers (default: every room in the ward).
+    `fields` is a comma-separated list of dotted paths into CombinedData, e.g.
+    "patient_timestamp.danger_level,patient_timestamp.vitals", to trim the payload.
+    """
+    room_numbers = [clean_room_number(room) for room in split_param(rooms)] if rooms else room_cache.list_rooms()
+    try:
+        include = projection_include(CombinedData, split_param(fields)) if fields else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    snapshot = {}
+    missing = []
+    try:
+        for room_number in room_numbers:
+            try:
+                combined_data = room_cache.get_combined(room_number)
+            except RoomDataNotFound:
+                missing.append(room_number)
+                continue
+            snapshot[room_number] = combined_data.model_dump(include=include)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    return {"rooms": snapshot, "missing": missing}
+
+@app.get("/ward/rooms")
+def query_ward_rooms(danger_level: Optional[str] = None, symptom: Optional[str] = None):
+    """Rooms whose overall danger level is one of `danger_level` (comma-separated) and/or that show `symptom`."""
+    try:
+        # Stores with their own indexes (SQLite) answer directly; otherwise use the in-memory index
+        rooms = room_cache.store.query_rooms(split_param(danger_level), symptom)
+        if rooms is None:
+            ward_index.sync(room_cache)
+            rooms = ward_index.query_rooms(split_param(danger_level), symptom)
+        return {"rooms": rooms}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
+@app.get("/ward/observations")
+def query_ward_observations(
+    danger_level: Optional[str] = None,
+    symptom: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    room_number: Optional[str] = None
+):
+    """Timeline observations across the ward filtered by danger level, symptom, time window and room."""
+    try:
+        ward_index.sync(room_cache)
+        observations = ward_index.query_observations(
+            split_param(danger_level),
+            symptom,
+            since,
+            until,
+            clean_room_number(room_number) if room_number else None
+        )
+        return {"observations": observations}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+def room_snapshots(rooms: Optional[list[str]]) -> list[tuple[str, dict]]:
+    """Current timeline of each room as (event, data), sent to new subscribers that ask for it. Blocking."""
+    snapshots = []
+    for room in [clean_room_number(room) for room in rooms] if rooms else room_cache.list_rooms():
+        try:
+            snapshots.append(("snapshot", {"room": room, "timeline": room_cache.get_timeline(room).model_dump()}))
+        except RoomDataNotFound:
+            continue
+    return snapshots
+
+@app.get("/ward/events")
+async def ward_events(rooms: Optional[str] = None, snapshot: bool = False):
+    """Push room changes as server-sent events instead of polling /timelineinfo.
+
+    `rooms` is a comma-separated list of rooms to follow (default: every
+    room). With `snapshot=true` the current timelines are sent first. A
+    comment line is sent every ROOM_EVENTS_HEARTBEAT_SECONDS to keep idle
+    connections open. See RoomEventHub for the event types.
+    """
+    room_numbers = split_param(rooms)
+    subscription = room_events.subscribe(room_numbers)
+
+    async def event_stream():
+        try:
+            if snapshot:
+                for event, data in await asyncio.to_thread(room_snapshots, room_numbers):
+                    yield format_sse(data, event=event)
+            while True:
+                item = await subscription.get(ROOM_EVENTS_HEARTBEAT_SECONDS)
+                yield ": keepalive\n\n" if item is None else format_sse(item[1], event=item[0])
+        finally:
+            room_events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/ward/ws")
+async def ward_websocket(websocket: WebSocket, rooms: Optional[str] = None, snapshot: bool = False):
+    """The /ward/events stream over a WebSocket, as {"event": ..., "data": ...} messages."""
+    await websocket.accept()
+    room_numbers = split_param(rooms)
+    subscription = room_events.subscribe(room_numbers)
+
+    async def send_events():
+        if snapshot:
+            for event, data in await asyncio.to_thread(room_snapshots, room_numbers):
+                await websocket.send_json({"event": event, "data": data})
+        while True:
+            item = await subscription.get(ROOM_EVENTS_HEARTBEAT_SECONDS)
+            await websocket.send_json({"event": "keepalive"} if item is None else {"event": item[0], "data": item[1]})
+
+    sender = asyncio.create_task(send_events())
+    try:
+        # Clients don't send anything; this returns when they disconnect
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        room_events.unsubscribe(subscription)
+
+@app.get("/ward/events/stats")
+def get_ward_events_stats():
+    """Subscriber, event and dropped-event counts for /ward/events and /ward/ws."""
+    return room_events.stats()
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Report hit/miss counters for the in-memory caches."""
+    return {"rooms": room_cache.stats(), "chat": chat_cache.stats(), "ward_index": ward_index.stats(), "prompts": system_prompts.stats()}
+
+@app.post("/cache/reload")
+def reload_cache(room_number: Optional[str] = None):
+    """Drop cached room data so it is re-read from disk on the next request."""
+    dropped = room_cache.reload(room_number)
+    room_events.notify()
+    return {"dropped": dropped}
+
+@app.post("/cache/chat/clear")
+def clear_chat_cache():
+    """Forget every cached chat answer."""
+    return {"dropped": chat_cache.clear()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
@@ -1,8 +1,12 @@
 import os
 import json
-import base64
 import asyncio
-import websockets
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager, suppress
+from typing import Optional
+from urllib.parse import parse_qsl
 from fastapi import FastAPI, WebSocket, Request
 from fastapi.responses import HTMLResponse
 from fastapi.websockets import WebSocketDisconnect
@@ -10,6 +14,23 @@ from twilio.twiml.voice_response import VoiceResponse, Connect, Say, Stream
 from dotenv import load_dotenv
 import logging
 
+from media_relay import (
+    RelayQueue,
+    audio_append_event,
+    is_open,
+    json_dumps,
+    json_loads,
+    merge_audio,
+    parse_openai_audio_delta,
+    parse_twilio_media,
+    twilio_mark_event,
+    twilio_media_event,
+)
+from realtime_pool import REALTIME_URL, RealtimeSessionPool
+from room_cache import RoomDataCache
+from room_prompts import RoomPromptCache, create_system_prompt
+from storage import clean_room_number
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -24,6 +45,11 @@ PORT = int(os.getenv('PORT', 5050))
 SYSTEM_MESSAGE = (
   "You are a helpful and bubbly AI assistant who answers any questions I ask"
 )
+# Added to a room's chat prompt for phone calls
+VOICE_CALL_NOTE = (
+  "You are speaking with a member of the care team over the phone. "
+  "Keep answers short and conversational, and do not read out lists or raw numbers unless asked."
+)
 VOICE = 'alloy'
 LOG_EVENT_TYPES = [
   'response.content.done', 'rate_limits.updated', 'response.done',
@@ -31,9 +57,69 @@ LOG_EVENT_TYPES = [
   'input_audio_buffer.speech_started', 'response.create', 'session.created'
 ]
 SHOW_TIMING_MATH = False
-app = FastAPI()
+# Dialed number -> room, e.g. "+15550100101=101,+15550100102=102", for calls that don't pass ?room=
+CALL_ROOM_NUMBERS = dict(
+    entry.strip().split("=", 1) for entry in os.getenv("CALL_ROOM_NUMBERS", "").split(",") if "=" in entry
+)
+# Queue bounds between the two legs of a call; the oldest audio is dropped beyond them
+CALL_TO_OPENAI_QUEUE_FRAMES = int(os.getenv("CALL_TO_OPENAI_QUEUE_FRAMES", 50))  # 20 ms frames, so 1 s of caller audio
+CALL_TO_TWILIO_QUEUE_MESSAGES = int(os.getenv("CALL_TO_TWILIO_QUEUE_MESSAGES", 500))
 if not OPENAI_API_KEY:
   raise ValueError('Missing the OpenAI API key. Please set it in the .env file.')
+REALTIME_HEADERS = {
+    "Authorization": f"Bearer {OPENAI_API_KEY}",
+    "OpenAI-Beta": "realtime=v1"
+}
+
+# Realtime sessions connected and configured ahead of calls (REALTIME_POOL_SIZE)
+realtime_pool: Optional[RealtimeSessionPool] = None
+
+def get_realtime_pool() -> RealtimeSessionPool:
+    """Return the shared session pool, creating it if the app lifespan hasn't run."""
+    global realtime_pool
+    if realtime_pool is None:
+        realtime_pool = RealtimeSessionPool(prepare_session, url=REALTIME_URL, headers=REALTIME_HEADERS)
+    return realtime_pool
+
+def voice_instructions(combined_data) -> str:
+    return f"{create_system_prompt(combined_data)}\n{VOICE_CALL_NOTE}"
+
+# Session instructions per room, rendered ahead of calls and re-rendered when the room's data changes
+voice_prompts = RoomPromptCache(RoomDataCache(), render=voice_instructions)
+
+def call_room(params: dict) -> Optional[str]:
+    """The room a call is about: an explicit `room` parameter, else the number that was dialed."""
+    room = params.get("room") or CALL_ROOM_NUMBERS.get(params.get("To", ""))
+    return clean_room_number(room) if room else None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global realtime_pool
+    get_realtime_pool().start()
+    prompts_task = asyncio.create_task(voice_prompts.run())
+    try:
+        yield
+    finally:
+        prompts_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await prompts_task
+        await realtime_pool.close()
+        realtime_pool = None
+
+app = FastAPI(lifespan=lifespan)
+
+# Relay queues of calls in progress, and counters from finished calls, for /calls/stats
+call_ids = itertools.count(1)
+active_calls: dict[int, dict] = {}
+call_totals = {
+    "calls": 0,
+    "to_openai_dropped": 0,
+    "to_openai_cleared": 0,
+    "to_openai_max_lag_ms": 0.0,
+    "to_twilio_dropped": 0,
+    "to_twilio_cleared": 0,
+    "to_twilio_max_lag_ms": 0.0,
+}
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -45,83 +131,146 @@ async def handle_incoming_call(request: Request):
     """Handle incoming call and return TwiML response to connect to Media Stream."""
     print('incoming call foound')
     logger.info("Received incoming call request from: %s", request.client.host)
+    # Twilio posts call details form-encoded; ?room= can also be set on the webhook URL
+    params = dict(request.query_params)
+    if request.method == "POST":
+        params.update(parse_qsl((await request.body()).decode()))
+    room = call_room(params)
     response = VoiceResponse()
     host = request.url.hostname
     connect = Connect()
-    connect.stream(url=f'wss://{host}/media-stream')
+    stream = connect.stream(url=f'wss://{host}/media-stream')
+    if room:
+        # Custom parameters arrive in the media stream's "start" event
+        stream.parameter(name="room", value=room)
     response.append(connect)
     logger.info("Successfully created the TwiML response")
     return HTMLResponse(content=str(response), media_type="application/xml")
 
+@app.get("/calls/stats")
+async def calls_stats():
+    """Queue depth, lag and dropped audio per call in progress, plus totals over finished calls."""
+    return {
+        "active": {
+            call_id: {
+                "stream_sid": call["stream_sid"],
+                "room": call["room"],
+                "seconds": time.time() - call["started"],
+                "to_openai": call["to_openai"].stats(),
+                "to_twilio": call["to_twilio"].stats(),
+            }
+            for call_id, call in active_calls.items()
+        },
+        "finished": call_totals,
+    }
+
+@app.get("/realtime-pool/stats")
+async def realtime_pool_stats():
+    """Idle sessions, hit rate and warm-up/checkout times of the realtime session pool."""
+    return get_realtime_pool().stats()
+
+@app.get("/room-prompts/stats")
+async def room_prompts_stats():
+    """Rooms with rendered call instructions, and how often calls found them ready."""
+    return voice_prompts.stats()
+
 
 @app.websocket("/media-stream")
 async def handle_media_stream(websocket: WebSocket):
-    """Handle WebSocket connections between Twilio and OpenAI."""
+    """Handle WebSocket connections between Twilio and OpenAI.
+
+    Each direction is a reader that parses and queues, and a writer that
+    drains the queue into the other socket, so neither leg ever waits on
+    the other's sends. The queues are bounded and drop their oldest audio
+    when full.
+    """
     print("Client connected")
     await websocket.accept()
-    
-    async with websockets.connect(
-        'wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-12-17',
-        additional_headers={
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-            "OpenAI-Beta": "realtime=v1"
-        }
-    ) as openai_ws:
-        await send_session_update(openai_ws)
 
+    # Already connected and configured; the greeting starts once Twilio says which room the call is about
+    openai_ws = await get_realtime_pool().checkout()
+    to_openai = RelayQueue(CALL_TO_OPENAI_QUEUE_FRAMES)
+    to_twilio = RelayQueue(CALL_TO_TWILIO_QUEUE_MESSAGES)
+    call = {"stream_sid": None, "room": None, "started": time.time(), "to_openai": to_openai, "to_twilio": to_twilio}
+    call_id = next(call_ids)
+    active_calls[call_id] = call
+    try:
         # Connection specific state
         stream_sid = None
         latest_media_timestamp = 0
         last_assistant_item = None
-        mark_queue = []
+        mark_queue = deque()
         response_start_timestamp_twilio = None
 
         async def receive_from_twilio():
-            """Receive audio data from Twilio and send it to the OpenAI Realtime API."""
-            nonlocal stream_sid, latest_media_timestamp
+            """Receive audio data from Twilio and queue it for the OpenAI Realtime API."""
+            nonlocal stream_sid, latest_media_timestamp, response_start_timestamp_twilio, last_assistant_item
             try:
                 async for message in websocket.iter_text():
-                    data = json.loads(message)
-                    if data['event'] == 'media' and openai_ws.open:
+                    # Audio frames are relayed without parsing or re-encoding the payload
+                    media = parse_twilio_media(message)
+                    if media is not None:
+                        payload, latest_media_timestamp = media
+                        to_openai.put(("audio", payload), droppable=True)
+                        continue
+
+                    data = json_loads(message)
+                    if data['event'] == 'media':
+                        # A media event the fast path didn't recognise, e.g. with the event type further in
                         latest_media_timestamp = int(data['media']['timestamp'])
-                        audio_append = {
-                            "type": "input_audio_buffer.append",
-                            "audio": data['media']['payload']
-                        }
-                        await openai_ws.send(json.dumps(audio_append))
+                        to_openai.put(("audio", data['media']['payload']), droppable=True)
                     elif data['event'] == 'start':
-                        stream_sid = data['start']['streamSid']
+                        stream_sid = call["stream_sid"] = data['start']['streamSid']
                         print(f"Incoming stream has started {stream_sid}")
+                        start_conversation(data['start'].get('customParameters') or {})
                         response_start_timestamp_twilio = None
                         latest_media_timestamp = 0
                         last_assistant_item = None
                     elif data['event'] == 'mark':
                         if mark_queue:
-                            mark_queue.pop(0)
+                            mark_queue.popleft()
             except WebSocketDisconnect:
-                print("Client disconnected.")
-                if openai_ws.open:
-                    await openai_ws.close()
+                pass
+            # iter_text() also ends quietly on disconnect; either way the call is over
+            print("Client disconnected.")
+            to_openai.close()
+
+        async def send_queued_to_openai():
+            """Send queued caller audio to OpenAI, merging frames that queued up behind a slow send."""
+            try:
+                while (batch := await to_openai.get_batch()) is not None:
+                    payloads = []
+                    for kind, item in batch:
+                        if kind == "audio":
+                            payloads.append(item)
+                            continue
+                        if payloads:
+                            await openai_ws.send(audio_append_event(merge_audio(payloads)))
+                            payloads = []
+                        await openai_ws.send(item)
+                    if payloads:
+                        await openai_ws.send(audio_append_event(merge_audio(payloads)))
+            except Exception as e:
+                print(f"Error in send_queued_to_openai: {e}")
+            if is_open(openai_ws):
+                await openai_ws.close()
 
         async def send_to_twilio():
-            """Receive events from the OpenAI Realtime API, send audio back to Twilio."""
+            """Receive events from the OpenAI Realtime API, queue audio for Twilio."""
             nonlocal stream_sid, last_assistant_item, response_start_timestamp_twilio
             try:
                 async for openai_message in openai_ws:
-                    response = json.loads(openai_message)
-                    if response['type'] in LOG_EVENT_TYPES:
-                        print(f"Received event: {response['type']}", response)
-
-                    if response.get('type') == 'response.audio.delta' and 'delta' in response:
-                        audio_payload = base64.b64encode(base64.b64decode(response['delta'])).decode('utf-8')
-                        audio_delta = {
-                            "event": "media",
-                            "streamSid": stream_sid,
-                            "media": {
-                                "payload": audio_payload
-                            }
-                        }
-                        await websocket.send_json(audio_delta)
+                    # Audio deltas are already base64 u-law, which is what Twilio expects
+                    audio = parse_openai_audio_delta(openai_message)
+                    response = None
+                    if audio is None:
+                        response = json_loads(openai_message)
+                        if response.get('type') == 'response.audio.delta':
+                            # A delta the fast path didn't recognise, e.g. with the event type further in
+                            audio = response['delta'], response.get('item_id')
+                    if audio is not None:
+                        audio_payload, item_id = audio
+                        to_twilio.put(twilio_media_event(stream_sid, audio_payload), droppable=True)
 
                         if response_start_timestamp_twilio is None:
                             response_start_timestamp_twilio = latest_media_timestamp
@@ -129,21 +278,35 @@ async def handle_media_stream(websocket: WebSocket):
                                 print(f"Setting start timestamp for new response: {response_start_timestamp_twilio}ms")
 
                         # Update last_assistant_item safely
-                        if response.get('item_id'):
-                            last_assistant_item = response['item_id']
+                        if item_id:
+                            last_assistant_item = item_id
 
-                        await send_mark(websocket, stream_sid)
+                        queue_mark(stream_sid)
+                        continue
+
+                    if response['type'] in LOG_EVENT_TYPES:
+                        print(f"Received event: {response['type']}", response)
 
                     # Trigger an interruption. Your use case might work better using `input_audio_buffer.speech_stopped`, or combining the two.
                     if response.get('type') == 'input_audio_buffer.speech_started':
                         print("Speech started detected.")
                         if last_assistant_item:
                             print(f"Interrupting response with id: {last_assistant_item}")
-                            await handle_speech_started_event()
+                            handle_speech_started_event()
             except Exception as e:
                 print(f"Error in send_to_twilio: {e}")
+            to_twilio.close()
+
+        async def send_queued_to_twilio():
+            """Send queued audio, marks and clears to Twilio."""
+            try:
+                while (batch := await to_twilio.get_batch()) is not None:
+                    for message in batch:
+                        await websocket.send_text(message)
+            except Exception as e:
+                print(f"Error in send_queued_to_twilio: {e}")
 
-        async def handle_speech_started_event():
+        def handle_speech_started_event():
             """Handle interruption when the caller's speech starts."""
             nonlocal response_start_timestamp_twilio, last_assistant_item
             print("Handling speech started event.")
@@ -162,31 +325,50 @@ async def handle_media_stream(websocket: WebSocket):
                         "content_index": 0,
                         "audio_end_ms": elapsed_time
                     }
-                    await openai_ws.send(json.dumps(truncate_event))
+                    to_openai.put(("event", json_dumps(truncate_event)))
 
-                await websocket.send_json({
+                # Assistant audio still waiting to be sent is stale now
+                to_twilio.clear()
+                to_twilio.put(json_dumps({
                     "event": "clear",
                     "streamSid": stream_sid
-                })
+                }))
 
                 mark_queue.clear()
                 last_assistant_item = None
                 response_start_timestamp_twilio = None
 
-        async def send_mark(connection, stream_sid):
+        def start_conversation(params):
+            """Give the session the room's context, if the call is about a room, then start the greeting."""
+            room = call["room"] = call_room(params)
+            if room:
+                # Rendering here would hold up the event loop; until run() has rendered the room, keep the generic instructions
+                instructions = voice_prompts.cached(room)
+                if instructions is not None:
+                    to_openai.put(("event", json_dumps({"type": "session.update", "session": {"instructions": instructions}})))
+                else:
+                    print(f"No room context ready for the call to room {room}")
+            # The session is already configured with the greeting queued; just start speaking
+            to_openai.put(("event", json_dumps({"type": "response.create"})))
+
+        def queue_mark(stream_sid):
             if stream_sid:
-                mark_event = {
-                    "event": "mark",
-                    "streamSid": stream_sid,
-                    "mark": {"name": "responsePart"}
-                }
-                await connection.send_json(mark_event)
+                to_twilio.put(twilio_mark_event(stream_sid))
                 mark_queue.append('responsePart')
 
-        await asyncio.gather(receive_from_twilio(), send_to_twilio())
+        await asyncio.gather(receive_from_twilio(), send_queued_to_openai(), send_to_twilio(), send_queued_to_twilio())
+    finally:
+        await openai_ws.close()
+        del active_calls[call_id]
+        call_totals["calls"] += 1
+        for name in ("to_openai", "to_twilio"):
+            stats = call[name].stats()
+            call_totals[f"{name}_dropped"] += stats["dropped"]
+            call_totals[f"{name}_cleared"] += stats["cleared"]
+            call_totals[f"{name}_max_lag_ms"] = max(call_totals[f"{name}_max_lag_ms"], stats["max_lag_ms"])
 
 async def send_initial_conversation_item(openai_ws):
-    """Send initial conversation item if AI talks first."""
+    """Queue the greeting for the AI to say first; it is spoken on the next response.create."""
     initial_conversation_item = {
         "type": "conversation.item.create",
         "item": {
@@ -201,7 +383,6 @@ async def send_initial_conversation_item(openai_ws):
         }
     }
     await openai_ws.send(json.dumps(initial_conversation_item))
-    await openai_ws.send(json.dumps({"type": "response.create"}))
 
 async def send_session_update(openai_ws):
     """Send session update to OpenAI WebSocket."""
@@ -221,6 +402,9 @@ async def send_session_update(openai_ws):
     print('Sending session update:', json.dumps(session_update))
     await openai_ws.send(json.dumps(session_update))
 
+async def prepare_session(openai_ws):
+    """Configure a new realtime session for a call, before or after it is checked out."""
+    await send_session_update(openai_ws)
     await send_initial_conversation_item(openai_ws)
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Optional
+
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", 300))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", 1024))
+
+
+def normalize_message(message: str) -> str:
+    """Normalize a chat question so trivial variations share a cache entry."""
+    return " ".join(message.lower().split()).rstrip("?!. ")
+
+
+def _retrieve_exception(task: asyncio.Task):
+    # Waiters get the exception; this only stops asyncio logging it when every waiter has gone
+    if not task.cancelled():
+        task.exception()
+
+
+class ChatResponseCache:
+    """TTL + LRU cache of LLM answers with single-flight request coalescing.
+
+    Callers build the key themselves (room data version, normalized message and
+    model parameters). While an answer is being generated, identical requests
+    wait on the same task instead of starting another completion. Failures
+    are propagated to every waiter and never cached.
+    """
+
+    def __init__(self, max_entries: int = CHAT_CACHE_MAX_ENTRIES, ttl: float = CHAT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (expires_at, response, seconds the original completion took)
+        self._entries: "OrderedDict[Hashable, tuple[float, str, float]]" = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.llm_seconds_saved = 0.0
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """Return a fresh cached answer and count it as a hit, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response, elapsed = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.llm_seconds_saved += elapsed
+        return response
+
+    def put(self, key: Hashable, response: str, elapsed: float = 0.0):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, response, elapsed)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[str]]) -> str:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # The completion runs in its own task, so a caller that goes away
+            # (e.g. its client disconnects) doesn't cancel it for the others
+            inflight = self._inflight[key] = asyncio.create_task(self._compute(key, compute))
+            inflight.add_done_callback(_retrieve_exception)
+        return await asyncio.shield(inflight)
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[str]]) -> str:
+        started = time.perf_counter()
+        try:
+            response = await compute()
+            self.put(key, response, time.perf_counter() - started)
+            return response
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self) -> int:
+        dropped = len(self._entries)
+        self._entries.clear()
+        return dropped
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "hit_rate": (self.hits + self.coalesced) / requests if requests else 0.0,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "llm_calls_saved": self.hits + self.coalesced,
+            "llm_seconds_saved": round(self.llm_seconds_saved, 3),
+        }
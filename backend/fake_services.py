@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the OpenAI and Gemini APIs the backend calls, for load
+tests and offline development.
+
+    python fake_services.py --port 8900 --latency-ms 400 --token-ms 15 --error-rate 0.02
+
+Point the services at it with:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1          # app.py chat completions
+    REALTIME_URL=ws://127.0.0.1:8900/v1/realtime      # call_service.py
+    GEMINI_BASE_URL=http://127.0.0.1:8900             # gemini_video.py, gemini_profile.py
+
+Serves:
+  POST /v1/chat/completions                  plain and streamed (server-sent events) completions
+  WS   /v1/realtime                          session setup, audio in, spoken responses out in real time
+  POST /upload/v1beta/files, /v1beta/files   the Files API resumable upload, get and delete
+  POST /v1beta/models/{model}:generateContent
+                                             JSON that matches the request's response schema
+  GET/POST /fake/config                      view or change latency and error injection while running
+  GET  /fake/stats                           requests served and errors injected per API
+
+Latency is `latency_ms` plus up to `jitter_ms` before the first token (or
+the whole response), then `token_ms` per streamed token. A fraction
+`error_rate` of requests fail with `error_status`, which the real clients
+see as API errors (and may retry).
+"""
+import argparse
+import asyncio
+import base64
+import itertools
+import random
+import time
+from typing import Optional
+
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from media_relay import json_dumps, json_loads
+
+ANSWER_WORDS = (
+    "The patient is resting comfortably and their vitals are within the expected range. "
+    "No new symptoms were observed in the latest footage, and the overall danger level is unchanged."
+).split()
+AUDIO_CHUNK_SECONDS = 0.1
+AUDIO_CHUNK = base64.b64encode(b"\xff" * int(8000 * AUDIO_CHUNK_SECONDS)).decode()  # u-law silence
+
+
+class FakeConfig(BaseModel):
+    latency_ms: float = 300.0  # before the first token, or the whole non-streamed response
+    jitter_ms: float = 50.0
+    token_ms: float = 20.0
+    tokens: int = 60
+    error_rate: float = 0.0
+    error_status: int = 500
+    realtime_connect_ms: float = 150.0
+    realtime_audio_seconds: float = 2.0  # length of each spoken response
+    gemini_latency_ms: float = 1500.0
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    defaults = FakeConfig()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="Chat/realtime latency before the first token")
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms, help="Random extra latency, up to this much")
+    parser.add_argument("--token-ms", type=float, default=defaults.token_ms, help="Delay between streamed tokens")
+    parser.add_argument("--tokens", type=int, default=defaults.tokens, help="Tokens per chat answer")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=defaults.error_status, help="HTTP status of injected failures (e.g. 429, 500)")
+    parser.add_argument("--realtime-connect-ms", type=float, default=defaults.realtime_connect_ms, help="Realtime websocket handshake latency")
+    parser.add_argument("--realtime-audio-seconds", type=float, default=defaults.realtime_audio_seconds, help="Length of each spoken response")
+    parser.add_argument("--gemini-latency-ms", type=float, default=defaults.gemini_latency_ms, help="generateContent latency")
+
+def config_from_args(args) -> FakeConfig:
+    return FakeConfig(**{field: getattr(args, field) for field in FakeConfig.model_fields})
+
+
+def sample_from_schema(schema: Optional[dict], root: Optional[dict] = None, name: str = ""):
+    """A value matching a Gemini or JSON schema, so structured output parses on the client."""
+    if not schema:
+        return {}
+    root = root or schema
+    if "$ref" in schema:
+        return sample_from_schema(root.get("$defs", {}).get(schema["$ref"].rsplit("/", 1)[-1]), root, name)
+    options = schema.get("anyOf") or schema.get("any_of")
+    if options:
+        options = [option for option in options if str(option.get("type", "")).lower() != "null"] or options
+        return sample_from_schema(options[0], root, name)
+    kind = str(schema.get("type", "object")).lower()
+    if schema.get("enum"):
+        return schema["enum"][0]
+    if kind == "object":
+        properties = schema.get("properties") or {}
+        return {key: sample_from_schema(value, root, key) for key, value in properties.items()}
+    if kind == "array":
+        return [sample_from_schema(schema.get("items"), root, name)]
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 0.5
+    if kind == "boolean":
+        return False
+    if name.endswith("time"):
+        return "00:00"
+    return f"fake {name}".strip()
+
+
+class FakeServices:
+    """State shared by the stand-in endpoints: the live config, uploaded files and counters."""
+
+    def __init__(self, config: Optional[FakeConfig] = None):
+        self.config = config or FakeConfig()
+        self.files: dict[str, dict] = {}
+        self._ids = itertools.count(1)
+        self.counts: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        self.realtime_sessions = 0
+        self.audio_bytes_received = 0
+        self.started = time.time()
+
+    def count(self, api: str):
+        self.counts[api] = self.counts.get(api, 0) + 1
+
+    def should_fail(self, api: str) -> bool:
+        if self.config.error_rate > 0 and random.random() < self.config.error_rate:
+            self.errors[api] = self.errors.get(api, 0) + 1
+            return True
+        return False
+
+    async def wait(self, latency_ms: float):
+        await asyncio.sleep((latency_ms + random.uniform(0, self.config.jitter_ms)) / 1000)
+
+    def stats(self) -> dict:
+        return {
+            "uptime_seconds": time.time() - self.started,
+            "requests": self.counts,
+            "errors_injected": self.errors,
+            "realtime_sessions": self.realtime_sessions,
+            "audio_bytes_received": self.audio_bytes_received,
+            "files": len(self.files),
+        }
+
+
+def create_app(config: Optional[FakeConfig] = None) -> FastAPI:
+    fake = FakeServices(config)
+    app = FastAPI(title="Fake OpenAI and Gemini APIs")
+    app.state.fake = fake
+
+    @app.get("/")
+    def read_root():
+        return {"message": "Fake services are running"}
+
+    @app.get("/fake/config")
+    def get_config():
+        return fake.config
+
+    @app.post("/fake/config")
+    def update_config(changes: dict):
+        fake.config = FakeConfig(**{**fake.config.model_dump(), **changes})
+        return fake.config
+
+    @app.get("/fake/stats")
+    def get_stats():
+        return fake.stats()
+
+    # OpenAI chat completions
+
+    def completion_chunk(completion_id: str, model: str, delta: dict, finish_reason: Optional[str] = None) -> str:
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json_dumps(chunk)}\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        fake.count("chat")
+        if fake.should_fail("chat"):
+            await fake.wait(fake.config.latency_ms)
+            return JSONResponse(
+                {"error": {"message": "Injected failure from fake_services", "type": "server_error", "code": None}},
+                status_code=fake.config.error_status
+            )
+        model = body.get("model", "gpt-fake")
+        completion_id = f"chatcmpl-fake{next(fake._ids)}"
+        words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(fake.config.tokens)]
+
+        if body.get("stream"):
+            async def stream():
+                await fake.wait(fake.config.latency_ms)
+                yield completion_chunk(completion_id, model, {"role": "assistant", "content": ""})
+                for i, word in enumerate(words):
+                    if i:
+                        await asyncio.sleep(fake.config.token_ms / 1000)
+                    yield completion_chunk(completion_id, model, {"content": word if i == 0 else " " + word})
+                yield completion_chunk(completion_id, model, {}, "stop")
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(stream(), media_type="text/event-stream")
+
+        await fake.wait(fake.config.latency_ms + fake.config.token_ms * len(words))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 500, "completion_tokens": len(words), "total_tokens": 500 + len(words)},
+        }
+
+    # OpenAI realtime
+
+    @app.websocket("/v1/realtime")
+    async def realtime(websocket: WebSocket):
+        fake.count("realtime")
+        await fake.wait(fake.config.realtime_connect_ms)
+        await websocket.accept()
+        fake.realtime_sessions += 1
+        speaking: Optional[asyncio.Task] = None
+
+        async def send(event: dict):
+            await websocket.send_text(json_dumps(event))
+
+        async def respond():
+            response_id = f"resp_fake{next(fake._ids)}"
+            item_id = f"item_fake{next(fake._ids)}"
+            await send({"type": "response.created", "response": {"id": response_id, "status": "in_progress"}})
+            await fake.wait(fake.config.latency_ms)
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            chunks = max(1, round(fake.config.realtime_audio_seconds / AUDIO_CHUNK_SECONDS))
+            for index in range(chunks):
+                # Paced like the real API: audio arrives no faster than it plays
+                delay = started + index * AUDIO_CHUNK_SECONDS - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await send({"type": "response.audio.delta", "response_id": response_id, "item_id": item_id,
+                            "output_index": 0, "content_index": 0, "delta": AUDIO_CHUNK})
+            await send({"type": "response.audio.done", "response_id": response_id, "item_id": item_id})
+            await send({"type": "response.done", "response": {"id": response_id, "status": "completed"}})
+
+        try:
+            await send({"type": "session.created", "session": {"id": f"sess_fake{next(fake._ids)}"}})
+            while True:
+                event = json_loads(await websocket.receive_text())
+                kind = event.get("type")
+                if kind == "input_audio_buffer.append":
+                    fake.audio_bytes_received += len(event.get("audio", "")) * 3 // 4
+                elif kind == "session.update":
+                    await send({"type": "session.updated", "session": event.get("session", {})})
+                elif kind == "conversation.item.create":
+                    await send({"type": "conversation.item.created", "item": event.get("item", {})})
+                elif kind == "response.create":
+                    fake.count("realtime_response")
+                    if fake.should_fail("realtime"):
+                        await send({"type": "error", "error": {"type": "server_error", "message": "Injected failure from fake_services"}})
+                    elif speaking is None or speaking.done():
+                        speaking = asyncio.create_task(respond())
+                elif kind == "response.cancel" and speaking is not None:
+                    speaking.cancel()
+                elif kind == "conversation.item.truncate":
+                    await send({"type": "conversation.item.truncated", "item_id": event.get("item_id")})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if speaking is not None:
+                speaking.cancel()
+            fake.realtime_sessions -= 1
+
+    # Gemini Files API (resumable upload) and generateContent
+
+    def gemini_error(message: str, status: int) -> JSONResponse:
+        return JSONResponse({"error": {"code": status, "message": message, "status": "INTERNAL" if status >= 500 else "RESOURCE_EXHAUSTED"}}, status_code=status)
+
+    @app.post("/upload/v1beta/files")
+    async def start_upload(request: Request):
+        body = await request.json()
+        file_id = f"fake{next(fake._ids)}"
+        fake.files[file_id] = {
+            "name": f"files/{file_id}",
+            "mimeType": body.get("file", {}).get("mimeType") or "video/mp4",
+            "sizeBytes": "0",
+            "state": "ACTIVE",
+            "uri": f"{str(request.base_url).rstrip('/')}/v1beta/files/{file_id}",
+        }
+        fake.count("gemini_upload")
+        upload_url = f"{str(request.base_url).rstrip('/')}/fake/uploads/{file_id}"
+        return JSONResponse({}, headers={"x-goog-upload-url": upload_url, "x-goog-upload-status": "active"})
+
+    @app.post("/fake/uploads/{file_id}")
+    async def upload_chunk(file_id: str, request: Request):
+        chunk = await request.body()
+        file = fake.files.get(file_id)
+        if file is None:
+            return gemini_error(f"Unknown upload {file_id}", 404)
+        file["sizeBytes"] = str(int(file["sizeBytes"]) + len(chunk))
+        if "finalize" not in request.headers.get("x-goog-upload-command", ""):
+            return JSONResponse({}, headers={"x-goog-upload-status": "active"})
+        return JSONResponse({"file": file}, headers={"x-goog-upload-status": "final"})
+
+    @app.get("/v1beta/files/{file_id}")
+    def get_file(file_id: str):
+        if file_id not in fake.files:
+            return gemini_error(f"File files/{file_id} not found", 404)
+        return fake.files[file_id]
+
+    @app.delete("/v1beta/files/{file_id}")
+    def delete_file(file_id: str):
+        fake.files.pop(file_id, None)
+        return {}
+
+    @app.post("/v1beta/models/{model}:generateContent")
+    async def generate_content(model: str, request: Request):
+        body = await request.json()
+        fake.count("gemini")
+        await fake.wait(fake.config.gemini_latency_ms)
+        if fake.should_fail("gemini"):
+            return gemini_error("Injected failure from fake_services", fake.config.error_status)
+        generation_config = body.get("generationConfig") or {}
+        schema = generation_config.get("responseJsonSchema") or generation_config.get("responseSchema")
+        text = json_dumps(sample_from_schema(schema)) if schema else " ".join(ANSWER_WORDS)
+        return {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": 1000, "candidatesTokenCount": len(text) // 4, "totalTokenCount": 1000 + len(text) // 4},
+            "modelVersion": model,
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for the OpenAI and Gemini APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import mimetypes
+import os
+import time
+from contextlib import contextmanager
+
+from google.genai import types
+
+VIDEO_PROCESSING_POLL_SECONDS = 1.0
+VIDEO_PROCESSING_TIMEOUT_SECONDS = 300.0
+
+
+def gemini_http_options():
+    """Client options pointing at GEMINI_BASE_URL (e.g. fake_services.py) when it is set."""
+    base_url = os.getenv("GEMINI_BASE_URL")
+    return types.HttpOptions(base_url=base_url) if base_url else None
+
+def video_mime_type(video_path):
+    """Guess a video's MIME type from its extension, defaulting to MP4."""
+    mime_type, _ = mimetypes.guess_type(str(video_path))
+    return mime_type if mime_type and mime_type.startswith("video/") else "video/mp4"
+
+def upload_video(client, video_path):
+    """Upload a video to the Gemini Files API and wait until it can be used in prompts.
+
+    The SDK streams the file from disk in fixed-size chunks, so memory use does
+    not grow with the size of the video.
+    """
+    video_file = client.files.upload(file=video_path, config={"mime_type": video_mime_type(video_path)})
+
+    deadline = time.monotonic() + VIDEO_PROCESSING_TIMEOUT_SECONDS
+    while video_file.state == types.FileState.PROCESSING:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Gemini is still processing {video_path} after {VIDEO_PROCESSING_TIMEOUT_SECONDS:.0f}s")
+        time.sleep(VIDEO_PROCESSING_POLL_SECONDS)
+        video_file = client.files.get(name=video_file.name)
+
+    if video_file.state == types.FileState.FAILED:
+        raise RuntimeError(f"Gemini failed to process {video_path}: {video_file.error}")
+    return video_file
+
+class VideoUpload:
+    """A video that is uploaded the first time a prompt needs it.
+
+    Sharing one VideoUpload between several model calls uploads the clip at
+    most once, and not at all if every call is answered from a cache.
+    """
+
+    def __init__(self, client, video_path, preprocess=None):
+        self.client = client
+        self.video_path = video_path
+        self.preprocess = preprocess
+        self.preprocess_result = None
+        self.upload_seconds = 0.0
+        self.uploaded_at = None
+        self._file = None
+
+    def cache_variant(self) -> str:
+        """Identifies what was actually sent, for cache keys."""
+        return self.preprocess.model_dump_json() if self.preprocess is not None else ""
+
+    def file(self):
+        if self._file is None:
+            started = time.perf_counter()
+            if self.preprocess is None:
+                self._file = upload_video(self.client, self.video_path)
+            else:
+                # Imported here so OpenCV is only needed when preprocessing is used
+                from video_preprocess import preprocessed_video
+                with preprocessed_video(self.video_path, self.preprocess) as result:
+                    self.preprocess_result = result
+                    print(f"Preprocessed {self.video_path}: {result.input_bytes} -> {result.output_bytes} bytes "
+                          f"({result.bytes_saved} saved) in {result.seconds:.2f}s")
+                    self._file = upload_video(self.client, result.output_path)
+            self.uploaded_at = time.perf_counter()
+            self.upload_seconds = self.uploaded_at - started
+        return self._file
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            self.client.files.delete(name=self._file.name)
+        except Exception as e:
+            print(f"Could not delete uploaded file {self._file.name}: {e}")
+        self._file = None
+
+@contextmanager
+def uploaded_video(client, video_path, preprocess=None):
+    """Share one upload of a video between several model calls and delete it afterwards.
+
+    With a video_preprocess.PreprocessConfig the clip is sampled and downscaled
+    before it is uploaded.
+    """
+    video = VideoUpload(client, video_path, preprocess)
+    try:
+        yield video
+    finally:
+        video.close()
+
+def cache_variant(video) -> str:
+    return video.cache_variant() if isinstance(video, VideoUpload) else ""
+
+def video_part(video):
+    """Prompt part referencing an uploaded video (a VideoUpload or an uploaded File)."""
+    video_file = video.file() if isinstance(video, VideoUpload) else video
+    return types.Part.from_uri(file_uri=video_file.uri, mime_type=video_file.mime_type)
@@ -4,6 +4,9 @@ from google.genai import types
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
+from analysis_cache import analysis_cache
+from gemini_files import cache_variant, gemini_http_options, uploaded_video, video_part
+
 import os
 
 # Load Environment Variables
@@ -96,18 +99,29 @@ Confidence Score (Overall): [ ] / 1.0 (Your overall confidence in meeting all re
 
 """
 
-client = genai.Client(api_key=GOOGLE_GEMINI_API_KEY)
-def generate_profile_from_video(video_path):
+client = genai.Client(api_key=GOOGLE_GEMINI_API_KEY, http_options=gemini_http_options())
+def generate_profile_from_video(video_path, video_file=None, use_cache=True, preprocess=None):
+
+    # Reuse the caller's upload when the same video feeds several prompts
+    if video_file is None:
+        with uploaded_video(client, video_path, preprocess) as video_file:
+            return generate_profile_from_video(video_path, video_file, use_cache)
 
     model_name = 'gemini-2.0-flash'
 
+    # Identical video, prompt, model and schema: reuse the earlier result
+    cache_key = None
+    if analysis_cache.enabled(use_cache):
+        cache_key = analysis_cache.key(video_path, PATIENT_PROFILE_PROMPT, model_name, PatientProfile, cache_variant(video_file))
+        cached = analysis_cache.get(cache_key, PatientProfile)
+        if cached is not None:
+            return cached
+
     response = client.models.generate_content(
         model=model_name,
         contents=types.Content(
             parts=[
-                types.Part(
-                    inline_data=types.Blob(data = open(video_path, 'rb').read(), mime_type="video/mp4")
-                ),
+                video_part(video_file),
                 types.Part(
                     text=PATIENT_PROFILE_PROMPT
                 )
@@ -123,6 +137,9 @@ def generate_profile_from_video(video_path):
 
     new_response: PatientProfile = response.parsed
 
+    if cache_key is not None:
+        analysis_cache.put(cache_key, new_response)
+
     return new_response
 
 if __name__ == "__main__":
@@ -6,8 +6,13 @@ from dotenv import load_dotenv
 import json
 
 import gemini_profile
+from analysis_cache import analysis_cache
+from gemini_files import cache_variant, gemini_http_options, uploaded_video, video_part
+from video_segments import format_clock, iter_video_windows
+from ward_index import parse_time
 
 import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 # Load Environment Variables
 load_dotenv()
@@ -156,24 +161,38 @@ Here are personal details on the patient in JSON format:
 
 """
 # Define Gemini Client and Functions
-client = genai.Client(api_key=GOOGLE_GEMINI_API_KEY)
-def video_to_report(video_url):
+client = genai.Client(api_key=GOOGLE_GEMINI_API_KEY, http_options=gemini_http_options())
+def video_to_report(video_url, patient_info=None, video_file=None, use_cache=True, extra_context="", preprocess=None, pose_vitals=None):
 
-    patient_info = gemini_profile.generate_profile_from_video(video_url)
+    # Upload the clip at most once and share it between the profile and report prompts
+    if video_file is None:
+        with uploaded_video(client, video_url, preprocess) as video_file:
+            return video_to_report(video_url, patient_info, video_file, use_cache, extra_context, pose_vitals=pose_vitals)
+
+    if patient_info is None:
+        patient_info = gemini_profile.generate_profile_from_video(video_url, video_file, use_cache)
 
     model_name = 'gemini-2.0-flash'
-    
-    video_bytes = open(video_url, 'rb').read()
+    prompt = REPORT_PROMPT + str(patient_info.model_dump()) + extra_context
+    # Measured vitals (pose_vitals.PoseVitals) ground the model's estimates
+    if pose_vitals is not None:
+        prompt += pose_vitals.prompt_context()
+
+    # Identical video, prompt, model and schema: reuse the earlier result
+    cache_key = None
+    if analysis_cache.enabled(use_cache):
+        cache_key = analysis_cache.key(video_url, prompt, model_name, ReportTemplate, cache_variant(video_file))
+        cached = analysis_cache.get(cache_key, ReportTemplate)
+        if cached is not None:
+            return cached
 
     response = client.models.generate_content(
         model = model_name,
         contents=types.Content(
             parts=[
+                video_part(video_file),
                 types.Part(
-                    inline_data=types.Blob(data = video_bytes, mime_type="video/mp4")
-                ),
-                types.Part(
-                    text=REPORT_PROMPT + str(patient_info.model_dump())
+                    text=prompt
                 )
             ]
         ),
@@ -186,8 +205,169 @@ def video_to_report(video_url):
     print(response.text)
 
     new_response: ReportTemplate = response.parsed
+    if pose_vitals is not None:
+        new_response = pose_vitals.apply(new_response)
+
+    if cache_key is not None:
+        analysis_cache.put(cache_key, new_response)
 
     return new_response
 
+SEGMENT_PROMPT = """
+
+This clip is one segment of a longer recording. It covers {start} to {end} of the recording.
+For every Timestamp, write start_time and end_time as HH:MM:SS measured from the first frame of THIS clip (the clip starts at 00:00:00), not as clock times.
+"""
+
+DANGER_LEVELS = ["Low", "Moderate", "High", "Critical"]
+
+def danger_rank(level):
+    normalized = level.strip().lower()
+    for rank, name in enumerate(DANGER_LEVELS):
+        if name.lower() == normalized:
+            return rank
+    return 0
+
+def shift_timestamp(ts, window_start, window_end):
+    """Convert a clip-relative Timestamp into recording-relative HH:MM:SS times."""
+    length = window_end - window_start
+    start = parse_time(ts.start_time)
+    end = parse_time(ts.end_time)
+    start = 0.0 if start is None else min(max(start, 0.0), length)
+    end = length if end is None else min(max(end, start), length)
+    return ts.model_copy(update={
+        "start_time": format_clock(window_start + start),
+        "end_time": format_clock(window_start + end)
+    })
+
+def quiet_timestamp(start, end, score):
+    """Low danger observation for a segment the activity gate kept from the model."""
+    return Timestamp(
+        start_time=format_clock(start),
+        end_time=format_clock(end),
+        symptoms=[],
+        confidence=0.5,  # based on movement alone, no symptom assessment
+        description=f"No significant movement detected (activity score {score:.1f}); segment was not sent for video analysis.",
+        danger_level="Low"
+    )
+
+def quiet_report(timestamps, room_number="", admission_date=""):
+    """ReportTemplate for footage where every segment was quiet."""
+    # -1.0 marks vitals that were not estimated, as in REPORT_PROMPT
+    unknown = Vitals(heart_rate=-1.0, blood_pressure="N/A", blood_oxygen=-1.0, blood_glucose=-1.0, temperature=-1.0, respiratory_rate=-1.0, pulse_rate=-1.0)
+    return ReportTemplate(
+        room_number=room_number,
+        predicted_symptoms=[],
+        timestamps=timestamps,
+        danger_level="Low",
+        description="No significant movement detected; the footage was not sent for video analysis.",
+        vitals=unknown,
+        admission_date=admission_date
+    )
+
+def merge_observations(observations):
+    """Combine recording-relative Timestamps that report the same symptoms over touching time ranges."""
+    observations = sorted(observations, key=lambda ts: (parse_time(ts.start_time), parse_time(ts.end_time)))
+    merged = []
+    latest = {}  # symptom set -> index in merged of its most recent observation
+    for ts in observations:
+        symptoms = frozenset(s.lower() for s in ts.symptoms)
+        index = latest.get(symptoms)
+        previous = merged[index] if index is not None else None
+        if previous is not None and parse_time(ts.start_time) <= parse_time(previous.end_time):
+            merged[index] = previous.model_copy(update={
+                "end_time": max(previous.end_time, ts.end_time),
+                "confidence": max(previous.confidence, ts.confidence),
+                "danger_level": max(previous.danger_level, ts.danger_level, key=danger_rank),
+                "description": max(previous.description, ts.description, key=len)
+            })
+        else:
+            latest[symptoms] = len(merged)
+            merged.append(ts)
+    return merged
+
+def merge_segment_reports(segments, quiet=()):
+    """Merge (window_start, window_end, ReportTemplate) results into one ReportTemplate.
+
+    Observations from overlapping windows that report the same symptoms over
+    touching time ranges are combined, keeping the higher confidence and
+    danger level. Vitals come from the last window, the overall danger level
+    from the worst one. `quiet` holds recording-relative Timestamps for
+    windows that were skipped by the activity gate.
+    """
+    segments = sorted(segments, key=lambda segment: segment[0])
+    if not segments:
+        return quiet_report(merge_observations(quiet))
+    merged = merge_observations(
+        [shift_timestamp(ts, start, end) for start, end, report in segments for ts in report.timestamps] + list(quiet)
+    )
+
+    predicted_symptoms = []
+    seen = set()
+    for _, _, report in segments:
+        for symptom in report.predicted_symptoms:
+            if symptom.lower() not in seen:
+                seen.add(symptom.lower())
+                predicted_symptoms.append(symptom)
+
+    first, last = segments[0][2], segments[-1][2]
+    worst_start, worst_end, worst = max(segments, key=lambda segment: danger_rank(segment[2].danger_level))
+    return ReportTemplate(
+        room_number=first.room_number,
+        predicted_symptoms=predicted_symptoms,
+        timestamps=merged,
+        danger_level=worst.danger_level,
+        description=f"{len(segments)} segments analysed{f', {len(quiet)} quiet segments skipped' if quiet else ''}. Most severe ({format_clock(worst_start)}-{format_clock(worst_end)}): {worst.description}",
+        vitals=last.vitals,
+        admission_date=first.admission_date
+    )
+
+def analyze_video_segmented(video_url, window_seconds=60.0, overlap_seconds=0.0, patient_info=None, max_workers=2, use_cache=True, preprocess=None, gate=None):
+    """Analyse a long recording window by window and merge the results.
+
+    Windows are cut while the file is being decoded and each one is uploaded,
+    analysed and deleted on its own, so memory and temporary disk use stay
+    bounded by `max_workers` windows however long the recording is. When no
+    patient profile is given it is generated from the first window. With an
+    activity_gate.ActivityGate, quiet windows are not sent to the model and
+    get a "Low" danger observation instead.
+    Returns (patient_info, ReportTemplate) with recording-relative times.
+    """
+    def analyse(start, end, path):
+        try:
+            if gate is not None:
+                active, score = gate.check(path)
+                if not active:
+                    return start, end, quiet_timestamp(start, end, score)
+            context = SEGMENT_PROMPT.format(start=format_clock(start), end=format_clock(end))
+            return start, end, video_to_report(path, patient_info, use_cache=use_cache, extra_context=context, preprocess=preprocess)
+        finally:
+            os.unlink(path)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for start, end, path in iter_video_windows(video_url, window_seconds, overlap_seconds):
+            if patient_info is None:
+                patient_info = gemini_profile.generate_profile_from_video(path, use_cache=use_cache, preprocess=preprocess)
+            pending.add(executor.submit(analyse, start, end, path))
+            # Don't cut further windows while max_workers are still waiting to be analysed
+            if len(pending) >= max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                results.extend(future.result() for future in done)
+        results.extend(future.result() for future in pending)
+
+    if not results:
+        raise ValueError(f"No frames could be read from {video_url}")
+    reports = [result for result in results if isinstance(result[2], ReportTemplate)]
+    quiet = [result[2] for result in results if isinstance(result[2], Timestamp)]
+    if gate is not None:
+        print(f"Activity gate skipped {len(quiet)}/{len(results)} windows ({100 * gate.skipped_fraction:.0f}% of footage) of {video_url}")
+    return patient_info, merge_segment_reports(reports, quiet)
+
+def video_to_report_segmented(video_url, window_seconds=60.0, overlap_seconds=0.0, patient_info=None, max_workers=2, use_cache=True, preprocess=None, gate=None):
+    """Segmented version of video_to_report for long recordings."""
+    return analyze_video_segmented(video_url, window_seconds, overlap_seconds, patient_info, max_workers, use_cache, preprocess, gate)[1]
+
 if __name__ == "__main__":
     video_to_report("C:\\Users\\natha\\Desktop\\Coding\\Projects\\carecam-video-analysis\\test\\peaceful_old_man.mp4")
\ No newline at end of file
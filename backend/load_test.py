@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for the backend and the call service.
+
+Drives /chat, /chat/stream, /patientinfo, /timelineinfo and the
+/media-stream call WebSocket at each of the given concurrency levels and
+reports p50/p95/p99 latency and throughput. With --local it runs offline:
+it starts fake_services.py plus both services pointed at it, so the numbers
+measure our code with a known, configurable upstream latency.
+
+    python load_test.py --local --concurrency 1 10 50 --requests 200
+    python load_test.py --api http://127.0.0.1:8000 --calls ws://127.0.0.1:5050 --scenarios patientinfo timelineinfo
+
+`first` is the time to the first token (chat-stream) or the first audio
+frame of the greeting (media-stream). Save a run with --output and compare
+later runs against it with --baseline; the exit status is 1 when a p95
+latency or the error rate got worse by more than --tolerance.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+import httpx
+import websockets
+
+from fake_services import add_config_arguments, config_from_args
+from media_relay import json_dumps, json_loads, sample_twilio_media
+
+SCENARIOS = ("chat", "chat-stream", "patientinfo", "timelineinfo", "media-stream")
+QUESTION = "How is the patient doing, and has anything changed recently?"
+READY_TIMEOUT_SECONDS = 30.0
+SERVICES_LOG = os.path.join(tempfile.gettempdir(), "load_test_services.log")
+
+
+class LoadTest:
+    """Sends one request of a scenario at a time; each returns seconds to the first token/audio or None."""
+
+    def __init__(self, api: str, calls: str, rooms: list[str], repeat_questions: bool = False, call_seconds: float = 3.0):
+        self.api = api.rstrip("/")
+        self.calls = calls.rstrip("/")
+        self.rooms = rooms
+        self.repeat_questions = repeat_questions
+        self.call_seconds = call_seconds
+        self._questions = itertools.count()
+        self._run_id = int(time.time())
+        self.client = httpx.AsyncClient(timeout=httpx.Timeout(120.0), limits=httpx.Limits(max_connections=None, max_keepalive_connections=None))
+
+    def room(self, index: int) -> str:
+        return self.rooms[index % len(self.rooms)]
+
+    def question(self) -> str:
+        # Distinct questions by default (across runs too), so every request reaches the model instead of the answer cache
+        return QUESTION if self.repeat_questions else f"{QUESTION} (question {self._run_id}-{next(self._questions)})"
+
+    async def chat(self, index: int) -> Optional[float]:
+        response = await self.client.post(f"{self.api}/chat", json={"room_number": self.room(index), "message": self.question()})
+        response.raise_for_status()
+        return None
+
+    async def chat_stream(self, index: int) -> Optional[float]:
+        started = time.perf_counter()
+        first = None
+        event = None
+        request = {"room_number": self.room(index), "message": self.question()}
+        async with self.client.stream("POST", f"{self.api}/chat/stream", json=request) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: "):
+                    if event == "error":
+                        raise RuntimeError(json_loads(line[6:]).get("detail"))
+                    if first is None:
+                        first = time.perf_counter() - started
+                    event = None
+        return first
+
+    async def patientinfo(self, index: int) -> Optional[float]:
+        response = await self.client.get(f"{self.api}/patientinfo/{self.room(index)}")
+        response.raise_for_status()
+        return None
+
+    async def timelineinfo(self, index: int) -> Optional[float]:
+        response = await self.client.get(f"{self.api}/timelineinfo/{self.room(index)}")
+        response.raise_for_status()
+        return None
+
+    async def media_stream(self, index: int) -> Optional[float]:
+        """One call: caller audio every 20 ms for `call_seconds`; returns when the greeting's audio arrived."""
+        stream_sid = f"MZload{index:026d}"
+        first = None
+        async with websockets.connect(f"{self.calls}/media-stream") as ws:
+            started = time.perf_counter()
+            await ws.send(json_dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+            await ws.send(json_dumps({"event": "start", "start": {"streamSid": stream_sid, "customParameters": {"room": self.room(index)}}}))
+
+            async def send_audio():
+                loop = asyncio.get_running_loop()
+                begin = loop.time()
+                for frame in range(int(self.call_seconds / 0.02)):
+                    delay = begin + frame * 0.02 - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    await ws.send(sample_twilio_media(stream_sid, frame))
+                await ws.close()
+
+            sender = asyncio.create_task(send_audio())
+            try:
+                async for message in ws:
+                    if first is None and '"media"' in message:
+                        first = time.perf_counter() - started
+            except websockets.ConnectionClosed:
+                pass
+            await sender
+        if first is None:
+            raise RuntimeError("No greeting audio during the call")
+        return first
+
+    def scenario(self, name: str):
+        return getattr(self, name.replace("-", "_"))
+
+    async def run_level(self, name: str, concurrency: int, requests: int) -> dict:
+        """`requests` requests of a scenario from `concurrency` concurrent workers."""
+        send = self.scenario(name)
+        latencies, firsts, errors = [], [], []
+        indexes = itertools.count()
+
+        async def worker():
+            for index in indexes:
+                if index >= requests:
+                    return
+                started = time.perf_counter()
+                try:
+                    first = await send(index)
+                except Exception as e:
+                    errors.append(f"{type(e).__name__}: {e}")
+                    continue
+                latencies.append(time.perf_counter() - started)
+                if first is not None:
+                    firsts.append(first)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        if errors:
+            print(f"  {name} x{concurrency}: {len(errors)} errors, e.g. {errors[0]}")
+        return {
+            "scenario": name,
+            "concurrency": concurrency,
+            "requests": requests,
+            "errors": len(errors),
+            "error_rate": len(errors) / requests if requests else 0.0,
+            "seconds": elapsed,
+            "throughput": len(latencies) / elapsed if elapsed else 0.0,
+            **percentiles("latency", latencies),
+            **percentiles("first", firsts),
+        }
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def percentiles(prefix: str, seconds: list[float]) -> dict:
+    """p50/p95/p99/max in milliseconds (None without samples)."""
+    if not seconds:
+        return {f"{prefix}_{key}_ms": None for key in ("p50", "p95", "p99", "max")}
+    quantiles = statistics.quantiles(seconds, n=100, method="inclusive") if len(seconds) > 1 else [seconds[0]] * 99
+    return {
+        f"{prefix}_p50_ms": 1000 * quantiles[49],
+        f"{prefix}_p95_ms": 1000 * quantiles[94],
+        f"{prefix}_p99_ms": 1000 * quantiles[98],
+        f"{prefix}_max_ms": 1000 * max(seconds),
+    }
+
+def format_ms(value: Optional[float]) -> str:
+    return f"{value:.1f}" if value is not None else "-"
+
+def print_results(results: list[dict]):
+    print(f"\n{'scenario':<14}{'conc':>6}{'ok':>7}{'err':>5}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'first p50':>11}{'first p99':>11}")
+    for r in results:
+        print(
+            f"{r['scenario']:<14}{r['concurrency']:>6}{r['requests'] - r['errors']:>7}{r['errors']:>5}{r['throughput']:>9.1f}"
+            f"{format_ms(r['latency_p50_ms']):>9}{format_ms(r['latency_p95_ms']):>9}{format_ms(r['latency_p99_ms']):>9}"
+            f"{format_ms(r['latency_max_ms']):>9}{format_ms(r['first_p50_ms']):>11}{format_ms(r['first_p99_ms']):>11}"
+        )
+    print("(latencies in ms)")
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """Regressions against a saved run: p95 latency or error rate worse by more than `tolerance`."""
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        before = previous.get((r["scenario"], r["concurrency"]))
+        if before is None:
+            continue
+        label = f"{r['scenario']} x{r['concurrency']}"
+        for key in ("latency_p95_ms", "first_p95_ms"):
+            if r[key] is not None and before.get(key) and r[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{label}: {key} {before[key]:.1f} -> {r[key]:.1f}")
+        if r["error_rate"] > before["error_rate"] + tolerance * max(before["error_rate"], 0.01):
+            regressions.append(f"{label}: error rate {before['error_rate']:.1%} -> {r['error_rate']:.1%}")
+    return regressions
+
+
+# Local services
+
+def start_local_services(fake_port: int, api_port: int, call_port: int) -> list[subprocess.Popen]:
+    """fake_services.py, app.py and call_service.py as subprocesses, the services pointed at the fakes."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "fake-key",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+        "REALTIME_URL": f"ws://127.0.0.1:{fake_port}/v1/realtime",
+        "GEMINI_BASE_URL": f"http://127.0.0.1:{fake_port}",
+        "PORT": str(call_port),
+    }
+    commands = [
+        [sys.executable, "fake_services.py", "--port", str(fake_port)],
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(api_port), "--log-level", "warning"],
+        [sys.executable, "call_service.py"],
+    ]
+    # The services log every request; keep that out of the report
+    log = open(SERVICES_LOG, "w")
+    print(f"Service logs: {SERVICES_LOG}")
+    return [subprocess.Popen(command, cwd=here, env=env, stdout=log, stderr=subprocess.STDOUT) for command in commands]
+
+async def wait_until_ready(urls: list[str], processes: list[subprocess.Popen]):
+    deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+    async with httpx.AsyncClient() as client:
+        for url in urls:
+            while True:
+                if any(process.poll() is not None for process in processes):
+                    raise RuntimeError(f"A local service exited during startup; see {SERVICES_LOG}")
+                try:
+                    (await client.get(url)).raise_for_status()
+                    break
+                except httpx.HTTPError:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"{url} did not come up within {READY_TIMEOUT_SECONDS:.0f}s")
+                    await asyncio.sleep(0.2)
+
+def stop_local_services(processes: list[subprocess.Popen]):
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT)
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def run(args) -> list[dict]:
+    processes = []
+    api, calls = args.api, args.calls
+    try:
+        if args.local:
+            api, calls = f"http://127.0.0.1:{args.api_port}", f"ws://127.0.0.1:{args.call_port}"
+            fake = f"http://127.0.0.1:{args.fake_port}"
+            processes = start_local_services(args.fake_port, args.api_port, args.call_port)
+            await wait_until_ready([f"{fake}/", f"{api}/", f"http://127.0.0.1:{args.call_port}/"], processes)
+            async with httpx.AsyncClient() as client:
+                (await client.post(f"{fake}/fake/config", json=config_from_args(args).model_dump())).raise_for_status()
+
+        rooms = args.rooms
+        if not rooms:
+            async with httpx.AsyncClient() as client:
+                rooms = (await client.get(f"{api}/ward/rooms")).json()["rooms"]
+        if not rooms:
+            raise RuntimeError("No rooms with data; pass --rooms")
+        print(f"Rooms: {', '.join(rooms)}")
+
+        load_test = LoadTest(api, calls, rooms, args.repeat_questions, args.call_seconds)
+        results = []
+        try:
+            for name in args.scenarios:
+                for concurrency in args.concurrency:
+                    requests = args.calls_per_level if name == "media-stream" else args.requests
+                    result = await load_test.run_level(name, concurrency, max(requests, concurrency))
+                    print(f"  {name} x{concurrency}: {result['throughput']:.1f}/s, p95 {format_ms(result['latency_p95_ms'])} ms")
+                    results.append(result)
+        finally:
+            await load_test.close()
+        return results
+    finally:
+        stop_local_services(processes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the backend and call service and report latency percentiles")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=200, help="HTTP requests per scenario and concurrency level")
+    parser.add_argument("--calls-per-level", type=int, default=20, help="Calls per concurrency level for media-stream")
+    parser.add_argument("--call-seconds", type=float, default=3.0, help="Length of each simulated call")
+    parser.add_argument("--rooms", nargs="+", help="Rooms to spread requests over (default: every room in the ward)")
+    parser.add_argument("--repeat-questions", action="store_true", help="Ask the same question every time, so chat answers come from the cache")
+    parser.add_argument("--api", default="http://127.0.0.1:8000", help="app.py base URL")
+    parser.add_argument("--calls", default="ws://127.0.0.1:5050", help="call_service.py base URL")
+    parser.add_argument("--local", action="store_true", help="Start fake_services.py and both services locally and test those")
+    parser.add_argument("--fake-port", type=int, default=8900)
+    parser.add_argument("--api-port", type=int, default=8100)
+    parser.add_argument("--call-port", type=int, default=5150)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against results saved with --output")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative p95 regression against --baseline")
+    add_config_arguments(parser.add_argument_group("fake upstream (with --local)"))
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Fast path for relaying call audio between Twilio and the OpenAI realtime API.
+
+Audio frames dominate the traffic on both legs of a call: Twilio sends a
+"media" event every 20 ms and OpenAI streams "response.audio.delta" events
+back. Both carry base64 audio in the same encoding (g711 u-law), so the
+payload can be copied across as-is. Only the few envelope fields the relay
+needs are located in the raw message; everything else is parsed normally
+with the fastest JSON codec available (orjson if installed).
+
+The two legs of a call are decoupled by bounded `RelayQueue`s, so a slow
+socket on one side never stalls reads on the other; when a queue is full
+the oldest (stalest) audio is dropped and counted. Control messages are
+never dropped.
+
+Compare the fast path with full JSON parsing and base64 re-encoding with:
+
+    python media_relay.py --calls 1 10 50 100 --seconds 3
+"""
+import argparse
+import asyncio
+import base64
+import json
+import re
+import statistics
+import time
+from collections import deque
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Base64 never contains quotes or backslashes, so payloads can be cut out of the raw JSON text
+_TWILIO_MEDIA = re.compile(r'"event"\s*:\s*"media"')
+_TWILIO_PAYLOAD = re.compile(r'"payload"\s*:\s*"([^"]*)"')
+_TWILIO_TIMESTAMP = re.compile(r'"timestamp"\s*:\s*"?(\d+)')
+_OPENAI_AUDIO_DELTA = re.compile(r'"type"\s*:\s*"response\.audio\.delta"')
+_OPENAI_DELTA = re.compile(r'"delta"\s*:\s*"([^"]*)"')
+_OPENAI_ITEM_ID = re.compile(r'"item_id"\s*:\s*"([^"]*)"')
+# Both event types put the type first, so it is enough to look at the start of the message
+ENVELOPE_PREFIX = 64
+
+
+def json_loads(message):
+    return orjson.loads(message) if orjson is not None else json.loads(message)
+
+def json_dumps(data) -> str:
+    return orjson.dumps(data).decode() if orjson is not None else json.dumps(data)
+
+
+def parse_twilio_media(message: str) -> Optional[tuple[str, int]]:
+    """(payload, timestamp_ms) of a Twilio media event, or None for any other event."""
+    if not _TWILIO_MEDIA.search(message, 0, ENVELOPE_PREFIX):
+        return None
+    payload = _TWILIO_PAYLOAD.search(message)
+    timestamp = _TWILIO_TIMESTAMP.search(message)
+    if payload is None or timestamp is None:
+        return None
+    return payload.group(1), int(timestamp.group(1))
+
+def parse_openai_audio_delta(message: str) -> Optional[tuple[str, Optional[str]]]:
+    """(delta, item_id) of an OpenAI response.audio.delta event, or None for any other event."""
+    if not _OPENAI_AUDIO_DELTA.search(message, 0, ENVELOPE_PREFIX):
+        return None
+    delta = _OPENAI_DELTA.search(message)
+    if delta is None:
+        return None
+    item_id = _OPENAI_ITEM_ID.search(message, 0, delta.start())
+    return delta.group(1), item_id.group(1) if item_id else None
+
+def audio_append_event(payload: str) -> str:
+    """The input_audio_buffer.append event for a Twilio payload, without re-encoding it."""
+    return '{"type":"input_audio_buffer.append","audio":"' + payload + '"}'
+
+def twilio_media_event(stream_sid: str, payload: str) -> str:
+    """The Twilio media event for an OpenAI audio delta, without re-encoding it."""
+    return '{"event":"media","streamSid":' + json.dumps(stream_sid) + ',"media":{"payload":"' + payload + '"}}'
+
+def twilio_mark_event(stream_sid: str, name: str = "responsePart") -> str:
+    return json_dumps({"event": "mark", "streamSid": stream_sid, "mark": {"name": name}})
+
+
+def merge_audio(payloads: list[str]) -> str:
+    """One base64 payload for consecutive audio frames; only needed when frames have queued up."""
+    if len(payloads) == 1:
+        return payloads[0]
+    return base64.b64encode(b"".join(base64.b64decode(payload) for payload in payloads)).decode()
+
+
+class RelayQueue:
+    """Bounded FIFO between the two legs of a call.
+
+    `put` never waits. Only audio is bounded: when `maxsize` droppable items
+    are queued the oldest of them is dropped, since late audio is worth less
+    than current audio. Control messages (put with droppable=False), such as
+    session updates, truncates, marks and clears, are never dropped and stay
+    in order with the audio around them. The consumer takes
+    everything queued at once with `get_batch`, so a backlog can be merged
+    into fewer sends. Depth, lag (time from put to get) and drops are kept
+    for monitoring.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items: deque = deque()  # (queued_at, droppable, item)
+        self._droppable = 0
+        self._ready = asyncio.Event()
+        self._closed = False
+        self.queued = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.cleared = 0
+        self.max_depth = 0
+        self.lag_seconds_total = 0.0
+        self.max_lag_seconds = 0.0
+
+    def put(self, item, droppable: bool = False):
+        if droppable:
+            if self._droppable >= self.maxsize:
+                for index, (_, queued_droppable, _) in enumerate(self._items):
+                    if queued_droppable:
+                        del self._items[index]
+                        break
+                self.dropped += 1
+            else:
+                self._droppable += 1
+        self._items.append((time.monotonic(), droppable, item))
+        self.queued += 1
+        self.max_depth = max(self.max_depth, len(self._items))
+        self._ready.set()
+
+    def clear(self) -> int:
+        """Drop everything queued, e.g. audio made stale by an interruption."""
+        cleared = len(self._items)
+        self._items.clear()
+        self._droppable = 0
+        self.cleared += cleared
+        return cleared
+
+    def close(self):
+        """Let the consumer finish what is queued and then stop."""
+        self._closed = True
+        self._ready.set()
+
+    async def get_batch(self) -> Optional[list]:
+        """Every queued item, oldest first; None once the queue is closed and empty."""
+        while not self._items:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        now = time.monotonic()
+        lag = now - self._items[0][0]
+        self.lag_seconds_total += sum(now - queued_at for queued_at, _, _ in self._items)
+        self.max_lag_seconds = max(self.max_lag_seconds, lag)
+        batch = [item for _, _, item in self._items]
+        self._items.clear()
+        self._droppable = 0
+        self.delivered += len(batch)
+        return batch
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self._items),
+            "max_depth": self.max_depth,
+            "queued": self.queued,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "cleared": self.cleared,
+            "mean_lag_ms": 1000 * self.lag_seconds_total / self.delivered if self.delivered else 0.0,
+            "max_lag_ms": 1000 * self.max_lag_seconds,
+        }
+
+
+def is_open(ws) -> bool:
+    """Whether a websockets connection is open, for both the legacy and the asyncio client."""
+    if hasattr(ws, "open"):
+        return ws.open
+    from websockets.protocol import State
+    return ws.state is State.OPEN
+
+
+# Benchmark
+
+FRAME_SECONDS = 0.02  # Twilio sends 20 ms of 8 kHz u-law per media event
+DELTA_BYTES = 4800  # a typical OpenAI audio delta: 600 ms of u-law
+
+def sample_twilio_media(stream_sid: str, index: int) -> str:
+    return json.dumps({
+        "event": "media",
+        "sequenceNumber": str(index + 2),
+        "media": {"track": "inbound", "chunk": str(index + 1), "timestamp": str(20 * index), "payload": base64.b64encode(bytes(160)).decode()},
+        "streamSid": stream_sid
+    })
+
+def sample_openai_delta(index: int) -> str:
+    return json.dumps({
+        "type": "response.audio.delta",
+        "event_id": f"event_{index}",
+        "response_id": "resp_1",
+        "item_id": "item_1",
+        "output_index": 0,
+        "content_index": 0,
+        "delta": base64.b64encode(bytes(DELTA_BYTES)).decode()
+    })
+
+def relay_legacy(twilio_message: str, openai_message: str, stream_sid: str) -> tuple[str, str]:
+    """What call_service did per frame before the fast path."""
+    data = json.loads(twilio_message)
+    inbound = json.dumps({"type": "input_audio_buffer.append", "audio": data["media"]["payload"]})
+    response = json.loads(openai_message)
+    payload = base64.b64encode(base64.b64decode(response["delta"])).decode("utf-8")
+    outbound = json.dumps({"event": "media", "streamSid": stream_sid, "media": {"payload": payload}})
+    return inbound, outbound
+
+def relay_fast(twilio_message: str, openai_message: str, stream_sid: str) -> tuple[str, str]:
+    payload, _ = parse_twilio_media(twilio_message)
+    delta, _ = parse_openai_audio_delta(openai_message)
+    return audio_append_event(payload), twilio_media_event(stream_sid, delta)
+
+async def _simulate_call(relay, call: int, frames: int, latencies: list):
+    """One call relaying a Twilio frame and an OpenAI delta every 20 ms, recording how late each finishes."""
+    stream_sid = f"MZ{call:032d}"
+    loop = asyncio.get_running_loop()
+    twilio_message = sample_twilio_media(stream_sid, call)
+    openai_message = sample_openai_delta(call)
+    started = loop.time()
+    for index in range(frames):
+        due = started + index * FRAME_SECONDS
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        relay(twilio_message, openai_message, stream_sid)
+        latencies.append(loop.time() - due)
+
+async def _run_calls(relay, calls: int, frames: int) -> list:
+    latencies = []
+    await asyncio.gather(*(_simulate_call(relay, call, frames, latencies) for call in range(calls)))
+    return latencies
+
+def benchmark(calls=(1, 10, 50, 100), seconds: float = 3.0, frames: int = 20000):
+    """Print relay throughput and the latency it adds per frame at each number of concurrent calls."""
+    stream_sid = "MZ" + "0" * 32
+    twilio_message = sample_twilio_media(stream_sid, 1)
+    openai_message = sample_openai_delta(1)
+    print(f"JSON codec: {'orjson' if orjson is not None else 'json'}; one frame = 20 ms inbound + {DELTA_BYTES} byte outbound delta\n")
+    print(f"{'path':<8}{'frames/s':>12}{'us/frame':>10}")
+    for name, relay in (("legacy", relay_legacy), ("fast", relay_fast)):
+        started = time.perf_counter()
+        for _ in range(frames):
+            relay(twilio_message, openai_message, stream_sid)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<8}{frames / elapsed:>12,.0f}{1e6 * elapsed / frames:>10.1f}")
+
+    print(f"\nAdded latency per frame with frames paced at 20 ms per call ({seconds:.0f} s)")
+    print(f"{'calls':>6}{'path':>8}{'p50':>10}{'p99':>10}{'max':>10}")
+    for count in calls:
+        for name, relay in (("legacy", relay_legacy), ("fast", relay_fast)):
+            latencies = asyncio.run(_run_calls(relay, count, int(seconds / FRAME_SECONDS)))
+            quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+            print(f"{count:>6}{name:>8}{1000 * quantiles[49]:>8.2f}ms{1000 * quantiles[98]:>8.2f}ms{1000 * max(latencies):>8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the call audio relay")
+    parser.add_argument("--calls", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--seconds", type=float, default=3.0, help="Simulated call length for the latency test")
+    parser.add_argument("--frames", type=int, default=20000, help="Frames for the throughput test")
+    args = parser.parse_args()
+    benchmark(args.calls, args.seconds, args.frames)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+from typing import get_args, get_origin
+
+from pydantic import BaseModel
+
+# Define data models
+class CloseContacts(BaseModel):
+    name: str
+    relationship: str
+    location: str
+    phone_number: str
+
+class PatientInfo(BaseModel):
+    full_name: str
+    location: str
+    age: int
+    pre_existing_conditions: list[str]
+    current_symptoms: list[str]
+    diagnosis: str
+    allergies: str
+    medications: list[str]
+    close_contacts: list[CloseContacts]
+
+class Timestamp(BaseModel):
+    start_time: str
+    end_time: str
+    symptoms: list[str]
+    confidence: float
+    description: str
+    danger_level: str
+
+class Vitals(BaseModel):
+    heart_rate: float
+    blood_pressure: str
+    blood_oxygen: float
+    blood_glucose: float
+    temperature: float
+    respiratory_rate: float
+    pulse_rate: float
+
+class PatientTimestamp(BaseModel):
+    room_number: str
+    predicted_symptoms: list[str]
+    timestamps: list[Timestamp]
+    danger_level: str
+    description: str
+    vitals: Vitals
+    admission_date: str
+
+class CombinedData(BaseModel):
+    patient_info: PatientInfo
+    patient_timestamp: PatientTimestamp
+
+class ChatRequest(BaseModel):
+    room_number: str
+    message: str
+
+class ChatResponse(BaseModel):
+    response: str
+
+def projection_include(model: type[BaseModel], fields: list[str]) -> dict:
+    """Turn dotted field paths like "patient_timestamp.vitals" into a model_dump include spec.
+
+    List fields are projected item-wise, so "patient_timestamp.timestamps.danger_level"
+    keeps only the danger level of every observation. Raises ValueError on unknown fields.
+    """
+    include = {}
+    for field in fields:
+        node, current = include, model
+        parts = field.split(".")
+        for i, part in enumerate(parts):
+            if current is None or part not in current.model_fields:
+                raise ValueError(f"Unknown field: {field}")
+            if i == len(parts) - 1:
+                node[part] = True
+                break
+            annotation = current.model_fields[part].annotation
+            child = node.setdefault(part, {})
+            if child is True:
+                break  # the whole parent is already included
+            if get_origin(annotation) is list:
+                child = child.setdefault("__all__", {})
+                annotation = get_args(annotation)[0]
+            node = child
+            current = annotation if isinstance(annotation, type) and issubclass(annotation, BaseModel) else None
+    return include
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Continuous ward monitoring: watch per-room video segments and keep
+timelineinfo/ up to date.
+
+    python monitor.py incoming/ --concurrency 2
+    python monitor.py incoming/ --stream 101=rtsp://camera-101/live --segment-seconds 30
+
+Segments are video files in incoming/<room>/, written by a recorder or by
+--stream, which cuts a camera stream into clips. Each room has a deadline
+that depends on its current danger level: critical rooms are re-evaluated
+every few seconds, while rooms that stay "Low" back off up to
+MAX_REVISIT_SECONDS. When several rooms are due, the most dangerous and then
+the most overdue go first, and at most --concurrency analyses run at once,
+which fixes the compute and Gemini budget. A High or Critical room that is
+already past its deadline may take one of MONITOR_URGENT_SLOTS extra slots
+instead of waiting for a free one. Only the newest segment of a room is
+analysed; older ones it supersedes are skipped. Once the analysis is stored,
+the segment and those it superseded are deleted, or moved to --archive-dir.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import cv2
+
+import gemini_profile
+import gemini_video
+from activity_gate import ACTIVITY_THRESHOLD, ActivityGate
+from gemini_video import danger_rank
+from models import PatientInfo, PatientTimestamp
+from storage import RoomStore, clean_room_number, get_room_store, sort_rooms
+from video_segments import VIDEO_EXTENSIONS, format_clock, iter_video_windows
+from ward_index import parse_time
+
+MONITOR_CONCURRENCY = int(os.getenv("MONITOR_CONCURRENCY", 2))
+MONITOR_URGENT_SLOTS = int(os.getenv("MONITOR_URGENT_SLOTS", 1))
+MONITOR_ARCHIVE_DIR = os.getenv("MONITOR_ARCHIVE_DIR")
+MONITOR_POLL_SECONDS = 1.0
+SEGMENT_SETTLE_SECONDS = 2.0  # files modified more recently may still be being written
+REVISIT_SECONDS = {"Critical": 5.0, "High": 15.0, "Moderate": 60.0, "Low": 120.0}
+MAX_REVISIT_SECONDS = float(os.getenv("MAX_REVISIT_SECONDS", 900))
+DEADLINE_GRACE_SECONDS = 2.0
+
+
+def revisit_seconds(danger_level: str) -> float:
+    return REVISIT_SECONDS.get(gemini_video.DANGER_LEVELS[danger_rank(danger_level)], REVISIT_SECONDS["Low"])
+
+def scan_segments(source_dir: str, settle_seconds: float = SEGMENT_SETTLE_SECONDS) -> dict[str, list[tuple[int, str]]]:
+    """Finished segment files per room directory, as (mtime_ns, path) oldest first."""
+    cutoff = time.time_ns() - int(settle_seconds * 1e9)
+    segments = {}
+    with os.scandir(source_dir) as rooms:
+        for room_entry in rooms:
+            if not room_entry.is_dir() or room_entry.name.startswith("."):
+                continue
+            files = []
+            with os.scandir(room_entry.path) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.lower().endswith(VIDEO_EXTENSIONS):
+                        mtime = entry.stat().st_mtime_ns
+                        if mtime <= cutoff:
+                            files.append((mtime, entry.path))
+            segments[clean_room_number(room_entry.name)] = sorted(files)
+    return segments
+
+def retire_segments(paths, archive_dir: Optional[str] = None):
+    """Delete processed segment files, or move them to archive_dir/<room>/."""
+    for path in paths:
+        try:
+            if archive_dir is None:
+                os.remove(path)
+            else:
+                room_dir = os.path.join(archive_dir, os.path.basename(os.path.dirname(path)))
+                os.makedirs(room_dir, exist_ok=True)
+                shutil.move(path, os.path.join(room_dir, os.path.basename(path)))
+        except FileNotFoundError:
+            pass
+
+def video_duration(video_path) -> float:
+    video_capture = cv2.VideoCapture(str(video_path))
+    try:
+        fps = video_capture.get(cv2.CAP_PROP_FPS) or 30.0
+        return video_capture.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    finally:
+        video_capture.release()
+
+def wall_clock_timestamp(ts, started_at: datetime, duration: float):
+    """Convert a clip-relative Timestamp to the wall-clock "HH:MM AM/PM" times used in timelineinfo/."""
+    ts = gemini_video.shift_timestamp(ts, 0.0, duration)
+    return ts.model_copy(update={
+        "start_time": (started_at + timedelta(seconds=parse_time(ts.start_time))).strftime("%I:%M %p"),
+        "end_time": (started_at + timedelta(seconds=parse_time(ts.end_time))).strftime("%I:%M %p")
+    })
+
+def update_timeline(room: str, previous: Optional[PatientTimestamp], report, observations, quiet: bool = False) -> PatientTimestamp:
+    """Add one segment's observations to a room's timeline and take over its current state."""
+    predicted_symptoms = list(previous.predicted_symptoms) if previous else []
+    seen = {symptom.lower() for symptom in predicted_symptoms}
+    for symptom in report.predicted_symptoms:
+        if symptom.lower() not in seen:
+            seen.add(symptom.lower())
+            predicted_symptoms.append(symptom)
+    return PatientTimestamp(
+        room_number=room,
+        predicted_symptoms=predicted_symptoms,
+        timestamps=(list(previous.timestamps) if previous else []) + [ts.model_dump() for ts in observations],
+        danger_level=report.danger_level,
+        description=report.description,
+        # A quiet segment says nothing about vitals; keep the last estimate
+        vitals=previous.vitals if quiet and previous else report.vitals.model_dump(),
+        admission_date=previous.admission_date if previous else datetime.now().strftime("%Y-%m-%d")
+    )
+
+def analyse_segment(room: str, segment_path: str, store: RoomStore, gate: Optional[ActivityGate] = None) -> str:
+    """Analyse one segment, append it to the room's timeline and return the room's new danger level.
+
+    The patient profile is generated from the first segment of a room that
+    has none. With a gate, quiet segments of Low/Moderate rooms skip the
+    report call; rooms at High or above are always analysed, since a still
+    patient there is not evidence of recovery.
+    """
+    duration = video_duration(segment_path)
+    started_at = datetime.fromtimestamp(os.stat(segment_path).st_mtime) - timedelta(seconds=duration)
+
+    if store.signature(room, "info") is None:
+        profile = gemini_profile.generate_profile_from_video(segment_path)
+        store.save(room, "info", PatientInfo.model_validate(profile.model_dump()))
+    patient_info = store.load(room, "info")
+    previous = store.load(room, "timeline") if store.signature(room, "timeline") is not None else None
+
+    quiet, score = False, None
+    if gate is not None and (previous is None or danger_rank(previous.danger_level) < danger_rank("High")):
+        active, score = gate.check(segment_path)
+        quiet = not active
+    if quiet:
+        report = gemini_video.quiet_report([gemini_video.quiet_timestamp(0, duration, score)])
+    else:
+        context = gemini_video.SEGMENT_PROMPT.format(start=format_clock(0), end=format_clock(duration))
+        report = gemini_video.video_to_report(segment_path, patient_info, extra_context=context)
+
+    observations = [wall_clock_timestamp(ts, started_at, duration) for ts in report.timestamps]
+    timeline = update_timeline(room, previous, report, observations, quiet)
+    if previous is None:
+        store.save(room, "timeline", timeline)
+        return timeline.danger_level
+
+    # Only the new observations and changed fields are written, not the whole timeline
+    state = {"danger_level": timeline.danger_level, "description": timeline.description}
+    if timeline.predicted_symptoms != previous.predicted_symptoms:
+        state["predicted_symptoms"] = timeline.predicted_symptoms
+    store.append(room, observations, vitals=None if quiet else timeline.vitals, **state)
+    return timeline.danger_level
+
+
+class RoomState:
+    """Scheduling state of one monitored room."""
+
+    def __init__(self, room: str, danger_level: str = "Low"):
+        self.room = room
+        self.danger_level = danger_level
+        self.interval = revisit_seconds(danger_level)
+        self.next_due = 0.0  # time.monotonic(); 0 means due now
+        self.pending: list[tuple[int, str]] = []  # unanalysed segments, oldest first
+        self.analysed_mtime = 0
+        self.last_analysed: Optional[float] = None
+        self.running = False
+        self.analyses = 0
+        self.failures = 0
+        self.superseded = 0
+        self.deadline_misses = 0
+        self.max_lateness = 0.0
+
+    def stats(self, now: float) -> dict:
+        return {
+            "danger_level": self.danger_level,
+            "interval_seconds": self.interval,
+            "staleness_seconds": now - self.last_analysed if self.last_analysed is not None else None,
+            "pending_segments": len(self.pending),
+            "running": self.running,
+            "analyses": self.analyses,
+            "failures": self.failures,
+            "superseded": self.superseded,
+            "deadline_misses": self.deadline_misses,
+            "max_lateness_seconds": self.max_lateness,
+        }
+
+
+class RoomMonitor:
+    """Schedules segment analyses across rooms under a global concurrency cap.
+
+    `analyse(room, segment_path)` runs in a worker thread and returns the
+    room's danger level afterwards; the default is analyse_segment. After a
+    successful analysis the segment and the ones it superseded are retired
+    (deleted, or moved to `archive_dir`); after a failure they stay and are
+    picked up again.
+    """
+
+    def __init__(
+        self,
+        source_dir: str,
+        store: Optional[RoomStore] = None,
+        concurrency: int = MONITOR_CONCURRENCY,
+        urgent_slots: int = MONITOR_URGENT_SLOTS,
+        archive_dir: Optional[str] = MONITOR_ARCHIVE_DIR,
+        analyse=None,
+        gate: Optional[ActivityGate] = None,
+        poll_seconds: float = MONITOR_POLL_SECONDS,
+        settle_seconds: float = SEGMENT_SETTLE_SECONDS
+    ):
+        self.source_dir = source_dir
+        self.store = store if store is not None else get_room_store()
+        self.concurrency = concurrency
+        self.urgent_slots = urgent_slots
+        self.archive_dir = archive_dir
+        self.analyse = analyse or (lambda room, path: analyse_segment(room, path, self.store, gate))
+        self.poll_seconds = poll_seconds
+        self.settle_seconds = settle_seconds
+        self.rooms: dict[str, RoomState] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+
+    def _room(self, room: str) -> RoomState:
+        state = self.rooms.get(room)
+        if state is None:
+            danger_level = "Low"
+            if self.store.signature(room, "timeline") is not None:
+                danger_level = self.store.load(room, "timeline").danger_level
+            state = self.rooms[room] = RoomState(room, danger_level)
+        return state
+
+    async def scan(self):
+        segments = await asyncio.to_thread(scan_segments, self.source_dir, self.settle_seconds)
+        for room, files in segments.items():
+            state = self._room(room)
+            state.pending = [segment for segment in files if segment[0] > state.analysed_mtime]
+
+    def due_rooms(self, now: float) -> list[RoomState]:
+        """Rooms with new footage whose deadline has passed, most dangerous then most overdue first."""
+        due = [state for state in self.rooms.values() if state.pending and not state.running and now >= state.next_due]
+        return sorted(due, key=lambda state: (-danger_rank(state.danger_level), state.next_due))
+
+    def dispatch(self):
+        now = time.monotonic()
+        for state in self.due_rooms(now):
+            lateness = now - state.next_due if state.next_due else 0.0
+            late = lateness > DEADLINE_GRACE_SECONDS
+            # A dangerous room that already missed its deadline doesn't wait for a regular slot
+            slots = self.concurrency
+            if late and danger_rank(state.danger_level) >= danger_rank("High"):
+                slots += self.urgent_slots
+            if len(self._tasks) >= slots:
+                continue
+            state.max_lateness = max(state.max_lateness, lateness)
+            if late:
+                state.deadline_misses += 1
+                print(f"[monitor] room {state.room}: {state.danger_level} analysis {lateness:.0f}s past its deadline")
+            segments = state.pending
+            mtime, path = segments[-1]
+            state.superseded += len(segments) - 1
+            state.pending = []
+            state.running = True
+            task = asyncio.create_task(self._run(state, mtime, path, [segment_path for _, segment_path in segments]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, state: RoomState, mtime: int, path: str, segments: list[str]):
+        started = time.perf_counter()
+        try:
+            danger_level = await asyncio.to_thread(self.analyse, state.room, path)
+        except Exception as e:
+            state.failures += 1
+            print(f"[monitor] room {state.room}: analysis of {os.path.basename(path)} failed: {e}")
+        else:
+            state.analysed_mtime = max(state.analysed_mtime, mtime)
+            state.analyses += 1
+            # Stable rooms back off; any change, or anything above Low, resets to the level's interval
+            if danger_rank(danger_level) == 0 and danger_rank(state.danger_level) == 0:
+                state.interval = min(state.interval * 2, MAX_REVISIT_SECONDS)
+            else:
+                state.interval = revisit_seconds(danger_level)
+            state.danger_level = danger_level
+            await asyncio.to_thread(retire_segments, segments, self.archive_dir)
+            print(f"[monitor] room {state.room}: {danger_level} after {time.perf_counter() - started:.1f}s, next in {state.interval:.0f}s")
+        finally:
+            state.running = False
+            state.last_analysed = time.monotonic()
+            state.next_due = state.last_analysed + state.interval
+            self._wakeup.set()
+
+    async def run(self, stop: Optional[asyncio.Event] = None):
+        """Scan, dispatch and wait for the next poll or finished analysis until `stop` is set."""
+        while stop is None or not stop.is_set():
+            await self.scan()
+            self.dispatch()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "running": len(self._tasks),
+            "concurrency": self.concurrency,
+            "urgent_slots": self.urgent_slots,
+            "rooms": {room: self.rooms[room].stats(now) for room in sort_rooms(self.rooms)},
+        }
+
+
+def record_stream(room: str, url: str, source_dir: str, segment_seconds: float, stop: threading.Event):
+    """Cut a camera stream into segment files in source_dir/<room>/ until `stop` is set."""
+    room_dir = os.path.join(source_dir, clean_room_number(room))
+    partial_dir = os.path.join(room_dir, ".partial")  # not scanned, same filesystem for the rename
+    os.makedirs(partial_dir, exist_ok=True)
+    windows = iter_video_windows(url, segment_seconds, output_dir=partial_dir)
+    try:
+        for _, _, path in windows:
+            os.replace(path, os.path.join(room_dir, datetime.now().strftime("%Y%m%d-%H%M%S.mp4")))
+            if stop.is_set():
+                break
+    finally:
+        windows.close()
+
+def print_stats(stats: dict):
+    print(f"\n{'room':<8}{'danger':<10}{'every':>7}{'stale':>8}{'done':>6}{'skipped':>9}{'late':>6}{'failed':>8}")
+    for room, s in stats["rooms"].items():
+        stale = f"{s['staleness_seconds']:.0f}s" if s["staleness_seconds"] is not None else "-"
+        print(f"{room:<8}{s['danger_level']:<10}{s['interval_seconds']:>6.0f}s{stale:>8}{s['analyses']:>6}{s['superseded']:>9}{s['deadline_misses']:>6}{s['failures']:>8}")
+
+
+async def monitor(args):
+    gate = ActivityGate(args.gate_threshold) if args.gate_threshold is not None else None
+    room_monitor = RoomMonitor(args.source_dir, concurrency=args.concurrency, archive_dir=args.archive_dir, gate=gate)
+    stop = threading.Event()
+    for spec in args.stream or []:
+        room, url = spec.split("=", 1)
+        threading.Thread(target=record_stream, args=(room, url, args.source_dir, args.segment_seconds, stop), daemon=True).start()
+
+    async def report():
+        while True:
+            await asyncio.sleep(args.report_seconds)
+            print_stats(room_monitor.stats())
+
+    reporter = asyncio.create_task(report())
+    try:
+        await room_monitor.run()
+    finally:
+        stop.set()
+        reporter.cancel()
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuously analyse per-room video segments, prioritised by danger level")
+    parser.add_argument("source_dir", help="Directory with one sub-directory of segments per room")
+    parser.add_argument("--concurrency", type=int, default=MONITOR_CONCURRENCY, help="Analyses running at once")
+    parser.add_argument("--archive-dir", default=MONITOR_ARCHIVE_DIR, help="Move processed segments here instead of deleting them")
+    parser.add_argument("--stream", action="append", metavar="ROOM=URL", help="Record a camera stream into the room's directory")
+    parser.add_argument("--segment-seconds", type=float, default=30.0, help="Segment length for --stream")
+    parser.add_argument("--gate-threshold", type=float, nargs="?", const=ACTIVITY_THRESHOLD, help="Skip the report call for quiet segments of Low/Moderate rooms")
+    parser.add_argument("--report-seconds", type=float, default=30.0, help="How often to print scheduling stats")
+    args = parser.parse_args()
+    os.makedirs(args.source_dir, exist_ok=True)
+    try:
+        asyncio.run(monitor(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
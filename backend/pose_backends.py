@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Run the YOLO pose model on different CPU runtimes.
+
+    torch          models/yolo11n-pose.pt, eager PyTorch (default)
+    onnx           exported to models/yolo11n-pose.onnx, run with onnxruntime
+    openvino       exported to models/yolo11n-pose_openvino_model/
+    onnx-int8      static INT8 quantization of the ONNX export
+    openvino-int8  INT8 OpenVINO model quantized with NNCF
+
+Exports are written next to the .pt file on first use and reused after that.
+INT8 models are calibrated on frames sampled from local clips (test/ by
+default), so no dataset download is needed. Select a backend with
+POSE_BACKEND, and compare latency, throughput and keypoint agreement with:
+
+    python pose_backends.py test/ --backends torch onnx onnx-int8 openvino openvino-int8
+"""
+import argparse
+import os
+import shutil
+import time
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from pose_keypoints import NUM_KEYPOINTS
+from video_segments import video_paths
+
+POSE_MODEL_PATH = os.getenv("POSE_MODEL_PATH", "models/yolo11n-pose.pt")
+POSE_BACKEND = os.getenv("POSE_BACKEND", "torch")
+POSE_IMAGE_SIZE = 640
+CALIBRATION_VIDEOS = os.getenv("POSE_CALIBRATION_VIDEOS", "test")
+CALIBRATION_FRAMES = 128
+BACKENDS = ("torch", "onnx", "openvino", "onnx-int8", "openvino-int8")
+
+
+def sample_frames(paths, count: int):
+    """About `count` BGR frames spread evenly over the given clips."""
+    videos = video_paths(paths)
+    frames = []
+    per_video = max(1, -(-count // max(len(videos), 1)))
+    for path in videos:
+        video_capture = cv2.VideoCapture(path)
+        total = int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT)) or per_video
+        wanted = set(np.linspace(0, total - 1, per_video, dtype=int).tolist())
+        index = 0
+        while wanted and video_capture.grab():
+            if index in wanted:
+                ret, frame = video_capture.retrieve()
+                if ret:
+                    frames.append(frame)
+                wanted.discard(index)
+            index += 1
+        video_capture.release()
+    return frames[:count]
+
+def _model_input(frame, image_size: int = POSE_IMAGE_SIZE):
+    """Preprocess a frame exactly as ultralytics does for a fixed-size model: 1x3xHxW float32."""
+    from ultralytics.data.augment import LetterBox
+    image = LetterBox((image_size, image_size), auto=False)(image=frame)
+    return np.ascontiguousarray(image[..., ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+def _export_onnx(model_path: str) -> str:
+    return YOLO(model_path).export(format="onnx", imgsz=POSE_IMAGE_SIZE, dynamic=True)
+
+def _export_openvino(model_path: str) -> str:
+    return YOLO(model_path).export(format="openvino", imgsz=POSE_IMAGE_SIZE, dynamic=True)
+
+def _quantize_onnx(fp32_path: str, int8_path: str, calibration):
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.inputs = iter({input_name: _model_input(frame)} for frame in calibration)
+
+        def get_next(self):
+            return next(self.inputs, None)
+
+    fp32_model = onnx.load(fp32_path)
+    # The pose head decodes boxes and keypoints; keep it in float so coordinates stay accurate
+    head = [node.name for node in fp32_model.graph.node if "/model.23/" in node.name and node.op_type != "Conv"]
+    quantize_static(
+        fp32_path,
+        int8_path,
+        FrameReader(fp32_model.graph.input[0].name),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        weight_type=QuantType.QInt8,
+        activation_type=QuantType.QUInt8,
+        nodes_to_exclude=head
+    )
+    # ultralytics reads class names, stride and keypoint shape from the model metadata
+    int8_model = onnx.load(int8_path)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, int8_path)
+
+def _quantize_openvino(fp32_dir: str, int8_dir: str, calibration):
+    import nncf
+    import openvino as ov
+
+    xml = next(name for name in os.listdir(fp32_dir) if name.endswith(".xml"))
+    model = ov.Core().read_model(os.path.join(fp32_dir, xml))
+    # Keep the box/keypoint decoding arithmetic in float, as ultralytics does for its own INT8 export
+    ignored_scope = nncf.IgnoredScope(types=["Multiply", "Subtract", "Sigmoid"])
+    quantized = nncf.quantize(model, nncf.Dataset(calibration, _model_input), preset=nncf.QuantizationPreset.MIXED, ignored_scope=ignored_scope)
+    os.makedirs(int8_dir, exist_ok=True)
+    ov.save_model(quantized, os.path.join(int8_dir, xml))
+    shutil.copy(os.path.join(fp32_dir, "metadata.yaml"), os.path.join(int8_dir, "metadata.yaml"))
+
+def export_pose_model(backend: str, model_path: str = POSE_MODEL_PATH, calibration_videos=CALIBRATION_VIDEOS) -> str:
+    """Path of the model file/directory for `backend`, exporting it if it doesn't exist yet."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown pose backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    if backend == "torch":
+        return model_path
+
+    stem = os.path.splitext(model_path)[0]
+    fp32_path = f"{stem}.onnx" if backend.startswith("onnx") else f"{stem}_openvino_model"
+    if not os.path.exists(fp32_path):
+        fp32_path = _export_onnx(model_path) if backend.startswith("onnx") else _export_openvino(model_path)
+    if not backend.endswith("-int8"):
+        return fp32_path
+
+    int8_path = f"{stem}_int8.onnx" if backend == "onnx-int8" else f"{stem}_int8_openvino_model"
+    if not os.path.exists(int8_path):
+        calibration = sample_frames(calibration_videos, CALIBRATION_FRAMES)
+        if not calibration:
+            raise ValueError(f"No calibration frames found in {calibration_videos}")
+        print(f"Calibrating {backend} on {len(calibration)} frames from {calibration_videos}")
+        if backend == "onnx-int8":
+            _quantize_onnx(fp32_path, int8_path, calibration)
+        else:
+            _quantize_openvino(fp32_path, int8_path, calibration)
+    return int8_path
+
+def load_pose_model(backend: str = POSE_BACKEND, model_path: str = POSE_MODEL_PATH) -> YOLO:
+    return YOLO(export_pose_model(backend, model_path), task="pose")
+
+
+def _raw_keypoints(model, frames):
+    """Undecoded keypoint x/y for every anchor (frames x 34 x anchors), straight from the network."""
+    import torch
+    outputs = []
+    for frame in frames:
+        output = model.predictor.model(torch.from_numpy(_model_input(frame)))
+        output = output[0] if isinstance(output, (list, tuple)) else output
+        output = output.cpu().numpy() if hasattr(output, "cpu") else np.asarray(output)
+        # Channels: 4 box, one score per class, then 17 x (x, y, visibility)
+        keypoints = output[0, -3 * NUM_KEYPOINTS:]
+        outputs.append(np.concatenate([keypoints[0::3], keypoints[1::3]]))
+    return np.stack(outputs)
+
+def _keypoint_error(reference, results, conf: float = 0.5):
+    """Mean pixel distance between matching keypoints and the share of frames with the same person count."""
+    distances = []
+    same_count = 0
+    for expected, actual in zip(reference, results):
+        expected_kp = expected.keypoints.data.cpu().numpy() if expected.keypoints is not None else np.empty((0, 17, 3))
+        actual_kp = actual.keypoints.data.cpu().numpy() if actual.keypoints is not None else np.empty((0, 17, 3))
+        same_count += len(expected_kp) == len(actual_kp)
+        for person in expected_kp:
+            if not len(actual_kp):
+                break
+            # Pair each reference person with the nearest detection
+            match = actual_kp[np.argmin(np.abs(actual_kp[:, :, :2] - person[:, :2]).mean(axis=(1, 2)))]
+            visible = (person[:, 2] >= conf) & (match[:, 2] >= conf)
+            distances.extend(np.linalg.norm(person[visible, :2] - match[visible, :2], axis=1))
+    return (float(np.mean(distances)) if distances else 0.0), same_count / max(len(reference), 1)
+
+def benchmark(paths, backends=BACKENDS, frames_per_video: int = 16, batch_size: int = 8, model_path: str = POSE_MODEL_PATH):
+    """Print per-frame latency, batched throughput and keypoint agreement with the first backend.
+
+    "raw err" is the mean difference of the network's keypoint outputs over
+    all anchors, "kp err" that of the detected people's visible keypoints.
+    """
+    frames = sample_frames(paths, frames_per_video * len(video_paths(paths)))
+    print(f"{len(frames)} frames from {len(video_paths(paths))} clips, batch size {batch_size}\n")
+    print(f"{'backend':<15}{'load':>8}{'latency':>10}{'p95':>9}{'fps':>8}{'raw err':>9}{'kp err':>9}{'same n':>8}")
+
+    reference = reference_raw = None
+    for backend in backends:
+        started = time.perf_counter()
+        model = load_pose_model(backend, model_path)
+        model.predict(frames[:1], verbose=False)  # warm up
+        load_seconds = time.perf_counter() - started
+
+        latencies = []
+        results = []
+        for frame in frames:
+            frame_started = time.perf_counter()
+            results.extend(model.predict(frame, verbose=False))
+            latencies.append(time.perf_counter() - frame_started)
+
+        started = time.perf_counter()
+        for i in range(0, len(frames), batch_size):
+            model.predict(frames[i:i + batch_size], verbose=False)
+        throughput = len(frames) / (time.perf_counter() - started)
+
+        raw = _raw_keypoints(model, frames)
+        if reference is None:
+            reference, reference_raw = results, raw
+        raw_error = float(np.abs(raw - reference_raw).mean())
+        error, same = _keypoint_error(reference, results)
+        print(f"{backend:<15}{load_seconds:>7.1f}s{1000 * np.median(latencies):>8.1f}ms{1000 * np.percentile(latencies, 95):>7.1f}ms"
+              f"{throughput:>8.1f}{raw_error:>7.2f}px{error:>7.1f}px{100 * same:>7.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the pose model and benchmark CPU backends")
+    parser.add_argument("paths", nargs="+", help="Video files or directories")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--model", default=POSE_MODEL_PATH)
+    parser.add_argument("--frames-per-video", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+    benchmark(args.paths, args.backends, args.frames_per_video, args.batch_size, args.model)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Compact on-disk format for pose keypoints.
+
+A pose directory holds plain .npy arrays that can be memory-mapped, so hours
+of pose data load without copying or re-running inference:
+
+    keypoints.npy      frames x persons x 17 x (x, y, conf), float16 by default
+    scores.npy         frames x persons person confidence, same dtype
+    timestamps.npy     frames, seconds from the start of the video
+    frame_indices.npy  frames, index of each row in the source video
+    meta.json          fps, frame size, keypoint names, source video
+
+Frames with fewer people than the busiest frame are padded with NaN. People
+are ordered by confidence, so person 0 is the most confident detection in that
+frame (pose_vitals links them across frames into tracks).
+"""
+import json
+import os
+
+import numpy as np
+
+KEYPOINT_DICT = {
+    0: 'nose',
+    1: 'left_eye',
+    2: 'right_eye',
+    3: 'left_ear',
+    4: 'right_ear',
+    5: 'left_shoulder',
+    6: 'right_shoulder',
+    7: 'left_elbow',
+    8: 'right_elbow',
+    9: 'left_wrist',
+    10: 'right_wrist',
+    11: 'left_hip',
+    12: 'right_hip',
+    13: 'left_knee',
+    14: 'right_knee',
+    15: 'left_ankle',
+    16: 'right_ankle'
+}
+NUM_KEYPOINTS = len(KEYPOINT_DICT)
+
+
+class PoseKeypoints:
+    """Keypoint arrays for one video, as written by KeypointWriter."""
+
+    def __init__(self, keypoints, scores, timestamps, frame_indices, meta):
+        self.keypoints = keypoints
+        self.scores = scores
+        self.timestamps = timestamps
+        self.frame_indices = frame_indices
+        self.meta = meta
+
+    @property
+    def fps(self) -> float:
+        return self.meta["fps"]
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def joint(self, name: str):
+        """frames x persons x (x, y, conf) for one named keypoint."""
+        index = next(i for i, joint in KEYPOINT_DICT.items() if joint == name)
+        return self.keypoints[:, :, index, :]
+
+
+class KeypointWriter:
+    """Collects per-frame detections and writes them in the pose directory format."""
+
+    def __init__(self, fps: float, frame_size: tuple[int, int] = (0, 0), dtype=np.float16):
+        self.fps = fps
+        self.frame_size = frame_size
+        self.dtype = np.dtype(dtype)
+        self._frames = []  # (frame_index, keypoints n x 17 x 3, scores n)
+
+    def add(self, frame_index: int, keypoints, scores):
+        keypoints = np.asarray(keypoints, dtype=self.dtype).reshape(-1, NUM_KEYPOINTS, 3)
+        scores = np.asarray(scores, dtype=self.dtype).reshape(-1)
+        order = np.argsort(-scores, kind="stable")
+        self._frames.append((frame_index, keypoints[order], scores[order]))
+
+    def add_result(self, frame_index: int, result):
+        """Add one ultralytics pose Results object."""
+        if result.keypoints is None or result.boxes is None or len(result.boxes) == 0:
+            self.add(frame_index, np.empty((0, NUM_KEYPOINTS, 3)), np.empty(0))
+        else:
+            self.add(frame_index, result.keypoints.data.cpu().numpy(), result.boxes.conf.cpu().numpy())
+
+    def save(self, directory, source=None):
+        os.makedirs(directory, exist_ok=True)
+        frames = len(self._frames)
+        persons = max((len(scores) for _, _, scores in self._frames), default=0)
+
+        keypoints = np.lib.format.open_memmap(os.path.join(directory, "keypoints.npy"), mode="w+", dtype=self.dtype, shape=(frames, persons, NUM_KEYPOINTS, 3))
+        scores = np.lib.format.open_memmap(os.path.join(directory, "scores.npy"), mode="w+", dtype=self.dtype, shape=(frames, persons))
+        keypoints[:] = np.nan
+        scores[:] = np.nan
+        frame_indices = np.empty(frames, dtype=np.int64)
+        for row, (frame_index, frame_keypoints, frame_scores) in enumerate(self._frames):
+            keypoints[row, :len(frame_scores)] = frame_keypoints
+            scores[row, :len(frame_scores)] = frame_scores
+            frame_indices[row] = frame_index
+        keypoints.flush()
+        scores.flush()
+        del keypoints, scores
+
+        np.save(os.path.join(directory, "frame_indices.npy"), frame_indices)
+        np.save(os.path.join(directory, "timestamps.npy"), frame_indices / self.fps if self.fps else frame_indices.astype(np.float64))
+        with open(os.path.join(directory, "meta.json"), 'w') as f:
+            json.dump({
+                "fps": self.fps,
+                "frame_size": list(self.frame_size),
+                "frames": frames,
+                "max_persons": persons,
+                "dtype": self.dtype.name,
+                "keypoints": [KEYPOINT_DICT[i] for i in range(NUM_KEYPOINTS)],
+                "source": str(source) if source is not None else None
+            }, f, indent=2)
+
+
+def load_keypoints(directory, mmap_mode="r") -> PoseKeypoints:
+    """Load a pose directory; arrays are memory-mapped unless `mmap_mode` is None."""
+    with open(os.path.join(directory, "meta.json"), 'r') as f:
+        meta = json.load(f)
+    arrays = [np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in ("keypoints", "scores", "timestamps", "frame_indices")]
+    return PoseKeypoints(*arrays, meta)
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Measure simple vital signs from pose keypoints (see pose_keypoints), so the
+video report is grounded in local measurements instead of pure guesses:
+
+- respiratory rate from the vertical oscillation of the shoulders, found by
+  detrending sliding windows and taking the strongest FFT peak in the
+  breathing band
+- movement energy and agitation from frame-to-frame keypoint displacement
+- lying / in-bed fraction from torso orientation and an optional bed region
+- possible falls: a fast drop of the hips ending in a lying posture
+
+Detections are first linked into tracks across frames (nearest body
+centre), since the per-frame person order follows detection confidence and
+jumps between people when several are in view. The signals are then
+vectorized over the whole recording with NumPy:
+
+    python pose_vitals.py poses/panic --bed 200 150 900 700
+"""
+import argparse
+import json
+import time
+import warnings
+from typing import Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from pydantic import BaseModel
+
+from pose_keypoints import load_keypoints
+
+LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP = 5, 6, 11, 12
+MIN_KEYPOINT_CONFIDENCE = 0.3
+BREATHING_BAND_HZ = (0.1, 1.0)  # 6-60 breaths per minute
+RESPIRATORY_WINDOW_SECONDS = 30.0
+RESPIRATORY_STEP_SECONDS = 5.0
+MIN_RESPIRATORY_SECONDS = 10.0
+MIN_RESPIRATORY_CONFIDENCE = 0.25  # share of breathing-band power in the peak
+AGITATION_THRESHOLD = 0.5  # torso lengths per second, averaged over joints
+LYING_ANGLE_DEGREES = 45.0  # torso further than this from vertical counts as lying
+FALL_DROP = 0.8  # torso lengths
+FALL_WINDOW_SECONDS = 1.0
+TRACK_MAX_JUMP = 0.5  # body sizes a person's centre may move between consecutive detections
+TRACK_MAX_GAP_SECONDS = 2.0  # a track not matched for this long is closed
+
+
+class PoseVitals(BaseModel):
+    duration_seconds: float
+    coverage: float  # fraction of frames with a visible torso
+    respiratory_rate: Optional[float] = None  # breaths per minute
+    respiratory_confidence: float = 0.0
+    movement_energy: float = 0.0  # mean torso lengths per second
+    agitation_fraction: float = 0.0
+    lying_fraction: float = 0.0
+    in_bed_fraction: Optional[float] = None  # only with a bed region
+    fall_times: list[float] = []  # seconds from the start of the video
+
+    def prompt_context(self) -> str:
+        """Measurements to append to REPORT_PROMPT."""
+        lines = [
+            "",
+            f"Measurements computed from body keypoints over {self.duration_seconds:.0f}s of video "
+            f"(patient visible in {100 * self.coverage:.0f}% of frames). Prefer these over visual estimates:"
+        ]
+        if self.respiratory_rate is not None:
+            lines.append(f"- Respiratory rate: {self.respiratory_rate:.0f} breaths/min (signal confidence {self.respiratory_confidence:.2f})")
+        lines.append(f"- Movement energy: {self.movement_energy:.2f} torso lengths/s; agitated in {100 * self.agitation_fraction:.0f}% of frames")
+        lines.append(f"- Lying down in {100 * self.lying_fraction:.0f}% of frames")
+        if self.in_bed_fraction is not None:
+            lines.append(f"- In bed in {100 * self.in_bed_fraction:.0f}% of frames")
+        if self.fall_times:
+            lines.append("- Possible fall at " + ", ".join(f"{t:.0f}s" for t in self.fall_times))
+        return "\n".join(lines) + "\n"
+
+    def apply(self, report):
+        """Return `report` with measured vitals in place of estimated ones."""
+        if self.respiratory_rate is None or self.respiratory_confidence < MIN_RESPIRATORY_CONFIDENCE:
+            return report
+        vitals = report.vitals.model_copy(update={"respiratory_rate": round(self.respiratory_rate, 1)})
+        return report.model_copy(update={"vitals": vitals})
+
+
+def _confident_xy(keypoints):
+    """frames x persons x 17 x 2 float32 positions, NaN where not confidently detected."""
+    kp = np.asarray(keypoints, dtype=np.float32)
+    xy = kp[..., :2].copy()
+    xy[~(kp[..., 2] >= MIN_KEYPOINT_CONFIDENCE)] = np.nan
+    return xy
+
+def track_people(xy, t) -> np.ndarray:
+    """Link detections across frames into tracks.
+
+    `xy` is frames x persons x 17 x 2 (NaN where not detected). Each frame's
+    detections are matched greedily, closest first, to the open tracks whose
+    last centre is within TRACK_MAX_JUMP body sizes; the rest start new
+    tracks. Returns a frames x tracks array of person indices (-1 where the
+    track has no detection), tracks ordered by how many frames they cover.
+    """
+    frames, persons = xy.shape[:2]
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN people
+        centres = np.nanmean(xy, axis=2)
+        sizes = np.hypot(*(np.nanmax(xy, axis=2) - np.nanmin(xy, axis=2)).transpose(2, 0, 1))
+    present = np.isfinite(centres).all(axis=2) & (sizes > 0)
+
+    assigned = []  # per track: frames array of person indices
+    last_centre, last_size, last_time = [], [], []
+    for f in range(frames):
+        detections = np.flatnonzero(present[f])
+        if not len(detections):
+            continue
+        open_tracks = [k for k in range(len(assigned)) if t[f] - last_time[k] <= TRACK_MAX_GAP_SECONDS]
+        pairs = []
+        for k in open_tracks:
+            distances = np.hypot(*(centres[f, detections] - last_centre[k]).T) / last_size[k]
+            pairs.extend((distance, k, p) for distance, p in zip(distances, detections) if distance <= TRACK_MAX_JUMP)
+        used_tracks, used_people = set(), set()
+        for _, k, p in sorted(pairs):
+            if k in used_tracks or p in used_people:
+                continue
+            used_tracks.add(k)
+            used_people.add(p)
+            assigned[k][f] = p
+            last_centre[k], last_size[k], last_time[k] = centres[f, p], sizes[f, p], t[f]
+        for p in detections:
+            if p not in used_people:
+                track = np.full(frames, -1, dtype=np.int64)
+                track[f] = p
+                assigned.append(track)
+                last_centre.append(centres[f, p])
+                last_size.append(sizes[f, p])
+                last_time.append(t[f])
+    if not assigned:
+        return np.full((frames, 0), -1, dtype=np.int64)
+    tracks = np.stack(assigned, axis=1)
+    return tracks[:, np.argsort(-(tracks >= 0).sum(axis=0), kind="stable")]
+
+def _person_xy(keypoints, t, person: int):
+    """frames x 17 x 2 float32 positions of one tracked person, NaN where they weren't detected.
+
+    People are tracked across frames (see track_people); `person` 0 is the
+    track seen in the most frames, e.g. the patient rather than a visitor.
+    """
+    xy = _confident_xy(keypoints)
+    frames = xy.shape[0]
+    missing = np.full((frames, xy.shape[2], 2), np.nan, dtype=np.float32)
+    if xy.shape[1] == 1:
+        return xy[:, 0] if person == 0 else missing
+    tracks = track_people(xy, t)
+    if tracks.shape[1] <= person:
+        return missing
+    track = tracks[:, person]
+    seen = track >= 0
+    missing[seen] = xy[np.flatnonzero(seen), track[seen]]
+    return missing
+
+def _midpoint(xy, a, b):
+    """Midpoint of two joints, or whichever one is visible."""
+    first, second = xy[:, a], xy[:, b]
+    both = np.isfinite(first) & np.isfinite(second)
+    return np.where(both, (first + second) / 2, np.where(np.isfinite(first), first, second))
+
+def _fill_gaps(t, y):
+    """Linearly interpolate NaNs; None if fewer than two samples are valid."""
+    valid = np.isfinite(y)
+    if valid.sum() < 2:
+        return None
+    return np.interp(t, t[valid], y[valid])
+
+def respiratory_rate_series(t, signal, window_seconds: float = RESPIRATORY_WINDOW_SECONDS, step_seconds: float = RESPIRATORY_STEP_SECONDS):
+    """Breathing rate over sliding windows of a chest-motion signal.
+
+    Returns (window_centre_seconds, breaths_per_minute, confidence) arrays,
+    where confidence is the share of breathing-band power in the peak bin.
+    """
+    empty = (np.empty(0), np.empty(0), np.empty(0))
+    if len(t) < 2 or t[-1] - t[0] < MIN_RESPIRATORY_SECONDS:
+        return empty
+    fs = 1.0 / np.median(np.diff(t))
+    # Resample onto a uniform grid: stride and dropped frames make t uneven
+    grid = np.arange(t[0], t[-1], 1.0 / fs)
+    filled = _fill_gaps(t, signal)
+    if filled is None:
+        return empty
+    y = np.interp(grid, t, filled)
+
+    n = min(len(y), int(round(window_seconds * fs)))
+    step = max(1, int(round(step_seconds * fs)))
+    windows = sliding_window_view(y, n)[::step]
+
+    # Remove each window's linear trend (slow drift, posture changes)
+    x = np.arange(n) - (n - 1) / 2
+    slopes = windows @ x / (x @ x)
+    windows = windows - windows.mean(axis=1, keepdims=True) - slopes[:, None] * x
+
+    power = np.abs(np.fft.rfft(windows * np.hanning(n), axis=1)) ** 2
+    freqs = np.fft.rfftfreq(n, 1.0 / fs)
+    band = (freqs >= BREATHING_BAND_HZ[0]) & (freqs <= min(BREATHING_BAND_HZ[1], fs / 2))
+    if not band.any():
+        return empty
+    band_power = power[:, band]
+    peaks = band_power.argmax(axis=1)
+    totals = band_power.sum(axis=1)
+    confidence = np.divide(band_power[np.arange(len(peaks)), peaks], totals, out=np.zeros_like(totals), where=totals > 0)
+    centres = grid[0] + (np.arange(len(windows)) * step + n / 2) / fs
+    return centres, freqs[band][peaks] * 60.0, confidence
+
+def compute_pose_vitals(pose, person: int = 0, bed_region: Optional[tuple[float, float, float, float]] = None) -> PoseVitals:
+    """Vitals for one tracked person (0 = the one seen in the most frames) of a PoseKeypoints recording.
+
+    `bed_region` is (x0, y0, x1, y1) in pixels; the patient is in bed while
+    their hips are inside it.
+    """
+    t = np.asarray(pose.timestamps, dtype=np.float64)
+    frames = len(t)
+    duration = float(t[-1] - t[0]) if frames > 1 else 0.0
+    if frames < 2:
+        return PoseVitals(duration_seconds=duration, coverage=0.0)
+
+    xy = _person_xy(pose.keypoints, t, person)
+    shoulders = _midpoint(xy, LEFT_SHOULDER, RIGHT_SHOULDER)
+    hips = _midpoint(xy, LEFT_HIP, RIGHT_HIP)
+    torso = hips - shoulders
+    torso_length = np.hypot(torso[:, 0], torso[:, 1])
+    visible = np.isfinite(torso_length) & (torso_length > 0)
+    coverage = float(visible.mean())
+    if not visible.any():
+        return PoseVitals(duration_seconds=duration, coverage=coverage)
+    scale = float(np.median(torso_length[visible]))
+
+    # Breathing: shoulders rise and fall relative to the hips (or on their own under a blanket)
+    hip_y = _fill_gaps(t, hips[:, 1])
+    chest = shoulders[:, 1] - (hip_y if hip_y is not None else 0.0)
+    _, rates, confidences = respiratory_rate_series(t, chest / scale)
+    respiratory_rate = respiratory_confidence = None
+    if len(rates):
+        best = confidences >= MIN_RESPIRATORY_CONFIDENCE
+        pick = best if best.any() else np.ones_like(best)
+        respiratory_rate = float(np.median(rates[pick]))
+        respiratory_confidence = float(np.median(confidences[pick]))
+
+    # Movement: mean joint speed in torso lengths per second
+    dt = np.diff(t)[:, None]
+    speeds = np.linalg.norm(np.diff(xy, axis=0), axis=2) / scale / np.where(dt > 0, dt, np.nan)
+    valid_speeds = np.isfinite(speeds)
+    counts = valid_speeds.sum(axis=1)
+    energy = np.where(counts > 0, np.where(valid_speeds, speeds, 0.0).sum(axis=1) / np.maximum(counts, 1), np.nan)
+    moving = np.isfinite(energy)
+    movement_energy = float(energy[moving].mean()) if moving.any() else 0.0
+    agitation_fraction = float((energy[moving] > AGITATION_THRESHOLD).mean()) if moving.any() else 0.0
+
+    # Posture: torso angle from vertical in the image
+    angle = np.degrees(np.arctan2(np.abs(torso[:, 0]), np.abs(torso[:, 1])))
+    lying = visible & (angle > LYING_ANGLE_DEGREES)
+    lying_fraction = float(lying[visible].mean())
+
+    in_bed_fraction = None
+    in_bed = np.ones(frames, dtype=bool)
+    if bed_region is not None:
+        x0, y0, x1, y1 = bed_region
+        centre = np.where(np.isfinite(hips), hips, shoulders)
+        in_bed = (centre[:, 0] >= x0) & (centre[:, 0] <= x1) & (centre[:, 1] >= y0) & (centre[:, 1] <= y1)
+        located = np.isfinite(centre).all(axis=1)
+        in_bed_fraction = float(in_bed[located].mean()) if located.any() else None
+
+    # Falls: the hips drop by FALL_DROP torso lengths within FALL_WINDOW_SECONDS and end up lying (out of bed)
+    fall_times = []
+    lag = max(1, int(round(FALL_WINDOW_SECONDS / np.median(np.diff(t)))))
+    if hip_y is not None and frames > lag:
+        # Smooth over a quarter of the window so keypoint jitter doesn't look like a drop
+        width = max(1, lag // 4)
+        hip_y = np.convolve(np.pad(hip_y, (width // 2, width - 1 - width // 2), mode="edge"), np.ones(width) / width, mode="valid")
+        landed = lying[lag:] & (~in_bed[lag:] if bed_region is not None else True)
+        falling = ((hip_y[lag:] - hip_y[:-lag]) / scale > FALL_DROP) & landed
+        starts = np.flatnonzero(falling & ~np.concatenate(([False], falling[:-1])))
+        fall_times = [round(float(t[i]), 1) for i in starts]
+
+    return PoseVitals(
+        duration_seconds=duration,
+        coverage=coverage,
+        respiratory_rate=respiratory_rate,
+        respiratory_confidence=respiratory_confidence or 0.0,
+        movement_energy=movement_energy,
+        agitation_fraction=agitation_fraction,
+        lying_fraction=lying_fraction,
+        in_bed_fraction=in_bed_fraction,
+        fall_times=fall_times
+    )
+
+def vitals_from_directory(directory, person: int = 0, bed_region=None) -> PoseVitals:
+    """compute_pose_vitals for a pose directory written by yolo-segmentation.py --keypoints."""
+    return compute_pose_vitals(load_keypoints(directory), person, bed_region)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute respiratory rate, agitation and fall indicators from pose keypoints")
+    parser.add_argument("directory", help="Pose directory written by yolo-segmentation.py --keypoints")
+    parser.add_argument("--person", type=int, default=0)
+    parser.add_argument("--bed", type=float, nargs=4, metavar=("X0", "Y0", "X1", "Y1"), help="Bed region in pixels")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    vitals = vitals_from_directory(args.directory, args.person, tuple(args.bed) if args.bed else None)
+    elapsed = time.perf_counter() - started
+    print(json.dumps(vitals.model_dump(), indent=2))
+    print(f"Computed in {1000 * elapsed:.1f} ms ({vitals.duration_seconds / max(elapsed, 1e-9):.0f}x real time)")
+
+if __name__ == "__main__":
+    main()
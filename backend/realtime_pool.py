@@ -0,0 +1,221 @@
+"""
+Pool of pre-connected, pre-configured OpenAI realtime sessions.
+
+Opening the realtime websocket (TLS handshake, auth) and configuring the
+session take a few hundred milliseconds that otherwise sit between a caller
+picking up and hearing the greeting. The pool does that work ahead of time:
+`checkout()` hands out a session that is already connected and configured,
+and the pool opens a replacement in the background.
+
+Idle sessions are pinged every `health_seconds`, and closed once they have
+been idle for `max_idle_seconds` (realtime sessions have a maximum
+lifetime). Point REALTIME_URL at a local websocket server to test without
+OpenAI.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+import websockets
+
+from media_relay import is_open, json_loads
+
+REALTIME_URL = os.getenv("REALTIME_URL", "wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-12-17")
+REALTIME_POOL_SIZE = int(os.getenv("REALTIME_POOL_SIZE", 2))
+REALTIME_POOL_MAX_IDLE_SECONDS = float(os.getenv("REALTIME_POOL_MAX_IDLE_SECONDS", 300))
+REALTIME_POOL_HEALTH_SECONDS = float(os.getenv("REALTIME_POOL_HEALTH_SECONDS", 20))
+REALTIME_CONNECT_TIMEOUT = 10.0
+PING_TIMEOUT = 5.0
+
+
+class PooledSession:
+    """A realtime websocket and when it was made ready."""
+
+    def __init__(self, ws, ready_at: float, warmup_seconds: float):
+        self.ws = ws
+        self.ready_at = ready_at
+        self.warmup_seconds = warmup_seconds
+
+
+class RealtimeSessionPool:
+    """Keeps `size` realtime sessions connected and configured, ready for calls.
+
+    `configure(ws)` sends the session setup (e.g. session.update); if
+    `ready_event` is set, a session only joins the pool once the server has
+    answered with that event type. When the pool is empty, `checkout` opens
+    a session on the spot, so calls never wait for replenishment.
+    """
+
+    def __init__(
+        self,
+        configure: Callable[[object], Awaitable[None]],
+        size: int = REALTIME_POOL_SIZE,
+        url: str = REALTIME_URL,
+        headers: Optional[dict] = None,
+        ready_event: Optional[str] = "session.updated",
+        max_idle_seconds: float = REALTIME_POOL_MAX_IDLE_SECONDS,
+        health_seconds: float = REALTIME_POOL_HEALTH_SECONDS
+    ):
+        self.configure = configure
+        self.size = size
+        self.url = url
+        self.headers = headers or {}
+        self.ready_event = ready_event
+        self.max_idle_seconds = max_idle_seconds
+        self.health_seconds = health_seconds
+        self._idle: deque[PooledSession] = deque()
+        self._opening = 0
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.failures = 0
+        self.expired = 0
+        self.unhealthy = 0
+        self.warmup_seconds_total = 0.0
+        self.checkout_seconds_total = 0.0
+
+    async def open_session(self) -> PooledSession:
+        """Connect and configure a new session."""
+        started = time.perf_counter()
+        ws = await asyncio.wait_for(websockets.connect(self.url, additional_headers=self.headers), REALTIME_CONNECT_TIMEOUT)
+        try:
+            await self.configure(ws)
+            if self.ready_event is not None:
+                await asyncio.wait_for(self._wait_for(ws, self.ready_event), REALTIME_CONNECT_TIMEOUT)
+        except BaseException:
+            await ws.close()
+            raise
+        warmup_seconds = time.perf_counter() - started
+        self.created += 1
+        self.warmup_seconds_total += warmup_seconds
+        return PooledSession(ws, time.monotonic(), warmup_seconds)
+
+    @staticmethod
+    async def _wait_for(ws, event_type: str):
+        async for message in ws:
+            event = json_loads(message)
+            if event.get("type") == event_type:
+                return
+            if event.get("type") == "error":
+                raise RuntimeError(f"Realtime session setup failed: {event.get('error')}")
+
+    async def checkout(self):
+        """A connected, configured realtime websocket. The caller owns it and must close it."""
+        started = time.perf_counter()
+        while self._idle:
+            session = self._idle.popleft()
+            if self._usable(session):
+                self.hits += 1
+                self._wake.set()  # replenish
+                self.checkout_seconds_total += time.perf_counter() - started
+                return session.ws
+            await self._discard(session)
+        self.misses += 1
+        self._wake.set()
+        session = await self.open_session()
+        self.checkout_seconds_total += time.perf_counter() - started
+        return session.ws
+
+    def _usable(self, session: PooledSession) -> bool:
+        if not is_open(session.ws):
+            self.unhealthy += 1
+            return False
+        if time.monotonic() - session.ready_at > self.max_idle_seconds:
+            self.expired += 1
+            return False
+        return True
+
+    async def _discard(self, session: PooledSession):
+        try:
+            await session.ws.close()
+        except Exception:
+            pass
+
+    async def _check_health(self):
+        """Drop expired sessions and ping the rest; sessions that don't answer are closed."""
+        for session in list(self._idle):
+            if not self._usable(session):
+                self._idle.remove(session)
+                await self._discard(session)
+
+        async def ping(session):
+            try:
+                await asyncio.wait_for(await session.ws.ping(), PING_TIMEOUT)
+            except Exception:
+                # A session checked out during the ping belongs to its call now; leave it alone
+                if session in self._idle:
+                    self._idle.remove(session)
+                    self.unhealthy += 1
+                    await self._discard(session)
+
+        await asyncio.gather(*(ping(session) for session in list(self._idle)))
+
+    async def _replenish(self):
+        missing = self.size - len(self._idle) - self._opening
+        if missing <= 0:
+            return
+        self._opening += missing
+        try:
+            results = await asyncio.gather(*(self.open_session() for _ in range(missing)), return_exceptions=True)
+        finally:
+            self._opening -= missing
+        for result in results:
+            if isinstance(result, BaseException):
+                self.failures += 1
+                print(f"Could not open a realtime session for the pool: {result}")
+            else:
+                self._idle.append(result)
+
+    async def run(self):
+        """Fill the pool and keep it healthy until cancelled."""
+        backoff = 1.0
+        last_health_check = time.monotonic()
+        while True:
+            failures = self.failures
+            await self._replenish()
+            # Back off while sessions can't be opened, e.g. the API is unreachable
+            backoff = min(backoff * 2, 60.0) if self.failures > failures else 1.0
+            timeout = self.health_seconds if backoff == 1.0 else backoff
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if time.monotonic() - last_health_check >= self.health_seconds:
+                last_health_check = time.monotonic()
+                await self._check_health()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            # Let a replenish or health check in progress finish unwinding before the idle sessions are closed
+            await asyncio.gather(task, return_exceptions=True)
+        while self._idle:
+            await self._discard(self._idle.popleft())
+
+    def stats(self) -> dict:
+        checkouts = self.hits + self.misses
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "opening": self._opening,
+            "checkouts": checkouts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / checkouts if checkouts else 0.0,
+            "created": self.created,
+            "failures": self.failures,
+            "expired": self.expired,
+            "unhealthy": self.unhealthy,
+            "mean_warmup_ms": 1000 * self.warmup_seconds_total / self.created if self.created else 0.0,
+            "mean_checkout_ms": 1000 * self.checkout_seconds_total / checkouts if checkouts else 0.0,
+        }
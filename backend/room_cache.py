@@ -0,0 +1,149 @@
+import os
+import threading
+from collections import OrderedDict
+
+from models import CombinedData, PatientInfo, PatientTimestamp
+from storage import RoomStore, clean_room_number, get_room_store
+
+ROOM_CACHE_MAX_ROOMS = int(os.getenv("ROOM_CACHE_MAX_ROOMS", 256))
+
+
+class RoomDataNotFound(LookupError):
+    """Raised when a room has no patient info or timeline record."""
+
+    def __init__(self, kind: str, room_number: str):
+        super().__init__(f"{kind} not found for room {room_number}")
+        self.kind = kind
+        self.room_number = room_number
+
+
+class _RoomEntry:
+    __slots__ = ("info_sig", "info", "timeline_sig", "timeline", "combined")
+
+    def __init__(self):
+        self.info_sig = None
+        self.info = None
+        self.timeline_sig = None
+        self.timeline = None
+        self.combined = None
+
+
+class RoomDataCache:
+    """LRU cache of validated per-room patient data.
+
+    Entries are keyed by the cleaned room number and remember the store
+    signature (file mtime/size, or the SQLite row version) of the record each
+    model was built from. Every lookup re-checks the signature, so edits are
+    picked up on the next request without a restart; `reload` drops entries
+    explicitly.
+    """
+
+    def __init__(self, store: RoomStore = None, max_rooms: int = ROOM_CACHE_MAX_ROOMS):
+        self.store = store if store is not None else get_room_store()
+        self.max_rooms = max_rooms
+        self._entries: "OrderedDict[str, _RoomEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """Call `listener(room, kind, value, signature)` whenever new data is loaded for a room."""
+        self._listeners.append(listener)
+
+    def get_patient_info(self, room_number: str) -> PatientInfo:
+        return self._get(room_number, "info")
+
+    def get_timeline(self, room_number: str) -> PatientTimestamp:
+        return self._get(room_number, "timeline")
+
+    def get_combined(self, room_number: str) -> CombinedData:
+        info = self.get_patient_info(room_number)
+        timeline = self.get_timeline(room_number)
+        key = clean_room_number(room_number)
+        with self._lock:
+            entry = self._entries.get(key)
+            combined = entry.combined if entry is not None else None
+            if combined is not None and combined.patient_info is info and combined.patient_timestamp is timeline:
+                return combined
+        combined = CombinedData(patient_info=info, patient_timestamp=timeline)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.info is info and entry.timeline is timeline:
+                entry.combined = combined
+        return combined
+
+    def get_timeline_changes(self, room_number: str, cursor: int = None) -> dict:
+        """Timeline records appended since `cursor`; see RoomStore.changes_since."""
+        if self.store.signature(room_number, "timeline") is None:
+            raise RoomDataNotFound("Timeline info", room_number)
+        return self.store.changes_since(room_number, cursor)
+
+    def version(self, room_number: str):
+        """Signature of a room's stored data; changes whenever either record does."""
+        return (self.store.signature(room_number, "info"), self.store.signature(room_number, "timeline"))
+
+    def list_rooms(self) -> list[str]:
+        return self.store.list_rooms()
+
+    def reload(self, room_number: str = None) -> int:
+        """Drop cached data for one room, or every room. Returns the number of entries dropped."""
+        with self._lock:
+            if room_number is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                dropped = 1 if self._entries.pop(clean_room_number(room_number), None) is not None else 0
+            self.invalidations += dropped
+        return dropped
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "rooms": len(self._entries),
+                "max_rooms": self.max_rooms,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
+
+    def _get(self, room_number: str, kind: str):
+        key = clean_room_number(room_number)
+        label = "Patient info" if kind == "info" else "Timeline info"
+
+        sig = self.store.signature(room_number, kind)
+        if sig is None:
+            raise RoomDataNotFound(label, room_number)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and getattr(entry, f"{kind}_sig") == sig:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return getattr(entry, kind)
+            self.misses += 1
+
+        # Load outside the lock so a slow read doesn't block other rooms
+        value = self.store.load(room_number, kind)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _RoomEntry()
+            elif getattr(entry, f"{kind}_sig") is not None:
+                self.invalidations += 1
+            setattr(entry, f"{kind}_sig", sig)
+            setattr(entry, kind, value)
+            entry.combined = None
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_rooms:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        for listener in self._listeners:
+            listener(key, kind, value, sig)
+        return value
@@ -0,0 +1,233 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Optional
+
+from models import PatientTimestamp
+from room_cache import RoomDataCache, RoomDataNotFound
+from storage import clean_room_number
+
+ROOM_EVENTS_POLL_SECONDS = float(os.getenv("ROOM_EVENTS_POLL_SECONDS", 0.5))
+ROOM_EVENTS_BUFFER = int(os.getenv("ROOM_EVENTS_BUFFER", 64))
+ROOM_EVENTS_HEARTBEAT_SECONDS = 15.0
+
+# Timeline fields whose changes are pushed as they are
+DELTA_FIELDS = ("danger_level", "description", "predicted_symptoms", "vitals")
+
+
+def timeline_delta(previous: PatientTimestamp, timeline: PatientTimestamp) -> Optional[dict]:
+    """What was added or changed between two versions of a timeline.
+
+    Returns None when the new version doesn't extend the old one (the
+    timeline was replaced), in which case subscribers need the whole thing.
+    """
+    count = len(previous.timestamps)
+    if len(timeline.timestamps) < count or (count and timeline.timestamps[count - 1] != previous.timestamps[count - 1]):
+        return None
+    delta = {}
+    if len(timeline.timestamps) > count:
+        delta["observations"] = [ts.model_dump() for ts in timeline.timestamps[count:]]
+    for field in DELTA_FIELDS:
+        value = getattr(timeline, field)
+        if value != getattr(previous, field):
+            delta[field] = value.model_dump() if hasattr(value, "model_dump") else value
+    return delta
+
+
+class Subscription:
+    """One connected dashboard and the events waiting to be sent to it.
+
+    The buffer holds at most `buffer_size` events. A client that falls
+    further behind loses its buffered events and gets a single "resync"
+    event instead, telling it to re-fetch the rooms it follows.
+    """
+
+    def __init__(self, rooms: Optional[set[str]], buffer_size: int = ROOM_EVENTS_BUFFER):
+        self.rooms = rooms  # None follows every room
+        self.buffer_size = buffer_size
+        self._events: deque = deque()
+        self._ready = asyncio.Event()
+        self.lagged = False
+        self.sent = 0
+        self.dropped = 0
+
+    def put(self, event: str, data: dict):
+        if self.lagged:
+            self.dropped += 1
+            return
+        if len(self._events) >= self.buffer_size:
+            self.dropped += len(self._events)
+            self._events.clear()
+            self.lagged = True
+        else:
+            self._events.append((event, data))
+        self._ready.set()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[tuple[str, dict]]:
+        """The next (event, data), or None if nothing arrived within `timeout` seconds."""
+        if not self._events and not self.lagged:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        self.sent += 1
+        if self.lagged:
+            self.lagged = False
+            return "resync", {"rooms": sorted(self.rooms) if self.rooms is not None else None}
+        return self._events.popleft()
+
+
+class RoomEventHub:
+    """Pushes room changes to subscribed dashboards.
+
+    A single task checks the store signatures of the rooms that have
+    subscribers (a stat per file for the file store) every `poll_seconds`
+    and loads only rooms that changed, through the room cache. Each change
+    is turned into one event and copied into the buffers of the matching
+    subscriptions, so idle subscribers cost nothing but their buffer.
+
+    Events:
+      timeline      {"room", "observations"?, "danger_level"?, "description"?, "predicted_symptoms"?, "vitals"?}
+      snapshot      {"room", "timeline"}: the timeline was replaced or first seen
+      patient_info  {"room", "patient_info"}
+      removed       {"room"}
+      resync        {"rooms"}: events were dropped, re-fetch these rooms (None: all)
+    """
+
+    def __init__(self, room_cache: RoomDataCache, poll_seconds: float = ROOM_EVENTS_POLL_SECONDS, buffer_size: int = ROOM_EVENTS_BUFFER):
+        self.room_cache = room_cache
+        self.poll_seconds = poll_seconds
+        self.buffer_size = buffer_size
+        self._by_room: dict[str, set[Subscription]] = {}
+        self._everything: set[Subscription] = set()
+        self._versions: dict[str, tuple] = {}
+        self._timelines: dict[str, PatientTimestamp] = {}
+        self._wake = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.polls = 0
+        self.poll_seconds_total = 0.0
+        self.events = 0
+        self.deliveries = 0
+
+    def subscribe(self, rooms: Optional[list[str]] = None) -> Subscription:
+        """Follow `rooms`, or every room in the ward if None."""
+        subscription = Subscription({clean_room_number(room) for room in rooms} if rooms else None, self.buffer_size)
+        if subscription.rooms is None:
+            self._everything.add(subscription)
+        else:
+            for room in subscription.rooms:
+                self._by_room.setdefault(room, set()).add(subscription)
+        self._wake.set()  # start watching new rooms right away
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._everything.discard(subscription)
+        for room in subscription.rooms or ():
+            subscribers = self._by_room.get(room)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_room[room]
+
+    def notify(self):
+        """Check for changes now instead of at the next poll, e.g. right after a write.
+
+        Safe to call from worker threads, such as room cache listeners.
+        """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self._loop is None or running is self._loop:
+            self._wake.set()
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def check_rooms(self, rooms) -> list[tuple[str, str, dict]]:
+        """(room, event, data) for every watched room whose stored data changed since the last check.
+
+        Rooms seen for the first time only record a baseline. Blocking; run
+        it in a worker thread.
+        """
+        changes = []
+        for room in rooms:
+            version = self.room_cache.version(room)
+            previous = self._versions.get(room)
+            if version == previous:
+                continue
+            self._versions[room] = version
+            try:
+                if previous is None:
+                    if version[1] is not None:
+                        self._timelines[room] = self.room_cache.get_timeline(room)
+                    continue
+                if version[0] != previous[0] and version[0] is not None:
+                    changes.append((room, "patient_info", {"room": room, "patient_info": self.room_cache.get_patient_info(room).model_dump()}))
+                if version[1] != previous[1]:
+                    if version[1] is None:
+                        self._timelines.pop(room, None)
+                        changes.append((room, "removed", {"room": room}))
+                        continue
+                    timeline = self.room_cache.get_timeline(room)
+                    old = self._timelines.get(room)
+                    self._timelines[room] = timeline
+                    delta = timeline_delta(old, timeline) if old is not None else None
+                    if delta is None:
+                        changes.append((room, "snapshot", {"room": room, "timeline": timeline.model_dump()}))
+                    elif delta:
+                        changes.append((room, "timeline", {"room": room, **delta}))
+            except RoomDataNotFound:
+                # Deleted between the signature check and the load; the next poll sees it
+                self._versions.pop(room, None)
+        # Forget rooms nobody follows any more
+        for room in set(self._versions) - set(rooms):
+            self._versions.pop(room, None)
+            self._timelines.pop(room, None)
+        return changes
+
+    def publish(self, room: str, event: str, data: dict):
+        subscribers = self._everything | self._by_room.get(room, set())
+        for subscription in subscribers:
+            subscription.put(event, data)
+        self.events += 1
+        self.deliveries += len(subscribers)
+
+    async def run(self):
+        """Poll for changes until cancelled."""
+        self._loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self._everything and not self._by_room:
+                continue
+            started = time.perf_counter()
+            try:
+                rooms = set(self._by_room)
+                if self._everything:
+                    rooms.update(await asyncio.to_thread(self.room_cache.list_rooms))
+                changes = await asyncio.to_thread(self.check_rooms, rooms)
+            except Exception as e:
+                print(f"Room event poll failed: {e}")
+                continue
+            for room, event, data in changes:
+                self.publish(room, event, data)
+            self.polls += 1
+            self.poll_seconds_total += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        subscriptions = self._everything.union(*self._by_room.values())
+        return {
+            "subscribers": len(subscriptions),
+            "watched_rooms": len(self._versions),
+            "polls": self.polls,
+            "mean_poll_ms": 1000 * self.poll_seconds_total / self.polls if self.polls else 0.0,
+            "events": self.events,
+            "deliveries": self.deliveries,
+            "buffered": sum(len(s._events) for s in subscriptions),
+            "dropped": sum(s.dropped for s in subscriptions),
+        }
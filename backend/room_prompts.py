@@ -0,0 +1,150 @@
+import asyncio
+import os
+import threading
+from typing import Callable, List, Optional
+
+from models import CloseContacts, CombinedData, Timestamp
+from room_cache import RoomDataCache
+from storage import clean_room_number
+
+ROOM_PROMPT_REFRESH_SECONDS = float(os.getenv("ROOM_PROMPT_REFRESH_SECONDS", 2.0))
+
+
+def generate_contacts_summary(contacts: List[CloseContacts]) -> str:
+    """Generate a summary of the close contacts for the system prompt."""
+    summary = ""
+    for contact in contacts:
+        summary += f"- {contact.name} ({contact.relationship}): {contact.phone_number}, {contact.location}\n"
+    return summary
+
+def generate_timestamps_summary(timestamps: List[Timestamp]) -> str:
+    """Generate a summary of the timestamps for the system prompt."""
+    summary = ""
+    for i, ts in enumerate(timestamps):
+        summary += f"Observation {i+1} ({ts.start_time} to {ts.end_time}):\n"
+        summary += f"- Symptoms: {', '.join(ts.symptoms)}\n"
+        summary += f"- Confidence: {ts.confidence}\n"
+        summary += f"- Danger Level: {ts.danger_level}\n"
+        summary += f"- Description: {ts.description}\n\n"
+    return summary
+
+def create_system_prompt(combined_data: CombinedData) -> str:
+    """Create a system prompt for the LLM with patient data context."""
+    patient_info = combined_data.patient_info
+    patient_timestamp = combined_data.patient_timestamp
+    
+    return f"""You are Florence, an AI medical assistant that has analyzed a patient through a surveillance camera system.
+You have access to the following patient information:
+
+Patient Name: {patient_info.full_name}
+Age: {patient_info.age}
+Location: {patient_info.location}
+Diagnosis: {patient_info.diagnosis}
+Pre-existing Conditions: {', '.join(patient_info.pre_existing_conditions)}
+Current Symptoms: {', '.join(patient_info.current_symptoms)}
+Allergies: {patient_info.allergies}
+Medications: {', '.join(patient_info.medications)}
+
+Close Contacts:
+{generate_contacts_summary(patient_info.close_contacts)}
+
+Room Number: {patient_timestamp.room_number}
+Admission Date: {patient_timestamp.admission_date}
+Predicted Symptoms: {', '.join(patient_timestamp.predicted_symptoms)}
+Overall Danger Level: {patient_timestamp.danger_level}
+Overall Description: {patient_timestamp.description}
+
+Vitals:
+- Heart Rate: {patient_timestamp.vitals.heart_rate} bpm
+- Blood Pressure: {patient_timestamp.vitals.blood_pressure}
+- Blood Oxygen: {patient_timestamp.vitals.blood_oxygen}%
+- Blood Glucose: {patient_timestamp.vitals.blood_glucose} mg/dL
+- Temperature: {patient_timestamp.vitals.temperature}°C
+- Respiratory Rate: {patient_timestamp.vitals.respiratory_rate} breaths/min
+- Pulse Rate: {patient_timestamp.vitals.pulse_rate} bpm
+
+Detailed Observations:
+{generate_timestamps_summary(patient_timestamp.timestamps)}
+
+Respond to the user's questions about this patient in a clear, concise, and medically appropriate manner.
+Base your answers strictly on the data provided. If information is not available, say so rather than making assumptions.
+"""
+
+
+class RoomPromptCache:
+    """System prompts for each room, rendered once per version of the room's data.
+
+    `get(room)` is a dictionary lookup once a room's prompt has been
+    rendered, and `cached(room)` never renders at all; `run()` keeps every room's prompt current in the background by
+    re-rendering rooms whose store signature changed. Callers that must see
+    a change immediately (such as /chat) pass `revalidate=True`, which adds
+    one signature check.
+    """
+
+    def __init__(self, room_cache: RoomDataCache, render: Callable[[CombinedData], str] = create_system_prompt, refresh_seconds: float = ROOM_PROMPT_REFRESH_SECONDS):
+        self.room_cache = room_cache
+        self.render = render
+        self.refresh_seconds = refresh_seconds
+        self._prompts: dict[str, tuple] = {}  # room -> (version, prompt)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+
+    def get(self, room_number: str, revalidate: bool = False) -> str:
+        """The room's prompt; raises RoomDataNotFound if it has no data."""
+        room = clean_room_number(room_number)
+        entry = self._prompts.get(room)
+        if entry is not None and (not revalidate or entry[0] == self.room_cache.version(room)):
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return self._render(room)
+
+    def cached(self, room_number: str) -> Optional[str]:
+        """The room's last rendered prompt, or None if it hasn't been rendered yet. Never renders."""
+        entry = self._prompts.get(clean_room_number(room_number))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def _render(self, room: str) -> str:
+        version = self.room_cache.version(room)
+        prompt = self.render(self.room_cache.get_combined(room))
+        with self._lock:
+            self._prompts[room] = (version, prompt)
+            self.renders += 1
+        return prompt
+
+    def refresh(self) -> int:
+        """Re-render the prompts of rooms whose data changed. Returns the number rendered."""
+        rooms = set(self.room_cache.list_rooms())
+        rendered = 0
+        for room in rooms:
+            entry = self._prompts.get(room)
+            if entry is not None and entry[0] == self.room_cache.version(room):
+                continue
+            try:
+                self._render(room)
+                rendered += 1
+            except LookupError:
+                # No timeline yet, or removed since listing
+                self._prompts.pop(room, None)
+        with self._lock:
+            for room in set(self._prompts) - rooms:
+                del self._prompts[room]
+        return rendered
+
+    async def run(self):
+        """Keep every room's prompt rendered until cancelled."""
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print(f"Refreshing room prompts failed: {e}")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def stats(self) -> dict:
+        return {"rooms": len(self._prompts), "hits": self.hits, "misses": self.misses, "renders": self.renders}
@@ -0,0 +1,706 @@
+#!/usr/bin/env python3
+"""
+Storage backends for per-room patient and timeline data.
+
+`FileRoomStore` reads the original one-JSON-file-per-room layout under
+patientinfo/ and timelineinfo/, plus an append-only log per room in
+timelinelog/ that new observations and vitals are written to between
+snapshots. `SQLiteRoomStore` keeps the same data in indexed tables so rooms
+can be looked up by danger level or symptom. Pick one with
+ROOM_STORE=file|sqlite (and ROOM_DB_PATH for SQLite).
+
+Import the JSON directories into a database with:
+
+    python storage.py import florence.db
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Optional
+
+from models import PatientInfo, PatientTimestamp, Timestamp, Vitals
+
+PATIENT_INFO_DIR = "patientinfo"
+TIMELINE_INFO_DIR = "timelineinfo"
+TIMELINE_LOG_DIR = "timelinelog"
+# Log records after which a room's timeline snapshot is rewritten and its log emptied
+TIMELINE_COMPACT_RECORDS = int(os.getenv("TIMELINE_COMPACT_RECORDS", 256))
+# Size after which a room's history file is rotated; one older generation is kept
+TIMELINE_HISTORY_BYTES = int(os.getenv("TIMELINE_HISTORY_BYTES", 16 * 1024 * 1024))
+ROOM_STORE = os.getenv("ROOM_STORE", "file")
+ROOM_DB_PATH = os.getenv("ROOM_DB_PATH", "florence.db")
+
+# The two kinds of per-room record every store holds
+KINDS = {"info": PatientInfo, "timeline": PatientTimestamp}
+# Timeline fields an append can set; observations and vitals have their own records
+TIMELINE_STATE_FIELDS = ("room_number", "predicted_symptoms", "danger_level", "description", "admission_date")
+# First line of a log, naming the snapshot it extends: "compacted" kept the timeline, "reset" replaced it
+LOG_MARKERS = ("compacted", "reset")
+
+
+def clean_room_number(room_number: str) -> str:
+    """Strip the "Room " prefix and spaces so "Room 101" and "101" map to the same room."""
+    return room_number.replace("Room ", "").replace(" ", "")
+
+def normalize_symptom(symptom: str) -> str:
+    """Case- and whitespace-insensitive form of a symptom, used for lookups."""
+    return " ".join(symptom.lower().split())
+
+def sort_rooms(rooms) -> list[str]:
+    return sorted(rooms, key=lambda room: (len(room), room))
+
+def write_json_atomic(path: str, data: dict):
+    """Write JSON to a temp file and rename it over `path` so readers never see a partial file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def write_lines_atomic(path: str, records: list[dict]):
+    """Replace a JSONL file with `records`, one JSON object per line."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".jsonl")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def read_log(path: str, offset: int = 0):
+    """Return (records, end_offset, file_id) for the complete lines of a JSONL log after `offset`.
+
+    A partially written last line is left for the next read. `file_id`
+    changes when the log is replaced, e.g. by compaction; it is None if the
+    log doesn't exist.
+    """
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return [], 0, None
+    with f:
+        st = os.fstat(f.fileno())
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    records = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return records, offset + end, (st.st_dev, st.st_ino)
+
+def timeline_records(observations=(), vitals=None, **state) -> list[dict]:
+    """Log records (without sequence numbers) for new observations, a vitals reading and new field values."""
+    unknown = set(state) - set(TIMELINE_STATE_FIELDS)
+    if unknown:
+        raise ValueError(f"Cannot append timeline fields: {', '.join(sorted(unknown))}")
+    as_dict = lambda value: value.model_dump() if hasattr(value, "model_dump") else value
+    records = [{"type": "observation", "data": Timestamp.model_validate(as_dict(ts)).model_dump()} for ts in observations]
+    if vitals is not None:
+        records.append({"type": "vitals", "data": Vitals.model_validate(as_dict(vitals)).model_dump()})
+    if state:
+        records.append({"type": "state", "data": {
+            key: list(value) if key == "predicted_symptoms" else str(value) for key, value in state.items()
+        }})
+    return records
+
+def apply_records(timeline: PatientTimestamp, records) -> PatientTimestamp:
+    """The timeline with log records applied in order."""
+    observations = []
+    update = {}
+    for record in records:
+        if record["type"] == "observation":
+            observations.append(Timestamp(**record["data"]))
+        elif record["type"] == "vitals":
+            update["vitals"] = Vitals(**record["data"])
+        elif record["type"] == "state":
+            update.update(record["data"])
+    if observations:
+        update["timestamps"] = timeline.timestamps + observations
+    return timeline.model_copy(update=update) if update else timeline
+
+
+class RoomStore:
+    """Interface shared by the storage backends.
+
+    `signature` must be cheap: the room cache calls it on every request and
+    only calls `load` when the signature changes. It returns None when the
+    room has no record of that kind.
+    """
+
+    def signature(self, room_number: str, kind: str):
+        raise NotImplementedError
+
+    def load(self, room_number: str, kind: str):
+        raise NotImplementedError
+
+    def save(self, room_number: str, kind: str, value):
+        raise NotImplementedError
+
+    def list_rooms(self) -> list[str]:
+        raise NotImplementedError
+
+    def append(self, room_number: str, observations=(), vitals=None, **state):
+        """Add observations, a vitals reading and new timeline field values to a room's timeline.
+
+        Stores without a log rewrite the whole timeline; returns the new
+        cursor, or None if the store has no cursors.
+        """
+        timeline = self.load(room_number, "timeline")
+        self.save(room_number, "timeline", apply_records(timeline, timeline_records(observations, vitals, **state)))
+
+    def changes_since(self, room_number: str, cursor: Optional[int] = None) -> dict:
+        """Timeline records appended after `cursor`.
+
+        When the records can't be replayed from `cursor` (no cursor, or the
+        log was compacted or rewritten since), `reset` is true and the full
+        timeline is returned instead.
+        """
+        return {"cursor": None, "reset": True, "timeline": self.load(room_number, "timeline").model_dump(), "records": []}
+
+    def query_rooms(self, danger_levels: Optional[list[str]] = None, symptom: Optional[str] = None) -> Optional[list[str]]:
+        """Rooms matching the filters from the store's own indexes, or None if it has none."""
+        return None
+
+
+class _TimelineView:
+    """A room's timeline as of its snapshot plus the log records read so far."""
+
+    def __init__(self, snapshot, snapshot_id: str, timeline: PatientTimestamp, base_seq: int, log_bound: bool):
+        self.snapshot = snapshot  # (mtime_ns, size) of the snapshot file it was built from
+        self.snapshot_id = snapshot_id  # hash of the snapshot's contents
+        self.timeline = timeline
+        self.base_seq = base_seq  # log records up to here are already in the snapshot
+        self.seq = base_seq
+        self.log_bound = log_bound  # the log's header names this snapshot; otherwise it is ignored
+        self.records: list[dict] = []  # records since the snapshot, for cursors
+        self.marker: Optional[dict] = None  # how the log was last rewritten
+        self.log_id = None
+        self.offset = 0
+
+    def apply(self, records):
+        for record in records:
+            if record["type"] in LOG_MARKERS:
+                self.marker = record
+        fresh = [record for record in records if record["seq"] > self.seq]
+        if fresh:
+            self.seq = fresh[-1]["seq"]
+            self.records.extend(record for record in fresh if record["type"] not in LOG_MARKERS)
+            self.timeline = apply_records(self.timeline, fresh)
+
+
+class FileRoomStore(RoomStore):
+    """One JSON file per room in patientinfo/ and timelineinfo/.
+
+    Timelines are a snapshot in timelineinfo/ plus an append-only JSONL log
+    in timelinelog/, so adding an observation writes one line instead of the
+    whole timeline. Every log record has a sequence number. The log's first
+    line is a marker with the hash of the snapshot it extends and the last
+    sequence number that snapshot contains, so snapshots stay plain
+    PatientTimestamp JSON for other readers. A log whose marker names another
+    snapshot, e.g. after the snapshot was overwritten by another tool, is
+    ignored and replaced on the next append. Loads read only the log lines
+    added since the previous load. After `compact_records` records the
+    snapshot is rewritten and the log emptied. The compacted records are
+    kept in room{N}.history.jsonl, which is rotated to room{N}.history.1.jsonl
+    at `history_bytes`. Appends assume one writing process per room.
+    """
+
+    def __init__(
+        self,
+        patient_info_dir: str = PATIENT_INFO_DIR,
+        timeline_info_dir: str = TIMELINE_INFO_DIR,
+        timeline_log_dir: str = TIMELINE_LOG_DIR,
+        compact_records: int = TIMELINE_COMPACT_RECORDS,
+        history_bytes: int = TIMELINE_HISTORY_BYTES
+    ):
+        self.dirs = {"info": patient_info_dir, "timeline": timeline_info_dir}
+        self.timeline_log_dir = timeline_log_dir
+        self.compact_records = compact_records
+        self.history_bytes = history_bytes
+        self._views: dict[str, _TimelineView] = {}
+        self._lock = threading.RLock()
+
+    def path(self, room_number: str, kind: str) -> str:
+        return os.path.join(self.dirs[kind], f"room{clean_room_number(room_number)}.json")
+
+    def log_path(self, room_number: str, suffix: str = "") -> str:
+        return os.path.join(self.timeline_log_dir, f"room{clean_room_number(room_number)}{suffix}.jsonl")
+
+    def signature(self, room_number: str, kind: str):
+        try:
+            st = os.stat(self.path(room_number, kind))
+        except FileNotFoundError:
+            return None
+        if kind != "timeline":
+            return (st.st_mtime_ns, st.st_size)
+        try:
+            log_size = os.stat(self.log_path(room_number)).st_size
+        except FileNotFoundError:
+            log_size = 0
+        return (st.st_mtime_ns, st.st_size, log_size)
+
+    def load(self, room_number: str, kind: str):
+        if kind == "timeline":
+            with self._lock:
+                return self._timeline_view(clean_room_number(room_number)).timeline
+        with open(self.path(room_number, kind), 'r') as f:
+            return KINDS[kind](**json.load(f))
+
+    def save(self, room_number: str, kind: str, value):
+        if kind != "timeline":
+            write_json_atomic(self.path(room_number, kind), value.model_dump())
+            return
+        room = clean_room_number(room_number)
+        with self._lock:
+            try:
+                view = self._timeline_view(room)
+                seq, records = view.seq, view.records
+            except FileNotFoundError:
+                records = read_log(self.log_path(room))[0]
+                seq = records[-1]["seq"] if records else 0
+            # A new sequence number, so readers holding a cursor see a reset
+            self._write_snapshot(room, value, seq + 1, records, {"type": "reset"})
+
+    def append(self, room_number: str, observations=(), vitals=None, **state) -> int:
+        room = clean_room_number(room_number)
+        records = timeline_records(observations, vitals, **state)
+        with self._lock:
+            view = self._timeline_view(room)
+            if not view.log_bound:
+                # No log yet, or one that belongs to an older snapshot: start a new log for this snapshot
+                write_lines_atomic(self.log_path(room), [{"seq": view.base_seq, "type": "reset", "snapshot": view.snapshot_id}])
+                view = self._timeline_view(room)
+            seq = view.seq
+            lines = []
+            for record in records:
+                seq += 1
+                lines.append(json.dumps({"seq": seq, **record}) + "\n")
+            os.makedirs(self.timeline_log_dir, exist_ok=True)
+            with open(self.log_path(room), 'a') as f:
+                f.write("".join(lines))
+            view = self._timeline_view(room)
+            if len(view.records) >= self.compact_records:
+                self._write_snapshot(room, view.timeline, view.seq, view.records, {"type": "compacted", "previous_seq": view.base_seq})
+            return seq
+
+    def changes_since(self, room_number: str, cursor: Optional[int] = None) -> dict:
+        with self._lock:
+            view = self._timeline_view(clean_room_number(room_number))
+            records = view.records
+            marker = view.marker
+            if cursor is not None and marker is not None and marker["type"] == "compacted" and marker["previous_seq"] <= cursor < view.base_seq:
+                # Caught up before the last compaction: the records it folded in are in the history
+                archived = read_log(self.log_path(room_number, ".history"), marker["history_offset"])[0]
+                records = [r for r in archived if r["seq"] <= view.base_seq] + records
+            elif cursor is None or not view.base_seq <= cursor <= view.seq:
+                return {"cursor": view.seq, "reset": True, "timeline": view.timeline.model_dump(), "records": []}
+            return {"cursor": view.seq, "reset": False, "records": [r for r in records if r["seq"] > cursor]}
+
+    def _timeline_view(self, room: str) -> _TimelineView:
+        """The room's materialized timeline, reading only what was appended since the last call."""
+        path = self.path(room, "timeline")
+        st = os.stat(path)
+        snapshot = (st.st_mtime_ns, st.st_size)
+        view = self._views.get(room)
+        if view is not None and view.snapshot == snapshot:
+            records, offset, log_id = read_log(self.log_path(room), view.offset)
+            if log_id == view.log_id:
+                view.offset = offset
+                if view.log_bound:
+                    view.apply(records)
+                return view
+
+        # First load, or the snapshot or log was replaced: rebuild from the snapshot
+        with open(path, 'rb') as f:
+            content = f.read()
+        data = json.loads(content)
+        snapshot_id = hashlib.sha1(content).hexdigest()
+        records, offset, log_id = read_log(self.log_path(room))
+        header = records[0] if records else None
+        if header is not None and header.get("snapshot") == snapshot_id:
+            view = _TimelineView(snapshot, snapshot_id, PatientTimestamp(**data), header["seq"], True)
+            view.apply(records)
+        else:
+            # Start past every sequence number the stale log handed out, so older cursors get a reset
+            base_seq = records[-1]["seq"] + 1 if records else 0
+            view = _TimelineView(snapshot, snapshot_id, PatientTimestamp(**data), base_seq, False)
+        view.offset, view.log_id = offset, log_id
+        self._views[room] = view
+        return view
+
+    def _write_snapshot(self, room: str, timeline: PatientTimestamp, seq: int, records, marker: dict):
+        """Make `timeline` the room's snapshot at `seq`, archive `records` and empty the log."""
+        os.makedirs(self.timeline_log_dir, exist_ok=True)
+        history_path = self.log_path(room, ".history")
+        try:
+            if os.stat(history_path).st_size >= self.history_bytes:
+                os.replace(history_path, self.log_path(room, ".history.1"))
+        except FileNotFoundError:
+            pass
+        with open(history_path, 'a') as f:
+            marker = {"seq": seq, **marker, "history_offset": f.tell()}
+            f.writelines(json.dumps(record) + "\n" for record in records)
+        # Snapshot first: if the log rewrite never happens, the old log names another snapshot and is ignored
+        path = self.path(room, "timeline")
+        write_json_atomic(path, timeline.model_dump())
+        with open(path, 'rb') as f:
+            marker["snapshot"] = hashlib.sha1(f.read()).hexdigest()
+        write_lines_atomic(self.log_path(room), [marker])
+        self._views.pop(room, None)
+
+    def list_rooms(self) -> list[str]:
+        try:
+            names = os.listdir(self.dirs["info"])
+        except FileNotFoundError:
+            return []
+        return sort_rooms(name[len("room"):-len(".json")] for name in names if name.startswith("room") and name.endswith(".json"))
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    room TEXT PRIMARY KEY,
+    full_name TEXT NOT NULL,
+    location TEXT NOT NULL,
+    age INTEGER NOT NULL,
+    diagnosis TEXT NOT NULL,
+    allergies TEXT NOT NULL,
+    pre_existing_conditions TEXT NOT NULL,
+    current_symptoms TEXT NOT NULL,
+    medications TEXT NOT NULL,
+    close_contacts TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS timelines (
+    room TEXT PRIMARY KEY,
+    room_number TEXT NOT NULL,
+    danger_level TEXT NOT NULL,
+    description TEXT NOT NULL,
+    admission_date TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_timelines_danger_level ON timelines(danger_level);
+CREATE INDEX IF NOT EXISTS idx_timelines_danger_key ON timelines(LOWER(TRIM(danger_level)));
+
+CREATE TABLE IF NOT EXISTS predicted_symptoms (
+    room TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    symptom TEXT NOT NULL,
+    symptom_key TEXT NOT NULL,
+    PRIMARY KEY (room, position)
+);
+CREATE INDEX IF NOT EXISTS idx_predicted_symptoms_key ON predicted_symptoms(symptom_key);
+
+CREATE TABLE IF NOT EXISTS observations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    room TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    description TEXT NOT NULL,
+    danger_level TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_observations_room ON observations(room, position);
+CREATE INDEX IF NOT EXISTS idx_observations_danger_level ON observations(danger_level);
+
+CREATE TABLE IF NOT EXISTS observation_symptoms (
+    observation_id INTEGER NOT NULL REFERENCES observations(id) ON DELETE CASCADE,
+    room TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    symptom TEXT NOT NULL,
+    symptom_key TEXT NOT NULL,
+    PRIMARY KEY (observation_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_observation_symptoms_key ON observation_symptoms(symptom_key);
+CREATE INDEX IF NOT EXISTS idx_observation_symptoms_room ON observation_symptoms(room);
+
+CREATE TABLE IF NOT EXISTS vitals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    room TEXT NOT NULL,
+    recorded_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    heart_rate REAL NOT NULL,
+    blood_pressure TEXT NOT NULL,
+    blood_oxygen REAL NOT NULL,
+    blood_glucose REAL NOT NULL,
+    temperature REAL NOT NULL,
+    respiratory_rate REAL NOT NULL,
+    pulse_rate REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_vitals_room ON vitals(room, id);
+
+-- Records appended to each timeline since its last full save (a "reset" row), for cursors
+CREATE TABLE IF NOT EXISTS timeline_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    room TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_timeline_log_room ON timeline_log(room, seq);
+"""
+
+PATIENT_LIST_FIELDS = ("pre_existing_conditions", "current_symptoms", "medications", "close_contacts")
+VITALS_FIELDS = tuple(Vitals.model_fields)
+
+
+class SQLiteRoomStore(RoomStore):
+    """Patients, timeline observations and vitals in SQLite.
+
+    Each save bumps a per-room version column, which is what `signature`
+    returns, so the room cache revalidates with a single primary-key lookup.
+    Vitals are appended rather than overwritten; loads return the latest row.
+    Appends are also recorded in timeline_log, whose sequence numbers are
+    the cursors of `changes_since`; a full save clears the room's log.
+    """
+
+    def __init__(self, db_path: str = ROOM_DB_PATH):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def signature(self, room_number: str, kind: str):
+        table = "patients" if kind == "info" else "timelines"
+        with self._lock:
+            row = self._conn.execute(f"SELECT version FROM {table} WHERE room = ?", (clean_room_number(room_number),)).fetchone()
+        return row["version"] if row else None
+
+    def load(self, room_number: str, kind: str):
+        room = clean_room_number(room_number)
+        with self._lock:
+            if kind == "info":
+                return self._load_patient_info(room)
+            return self._load_timeline(room)
+
+    def save(self, room_number: str, kind: str, value):
+        room = clean_room_number(room_number)
+        with self._lock, self._conn:
+            if kind == "info":
+                self._save_patient_info(room, value)
+            else:
+                self._save_timeline(room, value)
+
+    def list_rooms(self) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT room FROM patients").fetchall()
+        return sort_rooms(row["room"] for row in rows)
+
+    def query_rooms(self, danger_levels: Optional[list[str]] = None, symptom: Optional[str] = None) -> list[str]:
+        """Rooms whose overall danger level is in `danger_levels` and/or that show `symptom`, both case-insensitive."""
+        sql = "SELECT t.room FROM timelines t WHERE 1 = 1"
+        params = []
+        if danger_levels:
+            sql += f" AND LOWER(TRIM(t.danger_level)) IN ({', '.join('?' for _ in danger_levels)})"
+            params.extend(level.strip().lower() for level in danger_levels)
+        if symptom:
+            sql += (
+                " AND (t.room IN (SELECT room FROM predicted_symptoms WHERE symptom_key = ?)"
+                " OR t.room IN (SELECT room FROM observation_symptoms WHERE symptom_key = ?))"
+            )
+            params.extend([normalize_symptom(symptom)] * 2)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return sort_rooms(row["room"] for row in rows)
+
+    def _load_patient_info(self, room: str) -> PatientInfo:
+        row = self._conn.execute("SELECT * FROM patients WHERE room = ?", (room,)).fetchone()
+        if row is None:
+            raise KeyError(f"No patient info for room {room}")
+        data = {key: row[key] for key in PatientInfo.model_fields}
+        for key in PATIENT_LIST_FIELDS:
+            data[key] = json.loads(data[key])
+        return PatientInfo(**data)
+
+    def _load_timeline(self, room: str) -> PatientTimestamp:
+        row = self._conn.execute("SELECT * FROM timelines WHERE room = ?", (room,)).fetchone()
+        if row is None:
+            raise KeyError(f"No timeline info for room {room}")
+        predicted = self._conn.execute(
+            "SELECT symptom FROM predicted_symptoms WHERE room = ? ORDER BY position", (room,)
+        ).fetchall()
+        observations = self._conn.execute(
+            "SELECT * FROM observations WHERE room = ? ORDER BY position", (room,)
+        ).fetchall()
+        symptoms = {}
+        for symptom_row in self._conn.execute(
+            "SELECT observation_id, symptom FROM observation_symptoms WHERE room = ? ORDER BY observation_id, position", (room,)
+        ):
+            symptoms.setdefault(symptom_row["observation_id"], []).append(symptom_row["symptom"])
+        vitals = self._conn.execute(
+            "SELECT * FROM vitals WHERE room = ? ORDER BY id DESC LIMIT 1", (room,)
+        ).fetchone()
+
+        return PatientTimestamp(
+            room_number=row["room_number"],
+            predicted_symptoms=[r["symptom"] for r in predicted],
+            timestamps=[
+                Timestamp(
+                    start_time=obs["start_time"],
+                    end_time=obs["end_time"],
+                    symptoms=symptoms.get(obs["id"], []),
+                    confidence=obs["confidence"],
+                    description=obs["description"],
+                    danger_level=obs["danger_level"]
+                )
+                for obs in observations
+            ],
+            danger_level=row["danger_level"],
+            description=row["description"],
+            vitals=Vitals(**{key: vitals[key] for key in VITALS_FIELDS}),
+            admission_date=row["admission_date"]
+        )
+
+    def _save_patient_info(self, room: str, info: PatientInfo):
+        data = info.model_dump()
+        for key in PATIENT_LIST_FIELDS:
+            data[key] = json.dumps(data[key])
+        columns = ["room", *PatientInfo.model_fields]
+        self._conn.execute(
+            f"INSERT INTO patients ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+            f" ON CONFLICT(room) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in columns[1:])}, version = version + 1",
+            [room, *(data[key] for key in PatientInfo.model_fields)]
+        )
+
+    def _save_timeline(self, room: str, timeline: PatientTimestamp):
+        self._conn.execute(
+            "INSERT INTO timelines (room, room_number, danger_level, description, admission_date) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT(room) DO UPDATE SET room_number = excluded.room_number, danger_level = excluded.danger_level,"
+            " description = excluded.description, admission_date = excluded.admission_date, version = version + 1",
+            (room, timeline.room_number, timeline.danger_level, timeline.description, timeline.admission_date)
+        )
+        self._replace_predicted_symptoms(room, timeline.predicted_symptoms)
+        self._conn.execute("DELETE FROM observations WHERE room = ?", (room,))
+        self._insert_observations(room, 0, timeline.timestamps)
+        self._insert_vitals(room, timeline.vitals)
+        # Cursors from before this save can't be replayed any more
+        self._conn.execute("DELETE FROM timeline_log WHERE room = ?", (room,))
+        self._conn.execute("INSERT INTO timeline_log (room, type, data) VALUES (?, 'reset', '{}')", (room,))
+
+    def append(self, room_number: str, observations=(), vitals=None, **state) -> int:
+        """Insert just the new rows; earlier observations are left untouched. Returns the new cursor."""
+        room = clean_room_number(room_number)
+        records = timeline_records(observations, vitals, **state)
+        new_observations = [Timestamp(**record["data"]) for record in records if record["type"] == "observation"]
+        columns = [key for key in state if key != "predicted_symptoms"]
+        with self._lock, self._conn:
+            if self._conn.execute("SELECT 1 FROM timelines WHERE room = ?", (room,)).fetchone() is None:
+                raise KeyError(f"No timeline info for room {room}")
+            next_position = self._conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM observations WHERE room = ?", (room,)
+            ).fetchone()[0]
+            self._insert_observations(room, next_position, new_observations)
+            for record in records:
+                if record["type"] == "vitals":
+                    self._insert_vitals(room, Vitals(**record["data"]))
+                elif record["type"] == "state" and "predicted_symptoms" in record["data"]:
+                    self._replace_predicted_symptoms(room, record["data"]["predicted_symptoms"])
+            assignments = [f"{column} = ?" for column in columns] + ["version = version + 1"]
+            self._conn.execute(
+                f"UPDATE timelines SET {', '.join(assignments)} WHERE room = ?",
+                [str(state[column]) for column in columns] + [room]
+            )
+            seq = None
+            for record in records:
+                seq = self._conn.execute(
+                    "INSERT INTO timeline_log (room, type, data) VALUES (?, ?, ?)", (room, record["type"], json.dumps(record["data"]))
+                ).lastrowid
+            return seq if seq is not None else self._log_bounds(room)[1]
+
+    def changes_since(self, room_number: str, cursor: Optional[int] = None) -> dict:
+        room = clean_room_number(room_number)
+        with self._lock:
+            base_seq, seq = self._log_bounds(room)
+            if cursor is None or not base_seq <= cursor <= seq:
+                return {"cursor": seq, "reset": True, "timeline": self._load_timeline(room).model_dump(), "records": []}
+            rows = self._conn.execute(
+                "SELECT seq, type, data FROM timeline_log WHERE room = ? AND seq > ? ORDER BY seq", (room, cursor)
+            ).fetchall()
+        return {"cursor": seq, "reset": False, "records": [{"seq": r["seq"], "type": r["type"], "data": json.loads(r["data"])} for r in rows]}
+
+    def _log_bounds(self, room: str) -> tuple[int, int]:
+        """(seq of the room's last full save, latest seq); 0 for rooms saved before the log existed."""
+        row = self._conn.execute(
+            "SELECT COALESCE(MAX(CASE WHEN type = 'reset' THEN seq END), 0) AS base_seq, COALESCE(MAX(seq), 0) AS seq"
+            " FROM timeline_log WHERE room = ?", (room,)
+        ).fetchone()
+        return row["base_seq"], row["seq"]
+
+    def _replace_predicted_symptoms(self, room: str, predicted_symptoms):
+        self._conn.execute("DELETE FROM predicted_symptoms WHERE room = ?", (room,))
+        self._conn.executemany(
+            "INSERT INTO predicted_symptoms (room, position, symptom, symptom_key) VALUES (?, ?, ?, ?)",
+            [(room, i, s, normalize_symptom(s)) for i, s in enumerate(predicted_symptoms)]
+        )
+
+    def _insert_observations(self, room: str, first_position: int, timestamps):
+        for position, ts in enumerate(timestamps, first_position):
+            cursor = self._conn.execute(
+                "INSERT INTO observations (room, position, start_time, end_time, confidence, description, danger_level)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (room, position, ts.start_time, ts.end_time, ts.confidence, ts.description, ts.danger_level)
+            )
+            self._conn.executemany(
+                "INSERT INTO observation_symptoms (observation_id, room, position, symptom, symptom_key) VALUES (?, ?, ?, ?, ?)",
+                [(cursor.lastrowid, room, i, s, normalize_symptom(s)) for i, s in enumerate(ts.symptoms)]
+            )
+
+    def _insert_vitals(self, room: str, vitals: Vitals):
+        self._conn.execute(
+            f"INSERT INTO vitals (room, {', '.join(VITALS_FIELDS)}) VALUES (?, {', '.join('?' for _ in VITALS_FIELDS)})",
+            [room, *(getattr(vitals, key) for key in VITALS_FIELDS)]
+        )
+
+
+def get_room_store(kind: str = ROOM_STORE) -> RoomStore:
+    """Build the store selected by ROOM_STORE."""
+    if kind == "sqlite":
+        return SQLiteRoomStore(ROOM_DB_PATH)
+    if kind == "file":
+        return FileRoomStore()
+    raise ValueError(f"Unknown ROOM_STORE: {kind}")
+
+def import_json_dirs(store: RoomStore, patient_info_dir: str = PATIENT_INFO_DIR, timeline_info_dir: str = TIMELINE_INFO_DIR) -> int:
+    """Copy every room from the JSON directories into `store`. Returns the number of rooms imported."""
+    source = FileRoomStore(patient_info_dir, timeline_info_dir)
+    imported = 0
+    for room in source.list_rooms():
+        for kind in KINDS:
+            if source.signature(room, kind) is not None:
+                store.save(room, kind, source.load(room, kind))
+        imported += 1
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the SQLite room store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="Import patientinfo/ and timelineinfo/ JSON files")
+    import_parser.add_argument("db_path", nargs="?", default=ROOM_DB_PATH)
+    import_parser.add_argument("--patientinfo", default=PATIENT_INFO_DIR)
+    import_parser.add_argument("--timelineinfo", default=TIMELINE_INFO_DIR)
+    args = parser.parse_args()
+
+    store = SQLiteRoomStore(args.db_path)
+    imported = import_json_dirs(store, args.patientinfo, args.timelineinfo)
+    store.close()
+    print(f"Imported {imported} rooms into {args.db_path}")
+
+if __name__ == "__main__":
+    main()
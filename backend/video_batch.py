@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Batch video analysis: run profile and report generation for many videos at
+once and write the results into patientinfo/ and timelineinfo/.
+
+    python video_batch.py test/ --first-room 100 --concurrency 4
+    python video_batch.py --manifest ward.json
+
+A manifest is a JSON list of {"video": "path/to/clip.mp4", "room": "101"}
+entries; relative paths are resolved against the manifest's directory. In
+directory mode a file named room101.mp4 goes to room 101, other files are
+numbered from --first-room in name order (or keep their file name).
+
+Each room's outputs are written atomically, and a video whose outputs are
+already newer than the video itself is skipped, so re-running after a crash
+resumes where the previous run stopped. Use --force to redo everything.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Optional
+
+from pydantic import BaseModel
+
+import gemini_profile
+import gemini_video
+from activity_gate import ACTIVITY_THRESHOLD, ActivityGate
+from gemini_files import uploaded_video
+from models import PatientInfo, PatientTimestamp
+from pose_vitals import PoseVitals, vitals_from_directory
+from storage import FileRoomStore
+from video_preprocess import PreprocessConfig
+from video_segments import VIDEO_EXTENSIONS
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))
+
+
+class VideoJob(BaseModel):
+    video_path: str
+    room: str
+
+class VideoResult(BaseModel):
+    video_path: str
+    room: str
+    status: str  # "done", "skipped" or "failed"
+    upload_seconds: float = 0.0
+    profile_seconds: float = 0.0
+    report_seconds: float = 0.0
+    total_seconds: float = 0.0
+    footage_seconds: float = 0.0  # scored by the activity gate
+    skipped_seconds: float = 0.0  # quiet footage not sent to the model
+    error: Optional[str] = None
+
+
+def jobs_from_directory(directory: str, first_room: Optional[int] = None) -> list[VideoJob]:
+    """One job per video file in `directory`, sorted by file name."""
+    names = sorted(name for name in os.listdir(directory) if name.lower().endswith(VIDEO_EXTENSIONS))
+    jobs = []
+    next_room = first_room
+    for name in names:
+        stem = os.path.splitext(name)[0]
+        match = re.fullmatch(r"room(\d+)", stem)
+        if match:
+            room = match.group(1)
+        elif next_room is not None:
+            room = str(next_room)
+            next_room += 1
+        else:
+            room = stem
+        jobs.append(VideoJob(video_path=os.path.join(directory, name), room=room))
+    return jobs
+
+def jobs_from_manifest(manifest_path: str) -> list[VideoJob]:
+    with open(manifest_path, 'r') as f:
+        entries = json.load(f)
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    return [
+        VideoJob(video_path=os.path.join(base, entry["video"]), room=str(entry["room"]))
+        for entry in entries
+    ]
+
+def is_complete(job: VideoJob, store: FileRoomStore) -> bool:
+    """True if both outputs exist and were written after the video last changed."""
+    video_mtime = os.stat(job.video_path).st_mtime_ns
+    for kind in ("info", "timeline"):
+        signature = store.signature(job.room, kind)
+        if signature is None or signature[0] < video_mtime:
+            return False
+    return True
+
+def pose_vitals_for(job: VideoJob, poses_dir: Optional[str]) -> Optional[PoseVitals]:
+    """Vitals from `poses_dir/<video name>/`, if yolo-segmentation.py --keypoints wrote one."""
+    if not poses_dir:
+        return None
+    directory = os.path.join(poses_dir, os.path.splitext(os.path.basename(job.video_path))[0])
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        return None
+    return vitals_from_directory(directory)
+
+def process_video(
+    job: VideoJob,
+    store: FileRoomStore,
+    force: bool = False,
+    use_cache: bool = True,
+    segment_seconds: Optional[float] = None,
+    overlap_seconds: float = 0.0,
+    preprocess: Optional[PreprocessConfig] = None,
+    poses_dir: Optional[str] = None,
+    gate_threshold: Optional[float] = None
+) -> VideoResult:
+    """Generate and save the profile and report for one video.
+
+    With `segment_seconds` the video is analysed in windows of that length
+    (see gemini_video.analyze_video_segmented) instead of as one upload.
+    `preprocess` samples and downscales whatever is uploaded. Keypoints found
+    under `poses_dir` add measured vitals to the report; in segmented mode
+    they replace the merged report's estimates, since the whole-video
+    measurements don't describe any single window. With `gate_threshold`
+    quiet footage gets a synthesized "Low" report instead of a model call.
+    """
+    if not force and is_complete(job, store):
+        return VideoResult(video_path=job.video_path, room=job.room, status="skipped")
+
+    started = time.perf_counter()
+    upload_seconds = 0.0
+    uploaded_during_profile = False
+    gate = ActivityGate(gate_threshold) if gate_threshold is not None else None
+    try:
+        pose_vitals = pose_vitals_for(job, poses_dir)
+        if segment_seconds:
+            profile, report = gemini_video.analyze_video_segmented(
+                job.video_path, segment_seconds, overlap_seconds, use_cache=use_cache, preprocess=preprocess, gate=gate
+            )
+            if pose_vitals is not None:
+                report = pose_vitals.apply(report)
+            profiled = started
+            reported = time.perf_counter()
+        else:
+            # One upload is shared by both prompts, and skipped if both are cached
+            active, score = gate.check(job.video_path) if gate is not None else (True, None)
+            with uploaded_video(gemini_video.client, job.video_path, preprocess) as video_file:
+                profile = gemini_profile.generate_profile_from_video(job.video_path, video_file, use_cache)
+                profiled = time.perf_counter()
+                if active:
+                    report = gemini_video.video_to_report(job.video_path, profile, video_file, use_cache, pose_vitals=pose_vitals)
+                else:
+                    report = gemini_video.quiet_report([gemini_video.quiet_timestamp(0, gate.seconds, score)])
+                    if pose_vitals is not None:
+                        report = pose_vitals.apply(report)
+                reported = time.perf_counter()
+                upload_seconds = video_file.upload_seconds
+                uploaded_during_profile = video_file.uploaded_at is not None and video_file.uploaded_at <= profiled
+
+        patient_info = PatientInfo.model_validate(profile.model_dump())
+        timeline = PatientTimestamp.model_validate({**report.model_dump(), "room_number": job.room})
+
+        # The timeline is written last: its presence marks the room as complete
+        store.save(job.room, "info", patient_info)
+        store.save(job.room, "timeline", timeline)
+    except Exception as e:
+        return VideoResult(
+            video_path=job.video_path,
+            room=job.room,
+            status="failed",
+            total_seconds=time.perf_counter() - started,
+            error=str(e)
+        )
+    return VideoResult(
+        video_path=job.video_path,
+        room=job.room,
+        status="done",
+        upload_seconds=upload_seconds,
+        profile_seconds=profiled - started - (upload_seconds if uploaded_during_profile else 0.0),
+        report_seconds=reported - profiled - (0.0 if uploaded_during_profile else upload_seconds),
+        total_seconds=reported - started,
+        footage_seconds=gate.seconds if gate is not None else 0.0,
+        skipped_seconds=gate.skipped_seconds if gate is not None else 0.0
+    )
+
+async def run_batch(
+    jobs: list[VideoJob],
+    concurrency: int = BATCH_CONCURRENCY,
+    store: Optional[FileRoomStore] = None,
+    force: bool = False,
+    use_cache: bool = True,
+    segment_seconds: Optional[float] = None,
+    overlap_seconds: float = 0.0,
+    preprocess: Optional[PreprocessConfig] = None,
+    poses_dir: Optional[str] = None,
+    gate_threshold: Optional[float] = None
+) -> list[VideoResult]:
+    """Process `jobs` with at most `concurrency` videos in flight at once."""
+    store = store if store is not None else FileRoomStore()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(job: VideoJob) -> VideoResult:
+        async with semaphore:
+            result = await asyncio.to_thread(process_video, job, store, force, use_cache, segment_seconds, overlap_seconds, preprocess, poses_dir, gate_threshold)
+        print(f"[{result.status}] room {result.room} <- {os.path.basename(result.video_path)} "
+              f"({result.total_seconds:.1f}s){' ' + result.error if result.error else ''}")
+        return result
+
+    return list(await asyncio.gather(*(run(job) for job in jobs)))
+
+def batch_videos_to_reports(jobs: list[VideoJob], concurrency: int = BATCH_CONCURRENCY, store: Optional[FileRoomStore] = None, force: bool = False, use_cache: bool = True, segment_seconds: Optional[float] = None, overlap_seconds: float = 0.0, preprocess: Optional[PreprocessConfig] = None, poses_dir: Optional[str] = None, gate_threshold: Optional[float] = None) -> list[VideoResult]:
+    """Synchronous wrapper around run_batch for scripts."""
+    return asyncio.run(run_batch(jobs, concurrency, store, force, use_cache, segment_seconds, overlap_seconds, preprocess, poses_dir, gate_threshold))
+
+def print_summary(results: list[VideoResult], wall_seconds: float):
+    print(f"\n{'room':<8}{'status':<9}{'upload':>9}{'profile':>9}{'report':>9}{'total':>9}  video")
+    for r in results:
+        print(f"{r.room:<8}{r.status:<9}{r.upload_seconds:>8.1f}s{r.profile_seconds:>8.1f}s{r.report_seconds:>8.1f}s{r.total_seconds:>8.1f}s  {os.path.basename(r.video_path)}")
+    counts = {status: sum(r.status == status for r in results) for status in ("done", "skipped", "failed")}
+    serial = sum(r.total_seconds for r in results)
+    print(f"\n{counts['done']} done, {counts['skipped']} skipped, {counts['failed']} failed in {wall_seconds:.1f}s "
+          f"(serial time {serial:.1f}s)")
+    footage = sum(r.footage_seconds for r in results)
+    if footage:
+        skipped = sum(r.skipped_seconds for r in results)
+        print(f"Activity gate skipped {skipped:.0f}s of {footage:.0f}s of footage ({100 * skipped / footage:.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate patientinfo/ and timelineinfo/ JSON for many videos")
+    parser.add_argument("directory", nargs="?", help="Directory of videos")
+    parser.add_argument("--manifest", help="JSON list of {\"video\": ..., \"room\": ...} entries")
+    parser.add_argument("--first-room", type=int, help="Number non-roomNNN files sequentially from this room")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--patientinfo", default="patientinfo")
+    parser.add_argument("--timelineinfo", default="timelineinfo")
+    parser.add_argument("--force", action="store_true", help="Reprocess videos that already have outputs")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the video analysis result cache")
+    parser.add_argument("--segment-seconds", type=float, help="Analyse long recordings in windows of this many seconds")
+    parser.add_argument("--overlap-seconds", type=float, default=0.0, help="Overlap between consecutive windows")
+    parser.add_argument("--preprocess", action="store_true", help="Sample and downscale videos before upload")
+    parser.add_argument("--fps", type=float, default=PreprocessConfig().target_fps, help="Frames per second kept by --preprocess")
+    parser.add_argument("--max-width", type=int, default=PreprocessConfig().max_width, help="Maximum width kept by --preprocess")
+    parser.add_argument("--keyframes", action="store_true", help="With --preprocess, only encode frames with motion")
+    parser.add_argument("--poses", help="Directory of keypoint directories (one per video name) for measured vitals")
+    parser.add_argument("--gate-threshold", type=float, nargs="?", const=ACTIVITY_THRESHOLD, help=f"Skip the report call for quiet footage (activity score below this, default {ACTIVITY_THRESHOLD})")
+    parser.add_argument("--timing-json", help="Write per-video results to this file")
+    args = parser.parse_args()
+
+    if bool(args.directory) == bool(args.manifest):
+        parser.error("Pass either a directory or --manifest")
+    jobs = jobs_from_manifest(args.manifest) if args.manifest else jobs_from_directory(args.directory, args.first_room)
+
+    preprocess = PreprocessConfig(target_fps=args.fps, max_width=args.max_width, keyframes_only=args.keyframes) if args.preprocess else None
+
+    started = time.perf_counter()
+    results = batch_videos_to_reports(
+        jobs,
+        args.concurrency,
+        FileRoomStore(args.patientinfo, args.timelineinfo),
+        args.force,
+        not args.no_cache,
+        args.segment_seconds,
+        args.overlap_seconds,
+        preprocess,
+        args.poses,
+        args.gate_threshold
+    )
+    print_summary(results, time.perf_counter() - started)
+
+    if args.timing_json:
+        with open(args.timing_json, 'w') as f:
+            json.dump([r.model_dump() for r in results], f, indent=2)
+
+if __name__ == "__main__":
+    main()
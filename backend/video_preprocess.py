@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Shrink videos before they are sent to Gemini: sample frames down to a few
+per second, downscale, optionally keep only frames with motion, and
+re-encode.
+
+Benchmark payload size against the original clips with:
+
+    python video_preprocess.py test/ --fps 2 --max-width 640 --keyframes
+
+Add --end-to-end to also time video_to_report with and without
+preprocessing (this calls Gemini and needs GOOGLE_GEMINI_API_KEY).
+"""
+import argparse
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import cv2
+from pydantic import BaseModel
+
+from video_segments import video_paths
+
+
+class PreprocessConfig(BaseModel):
+    target_fps: float = 2.0
+    max_width: int = 640
+    max_height: int = 640
+    # Keyframe mode: a sampled frame that barely differs from the last kept one
+    # is replaced by a repeat of that frame, which the encoder stores almost
+    # for free, so the clip keeps its original timing.
+    keyframes_only: bool = False
+    motion_threshold: float = 4.0  # mean absolute grey-level difference, 0-255
+    codec: str = "mp4v"
+
+class PreprocessResult(BaseModel):
+    input_path: str
+    output_path: str
+    input_bytes: int
+    output_bytes: int
+    input_frames: int
+    output_frames: int
+    keyframes: int
+    seconds: float
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.input_bytes - self.output_bytes
+
+
+def _output_size(width: int, height: int, config: PreprocessConfig) -> tuple[int, int]:
+    scale = min(1.0, config.max_width / width, config.max_height / height)
+    # Most codecs need even dimensions
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+def motion_signature(frame):
+    """Small blurred greyscale thumbnail used for cheap frame differencing."""
+    grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.GaussianBlur(cv2.resize(grey, (64, 64), interpolation=cv2.INTER_AREA), (5, 5), 0)
+
+def preprocess_video(input_path, output_path=None, config: Optional[PreprocessConfig] = None) -> PreprocessResult:
+    """Write a sampled, downscaled copy of `input_path`; frames are streamed, never buffered."""
+    config = config or PreprocessConfig()
+    started = time.perf_counter()
+
+    video_capture = cv2.VideoCapture(str(input_path))
+    if not video_capture.isOpened():
+        raise IOError(f"Error opening video file {input_path}")
+    source_fps = video_capture.get(cv2.CAP_PROP_FPS) or 30.0
+    width, height = int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    output_fps = min(config.target_fps, source_fps)
+    frame_size = _output_size(width, height, config)
+
+    if output_path is None:
+        fd, output_path = tempfile.mkstemp(prefix="preprocessed-", suffix=".mp4")
+        os.close(fd)
+    output_video = cv2.VideoWriter(str(output_path), cv2.VideoWriter_fourcc(*config.codec), output_fps, frame_size)
+
+    input_frames = output_frames = keyframes = 0
+    next_sample = 0.0
+    last_kept = last_signature = None
+    try:
+        while True:
+            ret, frame = video_capture.read()
+            if not ret:
+                break
+            t = input_frames / source_fps
+            input_frames += 1
+            if t + 1e-9 < next_sample:
+                continue
+            next_sample += 1.0 / output_fps
+
+            frame = cv2.resize(frame, frame_size, interpolation=cv2.INTER_AREA)
+            if config.keyframes_only and last_kept is not None:
+                signature = motion_signature(frame)
+                if cv2.absdiff(signature, last_signature).mean() < config.motion_threshold:
+                    frame = last_kept
+                else:
+                    last_kept, last_signature = frame, signature
+                    keyframes += 1
+            else:
+                last_kept, last_signature = frame, motion_signature(frame) if config.keyframes_only else None
+                keyframes += 1
+
+            output_video.write(frame)
+            output_frames += 1
+    finally:
+        video_capture.release()
+        output_video.release()
+
+    return PreprocessResult(
+        input_path=str(input_path),
+        output_path=str(output_path),
+        input_bytes=os.path.getsize(input_path),
+        output_bytes=os.path.getsize(output_path),
+        input_frames=input_frames,
+        output_frames=output_frames,
+        keyframes=keyframes,
+        seconds=time.perf_counter() - started
+    )
+
+@contextmanager
+def preprocessed_video(input_path, config: Optional[PreprocessConfig] = None):
+    """Preprocess into a temporary file that is removed on exit."""
+    result = preprocess_video(input_path, None, config)
+    try:
+        yield result
+    finally:
+        if os.path.exists(result.output_path):
+            os.unlink(result.output_path)
+
+
+def benchmark(video_paths, config: PreprocessConfig, end_to_end: bool = False):
+    """Print payload size (and optionally video_to_report latency) with and without preprocessing."""
+    print(f"{'video':<28}{'input':>10}{'output':>10}{'saved':>8}{'frames':>12}{'prep':>8}")
+    total_in = total_out = 0
+    for path in video_paths:
+        with preprocessed_video(path, config) as result:
+            total_in += result.input_bytes
+            total_out += result.output_bytes
+            print(f"{os.path.basename(path):<28}{result.input_bytes / 1e6:>9.2f}M{result.output_bytes / 1e6:>9.2f}M"
+                  f"{100 * result.bytes_saved / result.input_bytes:>7.0f}%"
+                  f"{f'{result.input_frames}->{result.output_frames}':>12}{result.seconds:>7.2f}s")
+    print(f"{'total':<28}{total_in / 1e6:>9.2f}M{total_out / 1e6:>9.2f}M{100 * (total_in - total_out) / max(total_in, 1):>7.0f}%")
+
+    if end_to_end:
+        import gemini_video
+        print(f"\n{'video':<28}{'original':>10}{'preprocessed':>14}")
+        for path in video_paths:
+            timings = []
+            for preprocess in (None, config):
+                started = time.perf_counter()
+                gemini_video.video_to_report(path, use_cache=False, preprocess=preprocess)
+                timings.append(time.perf_counter() - started)
+            print(f"{os.path.basename(path):<28}{timings[0]:>9.1f}s{timings[1]:>13.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark video preprocessing before Gemini upload")
+    parser.add_argument("paths", nargs="+", help="Video files or directories")
+    parser.add_argument("--fps", type=float, default=PreprocessConfig().target_fps)
+    parser.add_argument("--max-width", type=int, default=PreprocessConfig().max_width)
+    parser.add_argument("--max-height", type=int, default=PreprocessConfig().max_height)
+    parser.add_argument("--keyframes", action="store_true", help="Repeat the last frame instead of encoding still frames")
+    parser.add_argument("--motion-threshold", type=float, default=PreprocessConfig().motion_threshold)
+    parser.add_argument("--end-to-end", action="store_true", help="Also time video_to_report on each clip (calls Gemini)")
+    args = parser.parse_args()
+
+    config = PreprocessConfig(
+        target_fps=args.fps,
+        max_width=args.max_width,
+        max_height=args.max_height,
+        keyframes_only=args.keyframes,
+        motion_threshold=args.motion_threshold
+    )
+    benchmark(video_paths(args.paths), config, args.end_to_end)
+
+if __name__ == "__main__":
+    main()
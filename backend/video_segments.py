@@ -0,0 +1,84 @@
+import os
+import tempfile
+
+import cv2
+
+VIDEO_EXTENSIONS = (".mp4", ".webm", ".mov", ".avi", ".mkv")
+
+
+def video_paths(paths) -> list[str]:
+    """Expand directories into the video files they contain, sorted by name; files are kept as given."""
+    if isinstance(paths, str):
+        paths = [paths]
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            videos.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.lower().endswith(VIDEO_EXTENSIONS))
+        else:
+            videos.append(path)
+    return videos
+
+def format_clock(seconds: float) -> str:
+    """Format a video-relative offset as HH:MM:SS."""
+    seconds = max(0, int(round(seconds)))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def iter_video_windows(video_path, window_seconds: float = 60.0, overlap_seconds: float = 0.0, output_dir=None):
+    """Split a recording into fixed, optionally overlapping, time windows.
+
+    Frames are decoded one at a time and written to a short MP4 per window, so
+    memory use does not depend on the length of the recording. Yields
+    (start_seconds, end_seconds, segment_path) as soon as each window is
+    complete; the caller owns the segment file and should delete it when done.
+    """
+    step = window_seconds - overlap_seconds
+    if window_seconds <= 0 or step <= 0:
+        raise ValueError("window_seconds must be positive and larger than overlap_seconds")
+
+    video_capture = cv2.VideoCapture(str(video_path))
+    if not video_capture.isOpened():
+        raise IOError(f"Error opening video file {video_path}")
+
+    fps = video_capture.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_size = (int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    output_dir = output_dir or tempfile.gettempdir()
+
+    open_windows = []  # [start_seconds, writer, path], oldest first
+    next_start = 0.0
+    frame_index = 0
+    try:
+        while True:
+            ret, frame = video_capture.read()
+            if not ret:
+                break
+            t = frame_index / fps
+
+            while next_start <= t:
+                fd, path = tempfile.mkstemp(dir=output_dir, prefix="segment-", suffix=".mp4")
+                os.close(fd)
+                open_windows.append([next_start, cv2.VideoWriter(path, fourcc, fps, frame_size), path])
+                next_start += step
+
+            for _, writer, _ in open_windows:
+                writer.write(frame)
+            frame_index += 1
+
+            # Hand off every window that the next frame would fall outside of
+            next_t = frame_index / fps
+            while open_windows and next_t >= open_windows[0][0] + window_seconds:
+                start, writer, path = open_windows.pop(0)
+                writer.release()
+                yield start, start + window_seconds, path
+
+        end = frame_index / fps
+        while open_windows:
+            start, writer, path = open_windows.pop(0)
+            writer.release()
+            yield start, end, path
+    finally:
+        video_capture.release()
+        for _, writer, path in open_windows:
+            writer.release()
+            if os.path.exists(path):
+                os.unlink(path)
@@ -0,0 +1,177 @@
+import re
+import threading
+import time
+from typing import Optional
+
+from models import PatientTimestamp
+from storage import normalize_symptom
+
+WARD_INDEX_SYNC_INTERVAL = 1.0
+
+
+def normalize_danger_level(level: str) -> str:
+    return level.strip().lower()
+
+_TIME_PATTERN = re.compile(r"^\s*(\d{1,2}):(\d{2})(?::(\d{2}))?\s*([AaPp][Mm])?\s*$")
+
+def parse_time(value: str) -> Optional[int]:
+    """Seconds since midnight for "HH:MM", "HH:MM:SS" or "HH:MM AM/PM"; None if unparseable."""
+    match = _TIME_PATTERN.match(value or "")
+    if not match:
+        return None
+    hours, minutes, seconds, meridiem = match.groups()
+    hours, minutes, seconds = int(hours), int(minutes), int(seconds or 0)
+    if meridiem:
+        hours = hours % 12 + (12 if meridiem.lower() == "pm" else 0)
+    return hours * 3600 + minutes * 60 + seconds
+
+
+class WardIndex:
+    """Inverted indexes over every room's timeline.
+
+    Rooms are indexed by overall danger level and by normalized symptom
+    (predicted symptoms plus symptoms of any observation). Observations are
+    indexed by their own danger level and symptoms. `update_room` swaps a
+    single room's postings, so the index is maintained incrementally: the
+    room cache calls it whenever it loads new timeline data, and `sync`
+    catches changes nobody has requested yet.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timelines: dict[str, PatientTimestamp] = {}
+        self._versions: dict[str, object] = {}
+        self._rooms_by_danger: dict[str, set[str]] = {}
+        self._rooms_by_symptom: dict[str, set[str]] = {}
+        self._observations_by_danger: dict[str, set[tuple[str, int]]] = {}
+        self._observations_by_symptom: dict[str, set[tuple[str, int]]] = {}
+        self._observation_times: dict[tuple[str, int], tuple[Optional[int], Optional[int]]] = {}
+        self._last_sync = 0.0
+        self.updates = 0
+
+    def update_room(self, room: str, timeline: PatientTimestamp, version=None):
+        with self._lock:
+            self._remove(room)
+            self._timelines[room] = timeline
+            self._versions[room] = version
+            self._rooms_by_danger.setdefault(normalize_danger_level(timeline.danger_level), set()).add(room)
+            symptoms = {normalize_symptom(s) for s in timeline.predicted_symptoms}
+            for position, ts in enumerate(timeline.timestamps):
+                key = (room, position)
+                self._observations_by_danger.setdefault(normalize_danger_level(ts.danger_level), set()).add(key)
+                for symptom in {normalize_symptom(s) for s in ts.symptoms}:
+                    self._observations_by_symptom.setdefault(symptom, set()).add(key)
+                    symptoms.add(symptom)
+                self._observation_times[key] = (parse_time(ts.start_time), parse_time(ts.end_time))
+            for symptom in symptoms:
+                self._rooms_by_symptom.setdefault(symptom, set()).add(room)
+            self.updates += 1
+
+    def remove_room(self, room: str):
+        with self._lock:
+            self._remove(room)
+
+    def sync(self, room_cache, force: bool = False):
+        """Reindex rooms whose stored timeline changed since they were indexed.
+
+        Runs at most once per WARD_INDEX_SYNC_INTERVAL unless forced; between
+        syncs, queries are answered from the index alone.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_sync < WARD_INDEX_SYNC_INTERVAL:
+            return
+        self._last_sync = now
+        rooms = set(room_cache.list_rooms())
+        for room in rooms:
+            version = room_cache.store.signature(room, "timeline")
+            if version is None:
+                self.remove_room(room)
+            elif self._versions.get(room) != version:
+                self.update_room(room, room_cache.get_timeline(room), version)
+        for room in set(self._timelines) - rooms:
+            self.remove_room(room)
+
+    def query_rooms(self, danger_levels: Optional[list[str]] = None, symptom: Optional[str] = None) -> list[str]:
+        with self._lock:
+            matches = None
+            if danger_levels:
+                matches = set().union(*(self._rooms_by_danger.get(normalize_danger_level(l), set()) for l in danger_levels))
+            if symptom:
+                rooms = self._rooms_by_symptom.get(normalize_symptom(symptom), set())
+                matches = rooms if matches is None else matches & rooms
+            if matches is None:
+                matches = set(self._timelines)
+            return sorted(matches, key=lambda room: (len(room), room))
+
+    def query_observations(
+        self,
+        danger_levels: Optional[list[str]] = None,
+        symptom: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        room: Optional[str] = None
+    ) -> list[dict]:
+        """Observations matching every given filter; `since`/`until` keep observations overlapping that window."""
+        since_s = parse_time(since) if since else None
+        until_s = parse_time(until) if until else None
+        if (since and since_s is None) or (until and until_s is None):
+            raise ValueError("Times must look like HH:MM, HH:MM:SS or HH:MM AM/PM")
+
+        with self._lock:
+            matches = None
+            if danger_levels:
+                matches = set().union(*(self._observations_by_danger.get(normalize_danger_level(l), set()) for l in danger_levels))
+            if symptom:
+                observations = self._observations_by_symptom.get(normalize_symptom(symptom), set())
+                matches = observations if matches is None else matches & observations
+            if matches is None:
+                matches = self._observation_times.keys()
+            if room is not None:
+                matches = [key for key in matches if key[0] == room]
+
+            results = []
+            for key in matches:
+                start, end = self._observation_times[key]
+                if since_s is not None and (end is None or end < since_s):
+                    continue
+                if until_s is not None and (start is None or start > until_s):
+                    continue
+                room_key, position = key
+                ts = self._timelines[room_key].timestamps[position]
+                results.append({"room": room_key, "position": position, **ts.model_dump()})
+        results.sort(key=lambda r: (len(r["room"]), r["room"], r["position"]))
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rooms": len(self._timelines),
+                "observations": len(self._observation_times),
+                "symptoms": len(self._rooms_by_symptom),
+                "updates": self.updates,
+            }
+
+    def _remove(self, room: str):
+        timeline = self._timelines.pop(room, None)
+        self._versions.pop(room, None)
+        if timeline is None:
+            return
+        _discard(self._rooms_by_danger, normalize_danger_level(timeline.danger_level), room)
+        symptoms = {normalize_symptom(s) for s in timeline.predicted_symptoms}
+        for position, ts in enumerate(timeline.timestamps):
+            key = (room, position)
+            _discard(self._observations_by_danger, normalize_danger_level(ts.danger_level), key)
+            for symptom in {normalize_symptom(s) for s in ts.symptoms}:
+                _discard(self._observations_by_symptom, symptom, key)
+                symptoms.add(symptom)
+            self._observation_times.pop(key, None)
+        for symptom in symptoms:
+            _discard(self._rooms_by_symptom, symptom, room)
+
+
+def _discard(index: dict, key, value):
+    postings = index.get(key)
+    if postings is not None:
+        postings.discard(value)
+        if not postings:
+            del index[key]
@@ -1,35 +1,80 @@
 # PIP Installations
 
-from ultralytics import YOLO
+import argparse
 import cv2
+import os
+import queue
+import threading
+import time
 
-pose_detection_model = YOLO("models/yolo11n-pose.pt")
+from pose_backends import BACKENDS, POSE_BACKEND, load_pose_model
+from pose_keypoints import KEYPOINT_DICT, KeypointWriter
+
+# torch, onnx, openvino, onnx-int8 or openvino-int8 (see pose_backends.py)
+pose_detection_model = load_pose_model(POSE_BACKEND)
 
 # Train Hugging Face: https://huggingface.co/datasets/stable-bias/professions-v2
 
-KEYPOINT_DICT = {  
-    0: 'nose',
-    1: 'left_eye',
-    2: 'right_eye',
-    3: 'left_ear',
-    4: 'right_ear',
-    5: 'left_shoulder',
-    6: 'right_shoulder',
-    7: 'left_elbow',
-    8: 'right_elbow',
-    9: 'left_wrist',
-    10: 'right_wrist',
-    11: 'left_hip',
-    12: 'right_hip',
-    13: 'left_knee',
-    14: 'right_knee',
-    15: 'left_ankle',
-    16: 'right_ankle'
-}
-
-def generate_poses_from_video(video_path):
-  
-    video_capture = cv2.VideoCapture(video_path, label_title=None)
+POSE_BATCH_SIZE = 8
+POSE_QUEUE_SIZE = 32
+_END_OF_STREAM = None
+
+def _decode_frames(video_capture, frame_queue, stride, stats, stop):
+    """Decoder thread: read frames (keeping every `stride`-th) into the bounded queue."""
+    started = time.perf_counter()
+    frame_index = 0
+    try:
+        while not stop.is_set():
+            ret, frame = video_capture.read()
+            if not ret:
+                break
+            if frame_index % stride == 0:
+                frame_queue.put((frame_index, frame))
+            frame_index += 1
+    finally:
+        stats["frames_read"] = frame_index
+        stats["decode_seconds"] = time.perf_counter() - started
+        frame_queue.put(_END_OF_STREAM)
+
+def _encode_frames(output_video, keypoint_writer, result_queue, stats, names=None):
+    """Encoder thread: draw and write annotated frames and/or collect keypoints.
+
+    A failure is kept in stats["encode_error"] (message) and
+    stats["encode_exception"], for the caller to raise once the threads stop.
+    """
+    busy = 0.0
+    while True:
+        item = result_queue.get()
+        if item is _END_OF_STREAM:
+            break
+        if "encode_error" in stats:
+            continue  # keep draining so inference never blocks on a dead encoder
+        started = time.perf_counter()
+        try:
+            for frame_index, result in zip(*item):
+                if keypoint_writer is not None:
+                    keypoint_writer.add_result(frame_index, result)
+                if output_video is not None:
+                    if names is not None:
+                        result.names = names
+                    output_video.write(result.plot(conf=False))
+        except Exception as e:
+            stats["encode_error"] = str(e)
+            stats["encode_exception"] = e
+        busy += time.perf_counter() - started
+    stats["encode_seconds"] = busy
+
+def generate_poses_from_video(video_path, label_title=None, output_path='output_video.mp4', batch_size=POSE_BATCH_SIZE, stride=1, queue_size=POSE_QUEUE_SIZE, keypoints_dir=None):
+    """Run pose detection over a video and write an annotated copy.
+
+    Decoding, inference and encoding run concurrently: a decoder thread and an
+    encoder thread are connected to the inference loop by bounded queues, and
+    the model sees `batch_size` frames per call. With `stride` > 1 only every
+    n-th frame is processed. With `keypoints_dir` the detected keypoints are
+    saved in the pose_keypoints format; pass `output_path=None` to skip
+    rendering the annotated video. Returns throughput and latency statistics.
+    """
+    video_capture = cv2.VideoCapture(video_path)
 
     if not video_capture.isOpened():
         print("Error opening video file")
@@ -38,25 +83,100 @@ def generate_poses_from_video(video_path):
     frame_width, frame_height = int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = video_capture.get(cv2.CAP_PROP_FPS)
 
-    pose_detection_model.model.names = {0: label_title}
-    video_name = video_path.split(".")[0]
+    names = {0: label_title} if label_title is not None else None
 
+    output_video = None
+    if output_path is not None:
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        output_video = cv2.VideoWriter(output_path, fourcc, fps / stride, (frame_width, frame_height))
+    keypoint_writer = KeypointWriter(fps, (frame_width, frame_height)) if keypoints_dir is not None else None
 
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    output_video = cv2.VideoWriter('output_video.mp4', fourcc, fps, (frame_width, frame_height))
+    stats = {}
+    stop = threading.Event()
+    frame_queue = queue.Queue(maxsize=queue_size)
+    result_queue = queue.Queue(maxsize=max(1, queue_size // batch_size))
+    decoder = threading.Thread(target=_decode_frames, args=(video_capture, frame_queue, stride, stats, stop), daemon=True)
+    encoder = threading.Thread(target=_encode_frames, args=(output_video, keypoint_writer, result_queue, stats, names), daemon=True)
 
-    while True:
-        ret, frame = video_capture.read()
-        if not ret:
-            break
+    started = time.perf_counter()
+    decoder.start()
+    encoder.start()
+
+    batch_latencies = []
+    frames_inferred = 0
+    finished = False
+    try:
+        while not finished:
+            batch = []
+            while len(batch) < batch_size:
+                item = frame_queue.get()
+                if item is _END_OF_STREAM:
+                    finished = True
+                    break
+                batch.append(item)
+            if not batch:
+                break
+
+            batch_started = time.perf_counter()
+            frame_indices, frames = zip(*batch)
+            results = pose_detection_model.predict(list(frames), verbose=False)
+            batch_latencies.append(time.perf_counter() - batch_started)
+            frames_inferred += len(batch)
+            result_queue.put((frame_indices, results))
+    finally:
+        # If inference stopped early, unblock the decoder before joining it
+        stop.set()
+        while not finished:
+            finished = frame_queue.get() is _END_OF_STREAM
+        result_queue.put(_END_OF_STREAM)
+        decoder.join()
+        encoder.join()
+        video_capture.release()
+        if output_video is not None:
+            output_video.release()
+
+    encode_exception = stats.pop("encode_exception", None)
+    if encode_exception is not None:
+        # Don't leave a truncated video behind that looks like a finished one; keypoints were never saved
+        if output_path is not None and os.path.exists(output_path):
+            os.remove(output_path)
+        raise RuntimeError(f"Encoding {video_path} failed: {stats['encode_error']}") from encode_exception
 
-        results = pose_detection_model.predict(frame)
-        annotated_frame = results[0].plot(conf=False)
+    if keypoint_writer is not None:
+        keypoint_writer.save(keypoints_dir, video_path)
 
-        output_video.write(annotated_frame)
+    elapsed = time.perf_counter() - started
+    inference_seconds = sum(batch_latencies)
+    stats.update({
+        "frames_inferred": frames_inferred,
+        "batches": len(batch_latencies),
+        "batch_size": batch_size,
+        "stride": stride,
+        "elapsed_seconds": elapsed,
+        "inference_seconds": inference_seconds,
+        "fps": frames_inferred / elapsed if elapsed else 0.0,
+        "inference_fps": frames_inferred / inference_seconds if inference_seconds else 0.0,
+        "mean_batch_latency_ms": 1000 * inference_seconds / len(batch_latencies) if batch_latencies else 0.0,
+        "mean_frame_latency_ms": 1000 * inference_seconds / frames_inferred if frames_inferred else 0.0,
+    })
+    print(f"Pose pass on {video_path}: {frames_inferred} frames in {elapsed:.2f}s ({stats['fps']:.1f} fps, "
+          f"{stats['mean_batch_latency_ms']:.0f} ms per batch of {batch_size}, stride {stride})")
+    return stats
 
-    video_capture.release()
-    output_video.release()
-    cv2.destroyAllWindows()
+#generate_poses_from_video("panic.mp4")
 
-#generate_poses_from_video("panic.mp4")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Annotate a video with YOLO poses and report throughput")
+    parser.add_argument("video_path")
+    parser.add_argument("--output", default="output_video.mp4")
+    parser.add_argument("--label", help="Label drawn on detected people")
+    parser.add_argument("--no-video", action="store_true", help="Do not render the annotated video")
+    parser.add_argument("--keypoints", help="Directory to save per-frame keypoints to (.npy arrays)")
+    parser.add_argument("--batch-size", type=int, default=POSE_BATCH_SIZE)
+    parser.add_argument("--stride", type=int, default=1, help="Only process every n-th frame")
+    parser.add_argument("--queue-size", type=int, default=POSE_QUEUE_SIZE)
+    parser.add_argument("--backend", choices=BACKENDS, default=POSE_BACKEND, help="Inference runtime (default POSE_BACKEND)")
+    args = parser.parse_args()
+    if args.backend != POSE_BACKEND:
+        pose_detection_model = load_pose_model(args.backend)
+    print(generate_poses_from_video(args.video_path, args.label, output_path=None if args.no_video else args.output, keypoints_dir=args.keypoints, batch_size=args.batch_size, stride=args.stride, queue_size=args.queue_size))
\ No newline at end of file